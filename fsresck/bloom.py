@@ -0,0 +1,98 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Fixed memory probabilistic set membership."""
+
+import hashlib
+import math
+import struct
+
+
+class BloomFilter(object):
+
+    """
+    Bloom filter for integer keys.
+
+    Uses a fixed amount of memory, computed from the expected number of
+    keys and the requested false positive rate. Keys that were added are
+    always reported as present; when no more than capacity keys were
+    added, a key that was not added is reported as present with
+    probability of at most error_rate.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+        Create an empty filter.
+
+        @type capacity: int
+        @param capacity: expected number of keys
+        @type error_rate: float
+        @param error_rate: probability of a false positive after adding
+            capacity keys
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = int(math.ceil(-capacity * math.log(error_rate) /
+                                       math.log(2) ** 2))
+        self.hash_count = max(1, int(round(self.bit_count / float(capacity) *
+                                           math.log(2))))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        """Return positions of bits for key."""
+        # double hashing, with two independent hashes of the key
+        # (built-in hash() is not usable, e.g. hash(-1) == hash(-2))
+        first, second = struct.unpack(
+            '!QQ', hashlib.md5(str(key).encode('ascii')).digest())
+        first %= self.bit_count
+        second = second % self.bit_count or 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.bit_count
+
+    def add(self, key):
+        """Add key to the filter."""
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        """Check if key was (probably) added to filter."""
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def clear(self):
+        """Remove all keys from filter."""
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+
+    @property
+    def size(self):
+        """Return size of the filter in bytes."""
+        return len(self._bits)
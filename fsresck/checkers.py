@@ -0,0 +1,419 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Checking of file system images."""
+
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+
+class CheckResult(object):
+
+    """Outcome of checking a single image."""
+
+    PASSED = 'passed'
+    FAILED = 'failed'
+    TIMEOUT = 'timeout'
+    ERROR = 'error'
+    # returned by checkers that can't classify the image
+    UNDECIDED = 'undecided'
+
+    def __init__(self, status, returncode=None, output=b'', duration=0.0,
+                 checker=None, tiers=None):
+        """
+        Create object.
+
+        @param status: one of L{PASSED}, L{FAILED}, L{TIMEOUT}, L{ERROR} or
+            L{UNDECIDED}
+        @param returncode: exit status of the checker command
+        @type output: bytes
+        @param output: combined standard and error output of the checker
+        @param duration: time the check took, in seconds
+        @param checker: name of the checker that produced the result
+        @type tiers: list
+        @param tiers: for results of L{CheckerChain}, tuples with name,
+            status and duration of every tier that was run
+        """
+        self.status = status
+        self.returncode = returncode
+        self.output = output
+        self.duration = duration
+        self.checker = checker
+        self.tiers = tiers
+
+    @property
+    def passed(self):
+        """Check if the image passed the check."""
+        return self.status == self.PASSED
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "CheckResult(status={0!r}, returncode={1!r}, checker={2!r})"\
+            .format(self.status, self.returncode, self.checker)
+
+    def to_dict(self):
+        """Return result as a dictionary that can be serialised to JSON."""
+        ret = {'status': self.status,
+               'returncode': self.returncode,
+               'output': self.output.decode('utf-8', 'replace'),
+               'duration': self.duration,
+               'checker': self.checker}
+        if self.tiers is not None:
+            ret['tiers'] = [list(i) for i in self.tiers]
+        return ret
+
+
+def process_group_options():
+    """
+    Return arguments of Popen that start the command in a new session.
+
+    The command and all processes it starts are then in a process group
+    that can be killed with L{kill_process_group}.
+    """
+    if sys.version_info >= (3, 2):
+        return {'start_new_session': True}
+    return {'preexec_fn': os.setsid}
+
+
+def kill_process_group(pid):
+    """Kill all processes in the group of the process with the pid."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        # all the processes already exited
+        pass
+
+
+class CommandChecker(object):
+
+    """
+    Checker running an external command on the image.
+
+    The command is a list of arguments, arguments equal to C{{image}} are
+    replaced with the name of the checked image, if there are none, the
+    name is appended as the last argument. Exit status 0 means that the
+    image passed the check. The command runs in its own process group, on
+    timeout the whole group is killed, so processes started by wrapper
+    scripts don't outlive the check.
+    """
+
+    placeholder = '{image}'
+
+    def __init__(self, command, timeout=None, name=None):
+        """
+        Create object.
+
+        @type command: list
+        @param command: the command and its arguments
+        @param timeout: time in seconds after which the command is killed
+            and the check fails, no limit by default
+        @param name: name of the checker reported in results, the command
+            by default
+        """
+        self.command = list(command)
+        self.timeout = timeout
+        self.name = ' '.join(self.command) if name is None else name
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "CommandChecker(command={0!r}, timeout={1!r})".format(
+            self.command, self.timeout)
+
+    def args(self, image_name):
+        """Return the command arguments for checking an image."""
+        if self.placeholder not in self.command:
+            return self.command + [image_name]
+        return [image_name if i == self.placeholder else i
+                for i in self.command]
+
+    def check(self, image_name):
+        """Run the command on the image and return L{CheckResult}."""
+        start = time.time()
+        try:
+            process = subprocess.Popen(self.args(image_name),
+                                       stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT,
+                                       **process_group_options())
+        except OSError as exc:
+            return CheckResult(CheckResult.ERROR,
+                               output=str(exc).encode('utf-8'),
+                               duration=time.time() - start,
+                               checker=self.name)
+
+        timed_out = []
+        timer = None
+        if self.timeout is not None:
+            def kill():
+                """Stop the command and its children after timeout."""
+                timed_out.append(True)
+                kill_process_group(process.pid)
+            timer = threading.Timer(self.timeout, kill)
+            timer.start()
+        try:
+            output, _ = process.communicate()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        if timed_out:
+            status = CheckResult.TIMEOUT
+        elif process.returncode == 0:
+            status = CheckResult.PASSED
+        else:
+            status = CheckResult.FAILED
+        return CheckResult(status, process.returncode, output,
+                           time.time() - start, self.name)
+
+
+class MagicChecker(object):
+
+    """
+    Checker comparing magic numbers of the file system with expected values.
+
+    Images with a damaged superblock magic fail the check, for other
+    images it can't decide.
+    """
+
+    # offsets and values of superblock magic numbers of file systems
+    MAGICS = {'ext2': [(1080, b'\x53\xef')],
+              'ext3': [(1080, b'\x53\xef')],
+              'ext4': [(1080, b'\x53\xef')],
+              'xfs': [(0, b'XFSB')],
+              'btrfs': [(65600, b'_BHRfS_M')]}
+
+    def __init__(self, magics, name='magic'):
+        """
+        Create object.
+
+        @param magics: list of tuples with offset and expected bytes, or
+            name of file system from L{MAGICS}
+        @param name: name of the checker reported in results
+        """
+        if not isinstance(magics, list):
+            if magics not in self.MAGICS:
+                raise ValueError("Unknown file system: {0!r}".format(magics))
+            magics = self.MAGICS[magics]
+        self.magics = magics
+        self.name = name
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "MagicChecker(magics={0!r})".format(self.magics)
+
+    def check(self, image_name):
+        """Compare magic numbers in the image, return L{CheckResult}."""
+        start = time.time()
+        try:
+            with open(image_name, 'rb') as image:
+                for offset, magic in self.magics:
+                    image.seek(offset)
+                    if image.read(len(magic)) != magic:
+                        return CheckResult(
+                            CheckResult.FAILED,
+                            output="bad magic at offset {0}".format(offset)
+                            .encode('ascii'),
+                            duration=time.time() - start, checker=self.name)
+        except (IOError, OSError) as exc:
+            return CheckResult(CheckResult.ERROR,
+                               output=str(exc).encode('utf-8'),
+                               duration=time.time() - start,
+                               checker=self.name)
+        return CheckResult(CheckResult.UNDECIDED,
+                           duration=time.time() - start, checker=self.name)
+
+
+class KnownImageChecker(object):
+
+    """
+    Checker passing images identical to images that passed before.
+
+    Images are identified by digest of their contents. The digests of
+    images that passed are learned from the final results of a
+    L{CheckerChain}. When a file is given, the digests are appended to it,
+    so that they are shared between worker processes and later runs; new
+    lines of the file are read only when an image isn't known. The
+    digests are kept with the object, also when it's pickled, so it
+    should be sent to a worker process once (like L{Driver} does), not
+    with every image. For unknown images it can't decide.
+    """
+
+    def __init__(self, file_name=None, name='known', chunk_size=1 << 20):
+        """
+        Create object.
+
+        @param file_name: file with digests of images known to pass, one
+            per line
+        @param name: name of the checker reported in results
+        @param chunk_size: size of reads of the image
+        """
+        self.file_name = file_name
+        self.name = name
+        self.chunk_size = chunk_size
+        self.known = set()
+        self._position = 0
+        # image name -> digest of images checked and not learned yet
+        self._pending = {}
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "KnownImageChecker(file_name={0!r})".format(self.file_name)
+
+    def __getstate__(self):
+        """Return state for pickling, without the images being checked."""
+        state = self.__dict__.copy()
+        state['_pending'] = {}
+        return state
+
+    def digest(self, image_name):
+        """Return the digest of the image contents."""
+        digest = hashlib.sha1()
+        with open(image_name, 'rb') as image:
+            while True:
+                data = image.read(self.chunk_size)
+                if not data:
+                    break
+                digest.update(data)
+        return digest.hexdigest()
+
+    def _reload(self):
+        """Read digests added to the file since the last read."""
+        if self.file_name is None:
+            return
+        try:
+            with open(self.file_name, 'r') as known:
+                known.seek(self._position)
+                for line in known:
+                    if not line.endswith('\n'):
+                        break
+                    self._position += len(line)
+                    self.known.add(line.strip())
+        except (IOError, OSError):
+            pass
+
+    def check(self, image_name):
+        """Return passing L{CheckResult} for a known image."""
+        start = time.time()
+        try:
+            digest = self.digest(image_name)
+        except (IOError, OSError) as exc:
+            return CheckResult(CheckResult.ERROR,
+                               output=str(exc).encode('utf-8'),
+                               duration=time.time() - start,
+                               checker=self.name)
+        self._pending[image_name] = digest
+        if digest not in self.known:
+            self._reload()
+        status = CheckResult.PASSED if digest in self.known \
+            else CheckResult.UNDECIDED
+        return CheckResult(status, duration=time.time() - start,
+                           checker=self.name)
+
+    def learn(self, image_name, result):
+        """Remember the image if the final result of the chain passed."""
+        digest = self._pending.pop(image_name, None)
+        if digest is None or not result.passed or digest in self.known:
+            return
+        self.known.add(digest)
+        if self.file_name is not None:
+            with open(self.file_name, 'a') as known:
+                known.write(digest + '\n')
+
+
+class Tier(object):
+
+    """Checker in a L{CheckerChain} with the rules of escalation."""
+
+    def __init__(self, checker, escalate=(CheckResult.UNDECIDED, )):
+        """
+        Create object.
+
+        @param checker: the checker of the tier
+        @param escalate: statuses of results of the checker for which the
+            next tier is run, other results are final
+        """
+        self.checker = checker
+        self.escalate = frozenset(escalate)
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "Tier(checker={0!r}, escalate={1!r})".format(
+            self.checker, sorted(self.escalate))
+
+
+class CheckerChain(object):
+
+    """
+    Ordered list of checkers from the cheapest to the most expensive.
+
+    The tiers run one after another as long as the results escalate (for
+    example, the cheap check flags the image or can't decide), the result
+    of the last tier run is the result of the chain. Results are reported
+    under the name of the chain, so results stored by a run are found
+    with the same checker; the tiers that were run, with their statuses
+    and durations, are listed in the results.
+    """
+
+    def __init__(self, tiers, name=None):
+        """
+        Create object.
+
+        @param tiers: list of L{Tier} or checkers, the checkers escalate
+            only undecided results
+        @param name: name of the chain reported in results, names of the
+            checkers joined with " | " by default
+        """
+        self.tiers = [i if isinstance(i, Tier) else Tier(i) for i in tiers]
+        if not self.tiers:
+            raise ValueError("Chain needs at least one checker")
+        if name is None:
+            name = ' | '.join(getattr(i.checker, 'name', repr(i.checker))
+                              for i in self.tiers)
+        self.name = name
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "CheckerChain(tiers={0!r})".format(self.tiers)
+
+    def check(self, image_name):
+        """Run the tiers on the image, return L{CheckResult}."""
+        start = time.time()
+        tiers = []
+        for tier in self.tiers:
+            result = tier.checker.check(image_name)
+            name = getattr(tier.checker, 'name', None)
+            tiers.append((name, result.status, result.duration))
+            if result.status not in tier.escalate:
+                break
+        for tier in self.tiers:
+            if hasattr(tier.checker, 'learn'):
+                tier.checker.learn(image_name, result)
+        return CheckResult(result.status, result.returncode, result.output,
+                           time.time() - start, self.name, tiers)
@@ -0,0 +1,139 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Durable progress of long enumeration runs."""
+
+import json
+import os
+import tempfile
+import time
+from collections import deque
+
+
+class Checkpoint(object):
+
+    """
+    Progress of a run, saved to a file so that the run can be resumed.
+
+    States are identified by positions: tuples of integers (e.g. window
+    number and rank) that increase in the order the states are generated.
+    The checkpoint keeps the last position before which all states were
+    completed and the positions completed after it (when states are
+    tested in parallel they can finish out of order). Results of states
+    completed after the last save are not recorded in it, so the
+    consumer should drop its results of the states L{is_done} doesn't
+    report when resuming.
+
+    The file is replaced atomically, so a crash while saving leaves the
+    previous version intact.
+    """
+
+    def __init__(self, path, interval=60.0, save_every=1000):
+        """
+        Create object.
+
+        @param path: name of the file with saved progress
+        @param interval: longest time in seconds between saves
+        @param save_every: largest number of completed states between saves
+        """
+        self.path = path
+        self.interval = interval
+        self.save_every = save_every
+        self.position = None
+        self.done = set()
+        self._issued = deque()
+        self._finished = set()
+        self._unsaved = 0
+        self._last_save = time.time()
+
+    def load(self):
+        """Read saved progress, return False if there is none."""
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+        except (IOError, OSError):
+            return False
+        position = state.get('position')
+        self.position = None if position is None else tuple(position)
+        self.done = set(tuple(i) for i in state.get('done', []))
+        return True
+
+    def save(self):
+        """Write the progress to the file atomically."""
+        if self.position is not None:
+            self.done = set(i for i in self.done if i > self.position)
+        state = {'position': self.position,
+                 'done': sorted(self.done)}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_name = tempfile.mkstemp(prefix='.fsresck-checkpoint.',
+                                             dir=directory)
+        try:
+            with os.fdopen(handle, 'w') as state_file:
+                json.dump(state, state_file)
+                state_file.flush()
+                os.fsync(state_file.fileno())
+            os.rename(temp_name, self.path)
+        except Exception:
+            os.unlink(temp_name)
+            raise
+        # make the rename durable
+        dir_handle = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_handle)
+        finally:
+            os.close(dir_handle)
+        self._unsaved = 0
+        self._last_save = time.time()
+
+    def is_done(self, position):
+        """Check if the state at position was already completed."""
+        position = tuple(position)
+        if self.position is not None and position <= self.position:
+            return True
+        return position in self.done
+
+    def issue(self, position):
+        """Record that the state at position started being tested."""
+        self._issued.append(tuple(position))
+
+    def complete(self, position):
+        """
+        Record that the state at position was tested.
+
+        Saves the progress if enough time passed or enough states were
+        completed since the last save.
+        """
+        position = tuple(position)
+        self._finished.add(position)
+        self.done.add(position)
+        while self._issued and self._issued[0] in self._finished:
+            finished = self._issued.popleft()
+            self._finished.discard(finished)
+            self.done.discard(finished)
+            self.position = finished
+        self._unsaved += 1
+        if self._unsaved >= self.save_every or \
+                time.time() - self._last_save >= self.interval:
+            self.save()
@@ -0,0 +1,551 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Command line interface."""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shlex
+import sys
+import tempfile
+import time
+
+from .checkers import CommandChecker, CheckResult, MagicChecker, \
+    KnownImageChecker, Tier, CheckerChain
+from .checkpoint import Checkpoint
+from .driver import Driver
+from .fragmenter import Fragmenter
+from .image import Image
+from .imagegenerator import LogReader
+from .minimizer import Minimizer
+from .noop import NoopFilter
+from .planner import Planner
+from .results import ResultStore
+from .scheduler import HeuristicScorer, PriorityScheduler
+from .sharding import CostModel, Shard
+from .statespec import StateSource
+from .stratified import StratifiedSampler
+from .utils import copy, file_digest, get_temp_file_name
+from .workqueue import Coordinator, Worker, parse_address
+from .writesshuffler import WritesShuffler
+
+
+def _shard(text):
+    """Convert command line argument to L{Shard}."""
+    try:
+        return Shard.parse(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def build_parser():
+    """Return parser of the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='fsresck',
+        description='Test resilience of file systems to reordered writes')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser(
+        'run', help='check the states created from a write log')
+    _add_state_options(run)
+    _add_checker_options(run)
+    run.add_argument('--shard', type=_shard, default=None,
+                     help='test only part of the states, as "index/count"')
+    run.add_argument('--output', default=None,
+                     help='file for results in JSON lines format, standard '
+                          'output by default')
+    run.add_argument('--results', default=None,
+                     help='database of results, states with results in it '
+                          'are not checked again')
+    run.add_argument('--checkpoint', default=None,
+                     help='file with progress of the run, an interrupted '
+                          'run started again with it continues after the '
+                          'last processed state and appends to output, '
+                          'requires --output')
+    run.add_argument('--prioritize', action='store_true',
+                     help='check first the states that are more likely to '
+                          'fail')
+    run.add_argument('--lookahead', type=int, default=10000,
+                     help='number of states read ahead for prioritization')
+    run.add_argument('--lookahead-windows', type=int, default=16,
+                     help='number of windows with states read ahead for '
+                          'prioritization, each can have an image in '
+                          '--image-dir')
+    run.add_argument('--max-states', type=int, default=None,
+                     help='check only that many states, sampled from the '
+                          'whole log')
+    run.add_argument('--max-seconds', type=float, default=None,
+                     help='check states sampled from the whole log for '
+                          'that many seconds')
+    run.add_argument('--strata', type=int, default=16,
+                     help='number of parts of the log sampled evenly with '
+                          '--max-states or --max-seconds')
+    run.add_argument('--pipeline', action='store_true',
+                     help='create and check the images concurrently in one '
+                          'process with asyncio, needs Python 3.5 or later')
+
+    plan = commands.add_parser(
+        'plan', help='show the number of states and the projected time of '
+                     'a run')
+    _add_state_options(plan)
+    plan.add_argument('--checker', default=None,
+                      help='command checking the image, the time of a '
+                           'check of the base image is used as the time of '
+                           'a state')
+    plan.add_argument('--state-seconds', type=float, default=None,
+                      help='time of checking a single state, instead of '
+                           'measuring it with --checker')
+    plan.add_argument('--workers', type=int, default=None,
+                      help='number of worker processes of the run, number '
+                           'of CPUs by default')
+    plan.add_argument('--output', default=None,
+                      help='file for the plan in JSON format, standard '
+                           'output by default')
+
+    failures = commands.add_parser(
+        'failures', help='list failed states from a database of results')
+    failures.add_argument('results', help='database of results')
+    failures.add_argument('image', help='base image of the file system')
+    failures.add_argument('log', help='log of the writes to the image')
+    failures.add_argument('--group-size', type=int, default=3,
+                          help='size of the permutation window of the run')
+    failures.add_argument('--sector-size', type=int, default=None,
+                          help='fragment size of writes of the run')
+    failures.add_argument('--skip-noop', action='store_true',
+                          help='the run skipped writes not changing the '
+                               'image')
+    failures.add_argument('--first-window', type=int, default=None,
+                          help='lowest window number of listed states')
+    failures.add_argument('--last-window', type=int, default=None,
+                          help='highest window number of listed states')
+    failures.add_argument('--checker', default=None,
+                          help='list only failures of the checker command')
+    failures.add_argument('--output', default=None,
+                          help='file for results in JSON lines format, '
+                               'standard output by default')
+
+    coordinate = commands.add_parser(
+        'coordinate', help='hand out windows to workers connecting over '
+                           'network')
+    _add_state_options(coordinate)
+    coordinate.add_argument('--listen', type=parse_address, required=True,
+                            help='address to listen on, "host:port" or path '
+                                 'of a Unix socket')
+    coordinate.add_argument('--unit-cost', type=float, default=None,
+                            help='estimated cost of a unit of work, in '
+                                 'states')
+    coordinate.add_argument('--lease', type=float, default=600.0,
+                            help='time in seconds after which work of a '
+                                 'silent worker is given to other worker')
+    coordinate.add_argument('--output', default=None,
+                            help='file for results in JSON lines format, '
+                                 'standard output by default')
+
+    work = commands.add_parser(
+        'work', help='check windows handed out by a coordinator')
+    _add_state_options(work)
+    _add_checker_options(work)
+    work.add_argument('--connect', type=parse_address, required=True,
+                      help='address of the coordinator, "host:port" or path '
+                           'of a Unix socket')
+    work.add_argument('--name', default=None,
+                      help='name of the worker, host name by default')
+
+    minimize = commands.add_parser(
+        'minimize', help='find the smallest state failing like a given '
+                         'state')
+    _add_state_options(minimize)
+    _add_checker_options(minimize)
+    minimize.add_argument('--window', type=int, required=True,
+                          help='window number of the failing state')
+    minimize.add_argument('--rank', type=int, required=True,
+                          help='rank of the failing state in the window')
+    minimize.add_argument('--output', default=None,
+                          help='file for the minimised state in JSON '
+                               'format, standard output by default')
+    return parser
+
+
+def _add_state_options(parser):
+    """Add arguments selecting the tested states."""
+    parser.add_argument('image', help='base image of the file system')
+    parser.add_argument('log', help='log of the writes to the image')
+    parser.add_argument('--group-size', type=int, default=3,
+                        help='size of the permutation window')
+    parser.add_argument('--sector-size', type=int, default=None,
+                        help='tear writes into fragments of that size')
+    parser.add_argument('--skip-noop', action='store_true',
+                        help="don't test writes that don't change the "
+                             "image")
+    parser.add_argument('--image-dir', default='/tmp',
+                        help='directory for temporary images')
+
+
+def _add_checker_options(parser):
+    """Add arguments of the checking of states."""
+    parser.add_argument('--checker', required=True, action='append',
+                        help='command checking the image, "{image}" is '
+                             'replaced with the image name, otherwise the '
+                             'name is appended; when repeated, the '
+                             'commands run from the first one and the '
+                             'next one runs only if the check fails')
+    parser.add_argument('--magic', default=None,
+                        choices=sorted(MagicChecker.MAGICS),
+                        help='fail images with bad superblock magic of the '
+                             'file system without running the checker')
+    parser.add_argument('--known-images', default=None,
+                        help='file with digests of images that passed, '
+                             'images in it are not checked again')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='time limit of a single check in seconds')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes, number of CPUs '
+                             'by default')
+
+
+def checker_for(args):
+    """Return the checker, or chain of checkers, selected by arguments."""
+    commands = [CommandChecker(shlex.split(i), args.timeout)
+                for i in args.checker]
+    if len(commands) == 1 and args.magic is None and \
+            args.known_images is None:
+        return commands[0]
+    tiers = []
+    if args.magic is not None:
+        tiers.append(Tier(MagicChecker(args.magic)))
+    if args.known_images is not None:
+        tiers.append(Tier(KnownImageChecker(args.known_images)))
+    for command in commands[:-1]:
+        tiers.append(Tier(command, (CheckResult.FAILED, CheckResult.TIMEOUT,
+                                    CheckResult.ERROR)))
+    tiers.append(Tier(commands[-1]))
+    return CheckerChain(tiers)
+
+
+def source_for(args):
+    """Return L{StateSource} with the writes selected by arguments."""
+    return StateSource(args.image, args.log, args.sector_size,
+                       args.group_size if args.skip_noop else None,
+                       shared_payloads=True)
+
+
+def shuffler_for(args):
+    """Return L{WritesShuffler} with the writes selected by arguments."""
+    writes = LogReader(args.log).reader(lazy=True)
+    if args.sector_size:
+        writes = Fragmenter(args.sector_size).fragment(writes)
+    if args.skip_noop:
+        writes = NoopFilter(args.image, args.group_size).filter(writes)
+    shuffler = WritesShuffler(Image(args.image, []), writes)
+    shuffler.image_dir = args.image_dir
+    return shuffler
+
+
+def _write_result(output, result):
+    """Write L{StateResult} as a JSON line."""
+    output.write(json.dumps(result.to_dict(), sort_keys=True))
+    output.write('\n')
+    output.flush()
+
+
+def _drop_unfinished(output_name, checkpoint_name):
+    """
+    Remove results of states not completed in the checkpoint from output.
+
+    The checkpoint is saved only from time to time, so after a crash the
+    output can have results of states that the resumed run checks again.
+    """
+    checkpoint = Checkpoint(checkpoint_name)
+    if not checkpoint.load() or not os.path.exists(output_name):
+        return
+    kept = []
+    with open(output_name) as output:
+        for line in output:
+            # the last line may be cut short by the crash
+            if not line.endswith('\n'):
+                break
+            result = json.loads(line)
+            if checkpoint.is_done((result['window'], result['rank'])):
+                kept.append(line)
+    handle, temp_name = tempfile.mkstemp(
+        prefix='.fsresck-output.',
+        dir=os.path.dirname(os.path.abspath(output_name)))
+    with os.fdopen(handle, 'w') as output:
+        output.writelines(kept)
+    os.rename(temp_name, output_name)
+
+
+def run(args, output):
+    """Check all selected states, return number of failed checks."""
+    checker = checker_for(args)
+    source = source_for(args)
+    if args.pipeline:
+        return _run_pipeline(args, checker, source, output)
+    store = None
+    digests = None
+    if args.results is not None:
+        store = ResultStore(args.results)
+        digests = (file_digest(args.image), source.log_digest)
+    checkpoint = None
+    after = None
+    if args.checkpoint is not None:
+        checkpoint = Checkpoint(args.checkpoint)
+        if checkpoint.load():
+            after = checkpoint.position
+    driver = Driver(checker, args.workers, args.image_dir, store=store,
+                    digests=digests, source=source, checkpoint=checkpoint)
+    sampler = None
+    if args.max_states is None and args.max_seconds is None:
+        states = source.specs(args.group_size, args.shard, after=after)
+    else:
+        sampler = StratifiedSampler(
+            [len(space) for _, space in
+             source.shuffler().window_spaces(args.group_size)],
+            args.strata)
+        states = ((window, rank, source.spec(window, rank, args.group_size))
+                  for window, rank in sampler.generate(args.max_states,
+                                                       args.max_seconds))
+    scheduler = None
+    ahead = None
+    if args.prioritize:
+        scheduler = PriorityScheduler(states, HeuristicScorer(source.writes),
+                                      args.lookahead, args.lookahead_windows)
+        states = scheduler
+        ahead = scheduler.ahead
+    failed = 0
+    checked = 0
+    try:
+        for result in driver.run(states, ahead):
+            checked += 1
+            if not result.result.passed:
+                failed += 1
+            if scheduler is not None:
+                scheduler.report(result)
+            if sampler is not None:
+                sampler.report(result.window_number,
+                               not result.result.passed)
+            _write_result(output, result)
+    finally:
+        if store is not None:
+            store.close()
+    sys.stderr.write("{0} states checked ({1} cached), {2} failed\n"
+                     .format(checked, driver.cached, failed))
+    for name, (runs, duration) in sorted(driver.tier_timing.items()):
+        sys.stderr.write("{0}: {1} runs, {2:.3f}s\n"
+                         .format(name, runs, duration))
+    for stratum in sampler.coverage() if sampler is not None else ():
+        sys.stderr.write("windows {0}-{1}: {2} of {3} states ({4:.2%}), "
+                         "{5} failed\n".format(stratum.first,
+                                               stratum.last - 1,
+                                               stratum.sampled, stratum.total,
+                                               stratum.coverage,
+                                               stratum.failed))
+    return failed
+
+
+def _run_pipeline(args, checker, source, output):
+    """Check states with L{CheckPipeline}, return number of failed checks."""
+    # the module uses async/await, so it's imported only on Python 3.5+
+    from .pipeline import CheckPipeline
+
+    workers = args.workers
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pipeline = CheckPipeline(checker, args.image_dir, checkers=workers)
+    failed = []
+
+    def on_result(result):
+        """Write result leaving the pipeline."""
+        if not result.result.passed:
+            failed.append(result)
+        _write_result(output, result)
+
+    shuffler = source.shuffler()
+    shuffler.image_dir = args.image_dir
+    try:
+        pipeline.run_sync(shuffler.ranked_generator(args.group_size,
+                                                    args.shard),
+                          on_result)
+    finally:
+        shuffler.cleanup()
+    sys.stderr.write("{0} states checked, {1} failed\n"
+                     .format(pipeline.processed['check'], len(failed)))
+    for stage in pipeline.stages:
+        sys.stderr.write("{0}: {1} items, {2:.3f}s busy\n"
+                         .format(stage.name, pipeline.processed[stage.name],
+                                 pipeline.busy_time[stage.name]))
+    return len(failed)
+
+
+def _time_check(checker, image_name, image_dir):
+    """Return time of copying the image and checking the copy."""
+    start = time.time()
+    name = get_temp_file_name(image_dir)
+    try:
+        copy(image_name, name)
+        checker.check(name)
+    finally:
+        os.unlink(name)
+    return time.time() - start
+
+
+def plan(args, output):
+    """Write the number of states and projected time of a run as JSON."""
+    planner = Planner(args.image, args.log, args.group_size,
+                      fragmenter=Fragmenter(args.sector_size)
+                      if args.sector_size else None,
+                      noop_horizon=args.group_size if args.skip_noop
+                      else None)
+    run_plan = planner.plan(keep_windows=False)
+    state_seconds = args.state_seconds
+    if state_seconds is None and args.checker is not None:
+        state_seconds = _time_check(CommandChecker(shlex.split(args.checker)),
+                                    args.image, args.image_dir)
+    workers = args.workers
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    summary = {'windows': run_plan.window_count, 'states': run_plan.states,
+               'max_window_states': run_plan.max_window_states,
+               'io_bytes': run_plan.io_bytes, 'state_seconds': state_seconds,
+               'workers': workers, 'seconds': None}
+    if state_seconds is not None:
+        summary['seconds'] = \
+            run_plan.projected_seconds(state_seconds) / workers
+    output.write(json.dumps(summary, sort_keys=True))
+    output.write('\n')
+    sys.stderr.write("{0} states in {1} windows\n".format(
+        run_plan.states, run_plan.window_count))
+    if summary['seconds'] is not None:
+        sys.stderr.write("about {0:.0f}s with {1} workers\n".format(
+            summary['seconds'], workers))
+    return 0
+
+
+def failures(args, output):
+    """List failed states stored in database, return their number."""
+    digests = (file_digest(args.image), source_for(args).log_digest)
+    checker = None
+    if args.checker is not None:
+        # the name as the checker created from the same command reports it
+        checker = CommandChecker(shlex.split(args.checker)).name
+    with ResultStore(args.results) as store:
+        results = store.failing(digests[0], digests[1], args.first_window,
+                                args.last_window, checker)
+    for result in results:
+        _write_result(output, result)
+    return len(results)
+
+
+def coordinate(args, output):
+    """Hand out windows to workers, return number of failed checks."""
+    cost_model = CostModel()
+    costs = [cost_model.window_cost(len(space)) for _, space in
+             shuffler_for(args).window_spaces(args.group_size)]
+
+    def on_result(result):
+        """Write result received from a worker."""
+        _write_result(output, result)
+
+    coordinator = Coordinator(costs, args.unit_cost, args.lease, on_result)
+    coordinator.serve(coordinator.listen(args.listen))
+    progress = coordinator.progress()
+    sys.stderr.write("{0} states checked, {1} failed, {2} units requeued, "
+                     "{3} stolen\n".format(progress['states'],
+                                           progress['failed'],
+                                           progress['requeued'],
+                                           progress['stolen']))
+    return progress['failed']
+
+
+def work(args, _):
+    """Check windows handed out by coordinator."""
+    checker = checker_for(args)
+    workers = 1 if args.workers is None else args.workers
+    worker = Worker(args.connect, lambda: shuffler_for(args), checker,
+                    args.group_size, workers, args.image_dir, args.name)
+    worker.run()
+    sys.stderr.write("{0} units with {1} states checked\n".format(
+        worker.units, worker.states))
+    return 0
+
+
+def minimize(args, output):
+    """Minimise a failing state and write it as JSON."""
+    source = source_for(args)
+    spec = source.spec(args.window, args.rank, args.group_size)
+    minimizer = Minimizer(source, checker_for(args), args.image_dir)
+    spec, result = minimizer.minimize(spec)
+    state = result.to_dict()
+    state['base_index'] = spec.base_index
+    state['draw_group'] = list(spec.draw_group)
+    state['writes'] = [[i.offset, i.length, i.disk_id]
+                       for i in source.draw_group(spec)]
+    output.write(json.dumps(state, sort_keys=True))
+    output.write('\n')
+    sys.stderr.write("{0} checks\n".format(minimizer.checks))
+    return 0
+
+
+COMMANDS = {'run': run, 'plan': plan, 'failures': failures,
+            'coordinate': coordinate, 'work': work, 'minimize': minimize}
+
+
+def main(argv=None):
+    """Run the command line interface, return exit status."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    budget = getattr(args, 'max_states', None) is not None or \
+        getattr(args, 'max_seconds', None) is not None
+    if getattr(args, 'shard', None) is not None and budget:
+        parser.error("--shard can't be used with --max-states or "
+                     "--max-seconds")
+    checkpoint = getattr(args, 'checkpoint', None)
+    if checkpoint is not None and (budget or args.prioritize):
+        parser.error("--checkpoint can't be used with --prioritize, "
+                     "--max-states or --max-seconds")
+    if checkpoint is not None and args.output is None:
+        parser.error("--checkpoint needs --output")
+    if getattr(args, 'pipeline', False):
+        if sys.version_info < (3, 5):
+            parser.error("--pipeline needs Python 3.5 or later")
+        if budget or args.prioritize or checkpoint is not None or \
+                args.results is not None:
+            parser.error("--pipeline can't be used with --results, "
+                         "--checkpoint, --prioritize, --max-states or "
+                         "--max-seconds")
+    command = COMMANDS[args.command]
+    if getattr(args, 'output', None) is None:
+        failed = command(args, sys.stdout)
+    else:
+        mode = 'w'
+        if checkpoint is not None and os.path.exists(checkpoint):
+            _drop_unfinished(args.output, checkpoint)
+            mode = 'a'
+        with open(args.output, mode) as output:
+            failed = command(args, output)
+    return 1 if failed else 0
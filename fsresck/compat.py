@@ -21,6 +21,14 @@
 """Python 2 and Python 3 compatibility."""
 
 import sys
+from array import array
+
+try:
+    UINT64 = array('Q').typecode
+except ValueError:
+    # Python 2 has no 'Q', 'L' has 64 bits on 64 bit Unix platforms,
+    # elsewhere values past 2**32 raise OverflowError
+    UINT64 = 'L'
 
 
 if sys.version_info >= (3, 0):
@@ -0,0 +1,432 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Parallel checking of generated images."""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+
+from . import utils
+from .checkers import CheckResult
+from .errors import FSError
+from .image import Image, apply_writes
+from .signature import state_signature
+from .statespec import StateSpec
+
+
+class StateResult(object):
+
+    """Result of checking a single state."""
+
+    def __init__(self, window_number, rank, draw_group, result,
+                 cached=False):
+        """
+        Create object.
+
+        @param window_number: number of the permutation window of the state
+        @param rank: rank of the state in the window
+        @param draw_group: tuples of offset, length and disk_id of the
+            writes applied out of order
+        @type result: L{CheckResult}
+        @param result: outcome of the check
+        @param cached: set if the result comes from a L{ResultStore}
+        """
+        self.window_number = window_number
+        self.rank = rank
+        self.draw_group = draw_group
+        self.result = result
+        self.cached = cached
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "StateResult(window_number={0!r}, rank={1!r}, "\
+            "result={2!r})".format(self.window_number, self.rank,
+                                   self.result)
+
+    def to_dict(self):
+        """Return result as a dictionary that can be serialised to JSON."""
+        ret = self.result.to_dict()
+        ret['window'] = self.window_number
+        ret['rank'] = self.rank
+        ret['draw_group'] = [list(i) for i in self.draw_group]
+        ret['cached'] = self.cached
+        return ret
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create object from the output of L{to_dict}."""
+        result = CheckResult(data['status'], data['returncode'],
+                             data['output'].encode('utf-8'),
+                             data['duration'], data['checker'],
+                             data.get('tiers'))
+        return cls(data['window'], data['rank'],
+                   tuple(tuple(i) for i in data['draw_group']), result,
+                   data['cached'])
+
+
+# source of writes of states and checker in worker processes, see
+# _init_worker
+_worker_source = None
+_worker_checker = None
+
+
+def _init_worker(source, checker):
+    """Set the L{StateSource} and the checker of the worker process."""
+    global _worker_source, _worker_checker  # pylint: disable=global-statement
+    _worker_source = source
+    _worker_checker = checker
+
+
+def check_state(task, source=None):
+    """
+    Materialise a state and check it.
+
+    Run in the worker processes, the task is a tuple of window number,
+    rank, name of the image of the window with in-order writes applied,
+    draw group, checker and directory for the temporary image. The draw
+    group can be a L{StateSpec}, then the writes are taken from source,
+    the source of the worker process by default. Without checker, the
+    checker of the worker process is used.
+    """
+    window_number, rank, window_image, draw_group, checker, image_dir = task
+    if checker is None:
+        checker = _worker_checker
+    if isinstance(draw_group, StateSpec):
+        if source is None:
+            source = _worker_source
+        draw_group = source.draw_group(draw_group)
+    writes = tuple((i.offset, i.length, i.disk_id) for i in draw_group)
+    image = Image(window_image, draw_group)
+    try:
+        try:
+            image_name = image.create_image(image_dir)
+        except (FSError, IOError, OSError) as exc:
+            result = CheckResult(CheckResult.ERROR,
+                                 output=str(exc).encode('utf-8'),
+                                 checker=getattr(checker, 'name', None))
+        else:
+            result = checker.check(image_name)
+    finally:
+        # also when interrupted, the image may be only partially created
+        if image.temp_image_name is not None:
+            image.cleanup()
+    return StateResult(window_number, rank, writes, result)
+
+
+class WindowImages(object):
+
+    """
+    Images of windows shared by the checks of their states.
+
+    The image of a window (base image with the in-order writes applied) is
+    created by applying the new in-order writes to a running copy of the
+    base image, so creating images of consecutive windows doesn't copy or
+    write the whole log again. The image is removed once all states that
+    use it were released and a different window was acquired. Methods can
+    be called from different threads.
+
+    When windows are acquired out of order, the log would be replayed from
+    the base image for every earlier window. Windows that are known to be
+    acquired later (see L{ahead}) get their images created on the way to
+    a later window instead and kept until they are acquired.
+    """
+
+    def __init__(self, image_dir="/tmp", ahead=None):
+        """
+        Create object.
+
+        @param image_dir: directory for the images
+        @param ahead: container with numbers of windows that will be
+            acquired later, like L{PriorityScheduler.ahead}; the number of
+            a window is the number of its in-order writes, like in
+            L{WritesShuffler.windows}
+        """
+        self.image_dir = image_dir
+        self.ahead = () if ahead is None else ahead
+        self._lock = threading.Lock()
+        self._running = None
+        self._running_source = None
+        self._applied = 0
+        self._current = None
+        # window number -> name of image and number of acquired states
+        self._windows = {}
+
+    def acquire(self, window_number, image):
+        """
+        Return name of the image of the window for a state.
+
+        @param window_number: number of the window
+        @type image: L{Image}
+        @param image: base image with the in-order writes of the window
+        """
+        with self._lock:
+            self._current = window_number
+            if window_number not in self._windows:
+                self._windows[window_number] = [self._create(image), 0]
+            entry = self._windows[window_number]
+            entry[1] += 1
+            for number in list(self._windows):
+                self._remove_unused(number)
+            return entry[0]
+
+    def release(self, window_number):
+        """Mark a state of the window as done."""
+        with self._lock:
+            self._windows[window_number][1] -= 1
+            self._remove_unused(window_number)
+
+    def cleanup(self):
+        """Remove all images."""
+        with self._lock:
+            for name, _ in self._windows.values():
+                os.unlink(name)
+            self._windows = {}
+            self._current = None
+            self._drop_running()
+
+    def __len__(self):
+        """Return number of existing window images."""
+        return len(self._windows)
+
+    def _create(self, image):
+        """Create the image of a window and return its name."""
+        writes = image.writes
+        if self._running_source != image.image_name or \
+                self._applied > len(writes):
+            self._drop_running()
+        if self._running is None:
+            self._running = utils.get_temp_file_name(self.image_dir)
+            utils.copy(image.image_name, self._running)
+            self._running_source = image.image_name
+        for number in sorted(i for i in self.ahead
+                             if self._applied <= i < len(writes) and
+                             i not in self._windows):
+            apply_writes(self._running, writes[self._applied:number])
+            self._applied = number
+            self._windows[number] = [self._copy_running(), 0]
+        apply_writes(self._running, writes[self._applied:])
+        self._applied = len(writes)
+        return self._copy_running()
+
+    def _copy_running(self):
+        """Return name of a new copy of the running image."""
+        name = utils.get_temp_file_name(self.image_dir)
+        utils.copy(self._running, name)
+        return name
+
+    def _drop_running(self):
+        """Remove the running image."""
+        if self._running is not None:
+            os.unlink(self._running)
+        self._running = None
+        self._running_source = None
+        self._applied = 0
+
+    def _remove_unused(self, window_number):
+        """Remove the image of a window if it isn't needed any more."""
+        name, count = self._windows[window_number]
+        if not count and window_number != self._current and \
+                window_number not in self.ahead:
+            os.unlink(name)
+            del self._windows[window_number]
+
+
+class Driver(object):
+
+    """
+    Runner of a checker over states in a pool of worker processes.
+
+    The images of windows are created in the main process, see
+    L{WindowImages}. Workers copy the image of the window, apply the draw
+    group and run the checker, so only the names of files and the writes
+    of the draw group are sent to them.
+    """
+
+    def __init__(self, checker, workers=None, image_dir="/tmp",
+                 max_pending=None, store=None, digests=None, source=None,
+                 checkpoint=None):
+        """
+        Create object.
+
+        @param checker: object with a C{check(image_name)} method returning
+            L{CheckResult}, like L{CommandChecker}, needs to be picklable;
+            it's sent to every worker process once
+        @param workers: number of worker processes, the number of CPUs by
+            default, with 1 the checks run in the main process
+        @param image_dir: directory in which every run creates a directory
+            for its temporary images, removed when the run ends
+        @param max_pending: largest number of states submitted to workers
+            and not yet returned, twice the number of workers by default
+        @type store: L{ResultStore}
+        @param store: database of results, states with stored results of
+            the checker are not checked again, new results are saved in it
+        @type digests: tuple
+        @param digests: digests of the base image and the log, required
+            with store
+        @type source: L{StateSource}
+        @param source: writes of the states given as L{StateSpec}, worker
+            processes read their own copy of the writes
+        @type checkpoint: L{Checkpoint}
+        @param checkpoint: progress of the run, states it has as completed
+            are skipped; a state is completed when the consumer asks for
+            the result after it, the progress is saved also when the run
+            stops
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if store is not None and digests is None:
+            raise ValueError("digests are required with store")
+        self.checker = checker
+        self.workers = workers
+        self.image_dir = image_dir
+        self.max_pending = 2 * workers if max_pending is None \
+            else max_pending
+        self.store = store
+        self.digests = digests
+        self.source = source
+        self.checkpoint = checkpoint
+        self.cached = 0
+        # number of runs and total time of the tiers of a CheckerChain
+        self.tier_timing = {}
+
+    def run(self, states, ahead=None):
+        """
+        Check states and return generator of L{StateResult}.
+
+        Results are returned in the order of states. At most
+        L{max_pending} states are materialised or checked at the same
+        time, so the states are read only as fast as they are checked.
+
+        @param states: tuples of window number, rank, L{Image} and draw
+            group, like returned by L{WritesShuffler.ranked_generator}, or
+            tuples of window number, rank and L{StateSpec}, like returned
+            by L{StateSource.specs}; only the specification is sent to the
+            worker processes then
+        @param ahead: container with numbers of windows of states not
+            returned by states yet, like L{PriorityScheduler.ahead}, see
+            L{WindowImages}
+        """
+        # all images of the run are in a directory of their own, so images
+        # of checks killed with the worker pool are removed with it
+        image_dir = tempfile.mkdtemp(prefix='fsresck.', dir=self.image_dir)
+        pool = None
+        images = WindowImages(image_dir, ahead)
+        # submitted states or cached results, with the state signatures
+        pending = deque()
+        try:
+            if self.workers > 1:
+                if self.source is not None:
+                    self.source.load()
+                pool = multiprocessing.Pool(self.workers, _init_worker,
+                                            (self.source, self.checker))
+            for state in states:
+                if self.checkpoint is not None:
+                    if self.checkpoint.is_done(state[:2]):
+                        continue
+                    self.checkpoint.issue(state[:2])
+                if len(state) == 3:
+                    window_number, rank, draw_group = state
+                    image = self.source.image(draw_group)
+                else:
+                    window_number, rank, image, draw_group = state
+                signature = None
+                if self.store is not None:
+                    writes = draw_group
+                    if isinstance(draw_group, StateSpec):
+                        writes = self.source.draw_group(draw_group)
+                    signature = state_signature(len(image.writes), writes)
+                    cached = self._lookup(window_number, signature)
+                    if cached is not None:
+                        cached.rank = rank
+                        pending.append((cached, None))
+                        continue
+                window_image = images.acquire(window_number, image)
+                # workers got the checker when started, so that its state
+                # (like digests of a KnownImageChecker) lives across tasks
+                task = (window_number, rank, window_image, draw_group,
+                        self.checker if pool is None else None, image_dir)
+                if pool is None:
+                    pending.append((check_state(task, self.source),
+                                    signature))
+                else:
+                    pending.append((pool.apply_async(check_state, (task, )),
+                                    signature))
+
+                while len(pending) >= max(self.max_pending, 1):
+                    result = self._collect(pending.popleft(), images)
+                    yield result
+                    self._complete(result)
+            while pending:
+                result = self._collect(pending.popleft(), images)
+                yield result
+                self._complete(result)
+            if pool is not None:
+                pool.close()
+                pool.join()
+                pool = None
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            images.cleanup()
+            shutil.rmtree(image_dir, ignore_errors=True)
+            if self.checkpoint is not None:
+                self.checkpoint.save()
+
+    def _complete(self, result):
+        """Record in checkpoint that the result was processed."""
+        if self.checkpoint is not None:
+            self.checkpoint.complete((result.window_number, result.rank))
+
+    def _lookup(self, window_number, signature):
+        """Return stored result of the state or None."""
+        base_digest, log_digest = self.digests
+        result = self.store.lookup(base_digest, log_digest, window_number,
+                                   signature,
+                                   getattr(self.checker, 'name', None))
+        if result is not None:
+            self.cached += 1
+        return result
+
+    def _collect(self, pending, images):
+        """Return result of a submitted state, release its window image."""
+        result, signature = pending
+        if isinstance(result, StateResult) and result.cached:
+            return result
+        if not isinstance(result, StateResult):
+            result = result.get()
+        images.release(result.window_number)
+        for name, _, duration in result.result.tiers or ():
+            timing = self.tier_timing.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += duration
+        if self.store is not None:
+            base_digest, log_digest = self.digests
+            self.store.store(base_digest, log_digest, signature, result)
+        return result
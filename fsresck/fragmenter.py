@@ -25,20 +25,112 @@
 
 """Methods to fragment list of writes."""
 
-from .write import Write
+
+class AtomicityRules(object):
+
+    """
+    Description of write atomicity guarantees of a single disk.
+
+    The disk writes every aligned block of L{unit_size} bytes atomically.
+    Writes that span at most L{atomic_units} of such blocks and do not cross
+    a boundary aligned to C{atomic_units * unit_size} are atomic as a whole
+    and will never be torn.
+    """
+
+    def __init__(self, unit_size=512, atomic_units=1, inherit_times=True):
+        """
+        Create an object.
+
+        @type unit_size: int
+        @param unit_size: size of the smallest atomically written block
+        @type atomic_units: int
+        @param atomic_units: number of units that are guaranteed to be
+            written atomically if the write does not cross an aligned
+            boundary of that size
+        @type inherit_times: bool
+        @param inherit_times: if set, fragments of a write get the start and
+            end time of the write they were cut from, so they keep the
+            ordering of the parent write relative to other writes
+        """
+        if unit_size <= 0:
+            raise ValueError("unit_size must be positive")
+        if atomic_units < 1:
+            raise ValueError("atomic_units must be at least 1")
+        self.unit_size = unit_size
+        self.atomic_units = atomic_units
+        self.inherit_times = inherit_times
+
+    def is_atomic(self, write):
+        """Check if the write is guaranteed to reach disk as a whole."""
+        boundary = self.unit_size * self.atomic_units
+        length = write.length
+        if length > boundary:
+            return False
+        if not length:
+            return True
+        return write.offset // boundary == \
+            (write.offset + length - 1) // boundary
 
 
 class Fragmenter(object):
 
     """Object for fragmenting a list of writes further."""
 
-    def __init__(self, sector_size=512):
+    def __init__(self, sector_size=512, rules=None):
         """
         Create an object.
 
-        @param sector_size: maximum size of the generated fragments
+        @param sector_size: maximum size of the generated fragments for
+            disks that don't have explicit atomicity rules
+        @type rules: L{AtomicityRules} or dict
+        @param rules: atomicity rules for all disks or a dictionary with
+            rules for specific disk_id's
         """
         self.sector_size = sector_size
+        self.rules = rules
+
+    def rules_for(self, disk_id):
+        """Return the atomicity rules for given disk."""
+        if isinstance(self.rules, AtomicityRules):
+            return self.rules
+        if self.rules and disk_id in self.rules:
+            return self.rules[disk_id]
+        return AtomicityRules(unit_size=self.sector_size)
+
+    def fragment_write(self, write):
+        """
+        Return a list of fragments that the write can be torn into.
+
+        Fragments are cut on absolute boundaries of the atomic unit of the
+        device, so a write that starts or ends in the middle of a unit
+        will have a short first or last fragment. Fragments are created with
+        L{Write.slice}, so no payload is copied (and fragments of lazy writes
+        are lazy too). Writes that are atomic as a whole are returned
+        as the only element of the list.
+
+        @type write: L{Write}
+        @param write: write to split
+        """
+        rules = self.rules_for(write.disk_id)
+        if rules.is_atomic(write):
+            return [write]
+
+        unit_size = rules.unit_size
+        length = write.length
+        offset = write.offset
+        ret = []
+        # first cut is on the first unit boundary after the start
+        end = unit_size - offset % unit_size
+        start = 0
+        while start < length:
+            end = min(end, length)
+            fragment = write.slice(start, end)
+            if rules.inherit_times:
+                fragment.set_times(write.start_time, write.end_time)
+            ret.append(fragment)
+            start = end
+            end += unit_size
+        return ret
 
     def fragment(self, writes):
         """
@@ -47,10 +139,5 @@ class Fragmenter(object):
         @param writes: list of Write objects
         """
         for write in writes:
-            data = write.data
-            offset = write.offset
-            while data:
-                ret = Write(offset, data[:self.sector_size])
-                offset += len(ret.data)
-                data = data[self.sector_size:]
-                yield ret
+            for fragment in self.fragment_write(write):
+                yield fragment
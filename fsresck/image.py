@@ -28,6 +28,14 @@ import os
 from . import utils
 
 
+def apply_writes(image_name, writes):
+    """Apply writes to an image file, in order."""
+    with open(image_name, "r+b") as image:
+        for write in writes:
+            image.seek(write.offset)
+            image.write(write.data)
+
+
 class Image(object):
 
     """
@@ -64,11 +72,7 @@ class Image(object):
 
             utils.copy(self.image_name, self.temp_image_name)
 
-            # apply writes to the copied image
-            with open(self.temp_image_name, "r+b") as image:
-                for write in self.writes:
-                    image.seek(write.offset)
-                    image.write(write.data)
+            apply_writes(self.temp_image_name, self.writes)
 
         return self.temp_image_name
 
@@ -81,3 +85,71 @@ class Image(object):
         """
         os.unlink(self.temp_image_name)
         self.temp_image_name = None
+
+
+class ImageSet(object):
+
+    """
+    Object for creating temporary copies of member images of a disk set.
+
+    Keeps the images of all devices of a multi device storage (like MD RAID
+    or multi device btrfs) together with writes to all of them, so that
+    the member images are created and removed together. Writes are
+    assigned to images by their disk_id.
+    """
+
+    def __init__(self, image_names, writes):
+        """
+        Combine member disk images with writes.
+
+        @type image_names: dict
+        @param image_names: names of the image files keyed by disk_id
+        @param writes: writes to all the member images, in order
+        """
+        self.image_names = image_names
+        self.writes = writes
+        self.images = None
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "ImageSet(image_names={0!r}, writes={1!r})".format(
+            self.image_names, self.writes)
+
+    def member_images(self):
+        """Return dictionary with L{Image} of every member disk."""
+        writes = dict((disk_id, []) for disk_id in self.image_names)
+        for write in self.writes:
+            if write.disk_id not in writes:
+                raise ValueError("Write to unknown disk: {0!r}"
+                                 .format(write.disk_id))
+            writes[write.disk_id].append(write)
+        return dict((disk_id, Image(name, writes[disk_id]))
+                    for disk_id, name in self.image_names.items())
+
+    def create_images(self, path):
+        """
+        Create temporary image files of all member disks.
+
+        Returns dictionary with names of the temporary files keyed by
+        disk_id.
+        """
+        if self.images is None:
+            images = self.member_images()
+            try:
+                for image in images.values():
+                    image.create_image(path)
+            except Exception:
+                for image in images.values():
+                    if image.temp_image_name is not None:
+                        image.cleanup()
+                raise
+            self.images = images
+
+        return dict((disk_id, image.temp_image_name)
+                    for disk_id, image in self.images.items())
+
+    def cleanup(self):
+        """Remove temporary image files of all member disks."""
+        for image in self.images.values():
+            image.cleanup()
+        self.images = None
@@ -26,10 +26,11 @@
 """Slicing log files for tests."""
 
 import struct
-from collections import deque
 from itertools import islice
 from .image import Image
-from .write import Write
+from .sequence import AppendLog
+from .ranking import WindowSpace
+from .write import Write, LazyWrite
 from .errors import TruncatedFileError
 
 
@@ -96,9 +97,19 @@ class LogReader(object):
             raise TruncatedFileError("truncated file")
         return data
 
-    def reader(self):
-        """Generator for reads in file."""
+    def reader(self, lazy=False):
+        """
+        Generator for reads in file.
+
+        @type lazy: bool
+        @param lazy: return L{LazyWrite} objects that reference the data in
+            the log file instead of reading it to memory
+        """
         with open(self.log_name, 'rb') as log:
+            if lazy:
+                log.seek(0, 2)
+                log_size = log.tell()
+                log.seek(0)
             while True:
                 try:
                     header_data = self._read_exact(log,
@@ -108,9 +119,16 @@ class LogReader(object):
 
                 header = LogHeader().parse(header_data)
 
-                data = self._read_exact(log, header.length)
-
-                write = Write(offset=header.offset, data=data)
+                if lazy:
+                    data_offset = log.tell()
+                    if data_offset + header.length > log_size:
+                        raise TruncatedFileError("truncated file")
+                    log.seek(header.length, 1)
+                    write = LazyWrite(header.offset, self.log_name,
+                                      data_offset, header.length)
+                else:
+                    data = self._read_exact(log, header.length)
+                    write = Write(offset=header.offset, data=data)
                 write.set_times(header.start_time, header.end_time)
 
                 yield write
@@ -121,7 +139,9 @@ class BaseImageGenerator(object):
     """
     Generator for pairs of images and writes to test.
 
-    Tests ops_to_test at a time by default
+    Tests ops_to_test at a time by default. When lazy_payloads is set, the
+    writes reference their data in the log file and read it only when it
+    is needed, so the memory use does not depend on the size of the data.
     """
 
     def __init__(self, image_name, log_name):
@@ -129,25 +149,60 @@ class BaseImageGenerator(object):
         self.image_name = image_name
         self.log_name = log_name
         self.ops_to_test = 5
-
-    def generate(self):
-        """Create tuples of Image and writes to test."""
+        self.lazy_payloads = False
+
+    def generate(self, shard=None, window_cost=None):
+        """
+        Create tuples of Image and writes to test.
+
+        All writes are kept in a single L{AppendLog}, both the writes of
+        the Image and the writes to test are views of it, so creating
+        them doesn't copy the lists of writes.
+
+        @type shard: L{Shard}
+        @param shard: return only the windows that belong to the shard,
+            the windows are split by their estimated cost, that requires
+            reading the headers of the log twice
+        @param window_cost: function returning the estimated cost of testing
+            the writes of a window, by default the number of states in the
+            window
+        """
+        if shard is None:
+            selected = None
+        else:
+            if window_cost is None:
+                window_cost = self._window_cost
+            costs = (window_cost(writes) for _, writes in
+                     self._generate(lazy=True))
+            selected = set(shard.select(costs))
+
+        for number, pair in enumerate(self._generate(self.lazy_payloads)):
+            if selected is None or number in selected:
+                yield pair
+
+    def _window_cost(self, writes):
+        """Return the number of states in a window."""
+        return len(WindowSpace(writes, self.ops_to_test))
+
+    def _generate(self, lazy):
+        """Create tuples of Image and writes to test for all windows."""
         write_log = LogReader(self.log_name)
-        log_reader = write_log.reader()
+        log_reader = write_log.reader(lazy=lazy)
 
-        writes = islice(log_reader, self.ops_to_test)
-        writes = deque(writes)
+        writes = AppendLog(islice(log_reader, self.ops_to_test))
+        start = 0
 
-        image_writes = deque()
-
-        yield (Image(self.image_name, list(image_writes)), list(writes))
+        yield (Image(self.image_name, writes.view(0, start)),
+               writes.view(start))
 
         # exhaust log_reader
         for write in log_reader:
-            image_writes.append(writes.popleft())
             writes.append(write)
-            yield (Image(self.image_name, list(image_writes)), list(writes))
-
-        while writes:
-            image_writes.append(writes.popleft())
-            yield (Image(self.image_name, list(image_writes)), list(writes))
+            start += 1
+            yield (Image(self.image_name, writes.view(0, start)),
+                   writes.view(start))
+
+        while start < len(writes):
+            start += 1
+            yield (Image(self.image_name, writes.view(0, start)),
+                   writes.view(start))
@@ -0,0 +1,189 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Minimisation of failing states by delta debugging."""
+
+import os
+
+from . import utils
+from .checkers import CheckResult
+from .image import Image, apply_writes
+from .statespec import StateSpec
+
+
+def _split(items, parts):
+    """Split list to the number of parts of almost equal length."""
+    ret = []
+    start = 0
+    for part in range(parts):
+        end = start + (len(items) - start) // (parts - part)
+        ret.append(items[start:end])
+        start = end
+    return ret
+
+
+class Minimizer(object):
+
+    """
+    Search for the smallest state that fails like a given failing state.
+
+    The draw group is reduced with the ddmin algorithm of delta debugging,
+    then the writes left are put in the order of the log if the state still
+    fails that way and at the end the lowest number of in-order writes is
+    found by bisection. A state fails like the original state if the
+    checker returns the same status. Results of the checks are cached, so
+    no state is checked twice.
+    """
+
+    def __init__(self, source, checker, image_dir="/tmp"):
+        """
+        Create object.
+
+        @type source: L{StateSource}
+        @param source: writes of the states
+        @param checker: object with a C{check(image_name)} method returning
+            L{CheckResult}
+        @param image_dir: directory for temporary images
+        """
+        self.source = source
+        self.checker = checker
+        self.image_dir = image_dir
+        # results of the checks, keyed by base index and draw group
+        self.cache = {}
+        self.checks = 0
+        self._base = None
+
+    def result(self, base_index, draw_group):
+        """
+        Return L{CheckResult} of a state.
+
+        @param base_index: number of writes of the log applied in order
+        @param draw_group: positions in the log of the writes applied
+            after them, in order
+        """
+        key = (base_index, tuple(draw_group))
+        if key not in self.cache:
+            self.checks += 1
+            image_name = utils.get_temp_file_name(self.image_dir)
+            try:
+                utils.copy(self._base_image(base_index), image_name)
+                apply_writes(image_name, (self.source.writes[i]
+                                          for i in draw_group))
+                self.cache[key] = self.checker.check(image_name)
+            finally:
+                os.unlink(image_name)
+        return self.cache[key]
+
+    def _base_image(self, base_index):
+        """Return name of image with the in-order writes applied."""
+        if self._base is not None and self._base[0] != base_index:
+            self._base[1].cleanup()
+            self._base = None
+        if self._base is None:
+            image = Image(self.source.image_name,
+                          self.source.writes.view(0, base_index))
+            image.create_image(self.image_dir)
+            self._base = (base_index, image)
+        return self._base[1].temp_image_name
+
+    def cleanup(self):
+        """Remove the temporary image of the in-order writes."""
+        if self._base is not None:
+            self._base[1].cleanup()
+            self._base = None
+
+    def ddmin(self, base_index, draw_group, status):
+        """
+        Return 1-minimal subsequence of draw group failing with status.
+
+        Removing any single write from the returned writes makes the
+        state pass or fail differently. The state with the whole draw
+        group must fail.
+        """
+        writes = list(draw_group)
+        if self.result(base_index, []).status == status:
+            return []
+        parts = 2
+        while len(writes) >= 2:
+            chunks = _split(writes, parts)
+            for chunk in chunks:
+                if self.result(base_index, chunk).status == status:
+                    writes = chunk
+                    parts = 2
+                    break
+            else:
+                for number in range(len(chunks)):
+                    complement = [write for i, chunk in enumerate(chunks)
+                                  if i != number for write in chunk]
+                    if self.result(base_index, complement).status == status:
+                        writes = complement
+                        parts = max(parts - 1, 2)
+                        break
+                else:
+                    if parts >= len(writes):
+                        break
+                    parts = min(parts * 2, len(writes))
+        return writes
+
+    def earliest_base(self, base_index, draw_group, status):
+        """
+        Return lowest base index with which the state fails with status.
+
+        Uses bisection, so it assumes that adding in-order writes to a
+        failing state doesn't make it pass. The state with base_index must
+        fail.
+        """
+        low, high = 0, base_index
+        while low < high:
+            middle = (low + high) // 2
+            if self.result(middle, draw_group).status == status:
+                high = middle
+            else:
+                low = middle + 1
+        return high
+
+    def minimize(self, spec):
+        """
+        Return L{StateSpec} of the minimised state and its L{CheckResult}.
+
+        @type spec: L{StateSpec}
+        @param spec: the failing state
+        """
+        try:
+            status = self.result(spec.base_index, spec.draw_group).status
+            if status == CheckResult.PASSED:
+                raise ValueError("State doesn't fail: {0!r}".format(spec))
+            draw_group = self.ddmin(spec.base_index, spec.draw_group, status)
+            in_order = sorted(draw_group)
+            if in_order != draw_group and \
+                    self.result(spec.base_index, in_order).status == status:
+                draw_group = in_order
+            base_index = self.earliest_base(spec.base_index, draw_group,
+                                            status)
+        finally:
+            self.cleanup()
+        return (StateSpec.from_draw_group(spec.log_id, base_index,
+                                          draw_group),
+                self.cache[(base_index, tuple(draw_group))])
@@ -0,0 +1,310 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Generation of crash states of multi device storage."""
+
+import bisect
+import heapq
+from itertools import combinations, permutations, product
+
+from .image import ImageSet
+from .write import overlapping
+
+
+class Cut(object):
+
+    """
+    State of all devices of a disk set at a single instant.
+
+    Writes that completed before the instant are persisted on their disks,
+    writes that were issued but did not complete are in flight and any
+    of them may or may not have reached the disk.
+    """
+
+    def __init__(self, time, persisted, in_flight):
+        """
+        Create object.
+
+        @param time: the instant of the crash
+        @type persisted: dict
+        @param persisted: indexes of persisted writes keyed by disk_id
+        @type in_flight: dict
+        @param in_flight: indexes of writes in flight keyed by disk_id
+        """
+        self.time = time
+        self.persisted = persisted
+        self.in_flight = in_flight
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "Cut(time={0!r}, persisted={1!r}, in_flight={2!r})".format(
+            self.time, self.persisted, self.in_flight)
+
+    @property
+    def prefixes(self):
+        """
+        Return numbers of persisted and started writes keyed by disk_id.
+
+        Writes persist in order of end times and start in order of start
+        times, so the numbers are lengths of prefixes of the writes of
+        the device in those orders and two cuts with the same numbers for
+        a device have the same states of it.
+        """
+        return dict((disk_id, (len(persisted),
+                               len(persisted) + len(self.in_flight[disk_id])))
+                    for disk_id, persisted in self.persisted.items())
+
+
+class ConsistentCutGenerator(object):
+
+    """
+    Generator of crash states where all member disks crash at once.
+
+    The crash instants are placed at the start times of writes: between
+    two consecutive starts writes can only complete, so the states of
+    a later instant are a subset of the states at the last start. For
+    every cut, the writes in flight on every device are reordered
+    independently (writes to different disks never overlap so their
+    relative order doesn't matter) and the states of the devices are
+    combined. A write in flight may also have reached the disk before
+    overlapping persisted writes that were issued or completed after it
+    was issued. States of the previous cut are not generated again (see
+    L{states}), without keeping any of them, but a state possible only at
+    cuts that are not consecutive is returned for each of them.
+
+    Every state lists all the persisted writes, so the size of the output
+    (and the time to generate it) grows with the square of the number of
+    writes.
+    """
+
+    def __init__(self, image_names, writes, group_size=3):
+        """
+        Create object.
+
+        @type image_names: dict
+        @param image_names: names of the member images keyed by disk_id
+        @param writes: writes to all member disks, with start and end times
+            set, in log order
+        @type group_size: int
+        @param group_size: largest number of in flight writes applied to
+            a single device in one state
+        """
+        self.image_names = image_names
+        self.writes = list(writes)
+        self.group_size = group_size
+        for write in self.writes:
+            if write.start_time is None or write.end_time is None:
+                raise ValueError("Writes need start and end times")
+            if write.disk_id not in image_names:
+                raise ValueError("Write to unknown disk: {0!r}"
+                                 .format(write.disk_id))
+
+    def cuts(self):
+        """
+        Return generator of cuts at start times of writes.
+
+        The writes are sorted by start time once and moved from in flight
+        to persisted as the cut time passes their end time, so the writes
+        are not scanned again for every cut.
+        """
+        writes = self.writes
+        if not writes:
+            return
+        times = sorted(set(write.start_time for write in writes))
+        times.append(max(write.end_time for write in writes))
+        order = sorted(range(len(writes)),
+                       key=lambda i: writes[i].start_time)
+        started = 0
+        ends = []
+        persisted = dict((disk_id, []) for disk_id in self.image_names)
+        in_flight = dict((disk_id, set()) for disk_id in self.image_names)
+        for time in times:
+            while started < len(order) and \
+                    writes[order[started]].start_time <= time:
+                index = order[started]
+                heapq.heappush(ends, (writes[index].end_time, index))
+                in_flight[writes[index].disk_id].add(index)
+                started += 1
+            while ends and ends[0][0] <= time:
+                _, index = heapq.heappop(ends)
+                in_flight[writes[index].disk_id].discard(index)
+                bisect.insort(persisted[writes[index].disk_id], index)
+            yield Cut(time,
+                      dict((disk_id, list(indexes))
+                           for disk_id, indexes in persisted.items()),
+                      dict((disk_id, sorted(indexes))
+                           for disk_id, indexes in in_flight.items()))
+
+    def device_groups(self, in_flight):
+        """
+        Return generator of draw groups for writes in flight on one device.
+
+        Returns tuples of indexes of writes: the empty group, all subsets
+        of up to L{group_size} writes and, for subsets of overlapping
+        writes, all their orderings.
+        """
+        yield tuple()
+        for size in range(1, min(self.group_size, len(in_flight)) + 1):
+            for subset in combinations(in_flight, size):
+                if overlapping(self.writes[i] for i in subset):
+                    for group in permutations(subset):
+                        yield group
+                else:
+                    yield subset
+
+    def positions(self, persisted, index):
+        """
+        Return positions in persisted writes where write in flight can go.
+
+        The write can be applied after all persisted writes or before any
+        overlapping persisted write that didn't complete before the write
+        was issued, as long as no overlapping write after that position
+        completed before it was issued. Positions before writes that don't
+        overlap it give the same images, so they are not returned.
+        """
+        write = self.writes[index]
+        ret = [len(persisted)]
+        for position in range(len(persisted) - 1, -1, -1):
+            other = self.writes[persisted[position]]
+            if not overlapping((write, other)):
+                continue
+            if other.end_time <= write.start_time:
+                break
+            ret.append(position)
+        return ret
+
+    def device_states(self, persisted, in_flight):
+        """
+        Return generator of sequences of writes applied to one device.
+
+        @param persisted: indexes of persisted writes of the device
+        @param in_flight: indexes of writes in flight on the device
+        """
+        seen = set()
+        for group in self.device_groups(in_flight):
+            for choice in product(*[self.positions(persisted, i)
+                                    for i in group]):
+                inserted = {}
+                for index, position in zip(group, choice):
+                    inserted.setdefault(position, []).append(index)
+                sequence = []
+                for position, index in enumerate(persisted):
+                    sequence.extend(inserted.get(position, ()))
+                    sequence.append(index)
+                sequence.extend(inserted.get(len(persisted), ()))
+                sequence = tuple(sequence)
+                if sequence not in seen:
+                    seen.add(sequence)
+                    yield sequence
+
+    def is_device_state(self, sequence, persisted, in_flight):
+        """
+        Check if sequence is returned by L{device_states} for the writes.
+
+        @param sequence: indexes of writes applied to the device, in order
+        @param persisted: indexes of persisted writes of the device
+        @type in_flight: set
+        @param in_flight: indexes of writes in flight on the device
+        """
+        inserted = []
+        position = 0
+        for index in sequence:
+            if position < len(persisted) and persisted[position] == index:
+                position += 1
+            elif index in in_flight:
+                inserted.append((position, index))
+            else:
+                return False
+        if position != len(persisted) or len(inserted) > self.group_size:
+            return False
+        # writes of groups that don't overlap are applied in log order
+        ordered = not overlapping(self.writes[i] for _, i in inserted)
+        for (position, index), (next_position, next_index) in \
+                zip(inserted, inserted[1:]):
+            if ordered and position == next_position and index > next_index:
+                return False
+        return all(position in self.positions(persisted, index)
+                   for position, index in inserted)
+
+    def states(self, cut, previous=None):
+        """
+        Return generator of states of a cut.
+
+        Every state is a tuple of pairs of disk_id and indexes of writes
+        applied to the disk, in order.
+
+        If previous cut is set, only the states that were not states of it
+        are returned. States of devices with the same L{Cut.prefixes} in
+        both cuts are all old, states of other devices are old if
+        L{is_device_state} for the previous cut. Only combinations with a
+        new state of at least one device are made: for every device with
+        new states, its new states are combined with old states of the
+        devices before it and all states of the devices after it.
+        """
+        disk_ids = sorted(self.image_names)
+        old = []
+        new = []
+        for disk_id in disk_ids:
+            sequences = list(self.device_states(cut.persisted[disk_id],
+                                                cut.in_flight[disk_id]))
+            if previous is None:
+                old.append([])
+                new.append(sequences)
+            elif previous.prefixes[disk_id] == cut.prefixes[disk_id]:
+                old.append(sequences)
+                new.append([])
+            else:
+                persisted = previous.persisted[disk_id]
+                in_flight = set(previous.in_flight[disk_id])
+                old.append([])
+                new.append([])
+                for sequence in sequences:
+                    if self.is_device_state(sequence, persisted, in_flight):
+                        old[-1].append(sequence)
+                    else:
+                        new[-1].append(sequence)
+        for device, sequences in enumerate(new):
+            if not sequences:
+                continue
+            for combination in product(*(old[:device] + [sequences] +
+                                         [i + j for i, j in
+                                          zip(old[device + 1:],
+                                              new[device + 1:])])):
+                yield tuple(zip(disk_ids, combination))
+
+    def generate(self):
+        """
+        Return generator of crash states of the disk set.
+
+        Yields pairs of the crash time and an L{ImageSet} with writes
+        applied to member disks in the state.
+        """
+        previous = None
+        for cut in self.cuts():
+            for state in self.states(cut, previous):
+                writes = [self.writes[i] for _, indexes in state
+                          for i in indexes]
+                yield cut.time, ImageSet(self.image_names, writes)
+            previous = cut
@@ -0,0 +1,174 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Removal of writes that don't modify the image."""
+
+import hashlib
+import mmap
+from collections import deque
+
+from .write import overlapping
+
+
+class NoopFilter(object):
+
+    """
+    Remove writes that write data identical to the image contents.
+
+    Follows the contents of the image as the writes are applied in log
+    order: blocks not modified yet are compared with the base image
+    directly (with slices of a read-only mapping of the file, so only the
+    compared ranges are read), for modified blocks only a hash of their
+    contents is kept. Blocks partially overwritten after modification have
+    unknown contents, writes to them are never removed.
+
+    A write that doesn't change the image in log order may change it when
+    reordered with writes that overlap it, so a write is removed only if
+    no write closer than horizon writes in the log overlaps it. The
+    horizon should be at least the size of the permutation window.
+    """
+
+    def __init__(self, image_name, horizon=5, block_size=512):
+        """
+        Create object.
+
+        @param image_name: name of the base image file
+        @param horizon: distance in the log (number of writes) in which
+            writes can be reordered
+        @param block_size: size of blocks with tracked hashes
+        """
+        self.image_name = image_name
+        self.horizon = horizon
+        self.block_size = block_size
+        self.removed = 0
+        self.removed_bytes = 0
+        self._blocks = {}
+
+    @staticmethod
+    def _hash(data):
+        """Return the hash of block contents."""
+        return hashlib.sha1(data).digest()
+
+    def _parts(self, write):
+        """Return blocks touched by write, with ranges in block and data."""
+        block_size = self.block_size
+        start = write.offset
+        end = start + write.length
+        block = start // block_size
+        while block * block_size < end:
+            block_start = block * block_size
+            first = max(start, block_start)
+            last = min(end, block_start + block_size)
+            yield (block, first - block_start, last - block_start,
+                   first - start, last - start)
+            block += 1
+
+    def _is_noop(self, image, write, data):
+        """Check if write doesn't change current image contents."""
+        for block, first, last, data_first, data_last in self._parts(write):
+            chunk = data[data_first:data_last]
+            if block in self._blocks:
+                digest = self._blocks[block]
+                # only hashes of modified blocks are known, so partial
+                # writes can't be compared
+                if digest is None or last - first != self.block_size or \
+                        self._hash(chunk) != digest:
+                    return False
+            else:
+                position = block * self.block_size + first
+                if position + len(chunk) > len(image) or \
+                        image[position:position + len(chunk)] != chunk:
+                    return False
+        return True
+
+    def _update(self, image, write, data):
+        """Apply the write to tracked image contents."""
+        block_size = self.block_size
+        for block, first, last, data_first, data_last in self._parts(write):
+            chunk = data[data_first:data_last]
+            if last - first == block_size:
+                self._blocks[block] = self._hash(chunk)
+            elif block not in self._blocks and \
+                    (block + 1) * block_size <= len(image):
+                contents = bytearray(
+                    image[block * block_size:(block + 1) * block_size])
+                contents[first:last] = chunk
+                self._blocks[block] = self._hash(contents)
+            else:
+                self._blocks[block] = None
+
+    def filter(self, writes):
+        """
+        Return generator of writes that modify the image.
+
+        Counts of removed writes and their bytes are in L{removed} and
+        L{removed_bytes}.
+        """
+        with open(self.image_name, 'rb') as image_file:
+            try:
+                mapping = mmap.mmap(image_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                mapping = None
+            try:
+                image = mapping if mapping is not None else b''
+                for write in self._filter(image, writes):
+                    yield write
+            finally:
+                if mapping is not None:
+                    mapping.close()
+
+    def _filter(self, image, writes):
+        """Return writes that modify the image, for mapped image."""
+        # kept writes before and all writes after the decided one
+        history = deque(maxlen=self.horizon)
+        pending = deque()
+
+        def decide():
+            """Decide if the oldest pending write should be kept."""
+            write, is_noop = pending.popleft()
+            if is_noop and not any(overlapping((write, i)) for i in
+                                   list(history) + [j for j, _ in pending]):
+                self.removed += 1
+                self.removed_bytes += write.length
+                return None
+            history.append(write)
+            return write
+
+        for write in writes:
+            data = memoryview(write.data)
+            is_noop = self._is_noop(image, write, data)
+            if not is_noop:
+                self._update(image, write, data)
+            pending.append((write, is_noop))
+            if len(pending) > self.horizon:
+                kept = decide()
+                if kept is not None:
+                    yield kept
+        while pending:
+            kept = decide()
+            if kept is not None:
+                yield kept
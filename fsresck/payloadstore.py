@@ -0,0 +1,142 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Payloads of writes shared between processes."""
+
+import mmap
+from array import array
+
+from .compat import UINT64
+from .write import LazyWrite, Write
+
+
+class PayloadStore(object):
+
+    """
+    Read-only memory mapping of the log with payloads by record id.
+
+    Payloads are returned as memoryviews of a shared mapping of the log
+    file, so reading them doesn't copy the data and all processes use the
+    same pages of the page cache: memory use doesn't grow with the number
+    of worker processes. Only the positions of payloads are kept in the
+    object (16 bytes per record); when pickled, the mapping is not
+    included and is created again by the process that uses it. Python 2
+    can't create memoryviews of a mapping, there payloads are copied out
+    of the mapping.
+    """
+
+    def __init__(self, file_name):
+        """Create empty store of payloads in file_name."""
+        self.file_name = file_name
+        self._offsets = array(UINT64)
+        self._lengths = array(UINT64)
+        self._mapping = None
+        self._view = None
+
+    @classmethod
+    def from_writes(cls, file_name, writes):
+        """
+        Create store with payloads of lazy writes with data in file_name.
+
+        Record id of a write is its position in writes.
+        """
+        store = cls(file_name)
+        for write in writes:
+            if not isinstance(write, LazyWrite) or \
+                    write.file_name != file_name:
+                raise ValueError("Write with payload outside of {0!r}"
+                                 .format(file_name))
+            store.add(write.data_offset, write.data_length)
+        return store
+
+    def add(self, data_offset, length):
+        """Add payload at position in file, return its record id."""
+        self._offsets.append(data_offset)
+        self._lengths.append(length)
+        return len(self._offsets) - 1
+
+    def __len__(self):
+        """Return number of payloads."""
+        return len(self._offsets)
+
+    def __getstate__(self):
+        """Return the state for pickling, without the mapping."""
+        state = self.__dict__.copy()
+        state['_mapping'] = None
+        state['_view'] = None
+        return state
+
+    def _map(self):
+        """Return view of the mapped file, map it if needed."""
+        if self._view is None:
+            with open(self.file_name, 'rb') as data_file:
+                try:
+                    self._mapping = mmap.mmap(data_file.fileno(), 0,
+                                              access=mmap.ACCESS_READ)
+                except ValueError:
+                    # empty files can't be mapped
+                    self._mapping = None
+            if self._mapping is None:
+                self._view = memoryview(b'')
+            else:
+                try:
+                    self._view = memoryview(self._mapping)
+                except TypeError:
+                    # mmap of Python 2 has only the old buffer interface,
+                    # slices of the mapping itself are copies
+                    self._view = self._mapping
+        return self._view
+
+    def payload(self, record_id):
+        """Return memoryview of the payload of a record."""
+        offset = self._offsets[record_id]
+        end = offset + self._lengths[record_id]
+        view = self._map()
+        if end > len(view):
+            raise IndexError("payload past the end of the file")
+        if isinstance(view, memoryview):
+            return view[offset:end]
+        return memoryview(view[offset:end])
+
+    def write(self, record_id, write):
+        """Return copy of write with payload of the record."""
+        ret = Write(write.offset, self.payload(record_id), write.disk_id)
+        ret.set_times(write.start_time, write.end_time)
+        return ret
+
+    def close(self):
+        """
+        Remove the mapping.
+
+        Fails with BufferError if memoryviews of payloads are still used.
+        """
+        if self._view is not None:
+            if isinstance(self._view, memoryview) and \
+                    hasattr(self._view, 'release'):
+                self._view.release()
+            self._view = None
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
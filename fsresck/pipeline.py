@@ -0,0 +1,351 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""
+Streaming of states through concurrently running stages.
+
+Requires Python 3.5 or later (asyncio with async/await syntax), older
+versions can't even compile the module, so nothing imports it at the top
+level: the command line interface imports it only for C{run --pipeline}.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .checkers import CheckResult, CommandChecker, kill_process_group, \
+    process_group_options
+from .driver import StateResult, WindowImages
+from .errors import FSError
+from .image import Image
+
+# marks the end of items in a queue
+_END = object()
+
+
+class Stage(object):
+
+    """
+    Single step of a L{Pipeline}.
+
+    The function of the stage is called for every item that reaches the
+    stage and its return value is passed to the next stage. Functions that
+    block (do disk I/O) run in the thread pool of the pipeline, other
+    functions need to be coroutine functions.
+    """
+
+    def __init__(self, function, workers=1, blocking=False, name=None):
+        """
+        Create object.
+
+        @param function: function processing a single item
+        @param workers: largest number of items processed at the same time
+        @param blocking: if set, the function is a regular function run in
+            a thread, otherwise a coroutine function
+        @param name: name of the stage, the name of the function by default
+        """
+        if workers < 1:
+            raise ValueError("workers must be positive")
+        self.function = function
+        self.workers = workers
+        self.blocking = blocking
+        self.name = function.__name__ if name is None else name
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "Stage(name={0!r}, workers={1!r}, blocking={2!r})".format(
+            self.name, self.workers, self.blocking)
+
+
+class Pipeline(object):
+
+    """
+    Stages connected by bounded queues.
+
+    Every stage runs as a set of tasks reading from the queue of the
+    previous stage and writing to the queue of the next one. As the queues
+    have limited size, a stage that is faster than the next one waits for
+    it, so the slowest stage sets the throughput and no stage buffers more
+    than L{queue_size} items. Items may leave a stage with more than one
+    worker out of order.
+    """
+
+    def __init__(self, stages, queue_size=8, executor=None):
+        """
+        Create object.
+
+        @param stages: list of L{Stage}
+        @param queue_size: largest number of items waiting between stages
+        @param executor: executor for blocking stages and reading of the
+            source, thread pool with a thread for every blocking worker by
+            default
+        """
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.executor = executor
+        self.processed = dict((stage.name, 0) for stage in self.stages)
+        self.busy_time = dict((stage.name, 0.0) for stage in self.stages)
+
+    async def run(self, source, sink=None):
+        """
+        Pass all items from source through the stages.
+
+        @param source: iterable with the items, it's read in a thread
+        @param sink: function called with every item leaving the last stage
+        """
+        loop = asyncio.get_event_loop()
+        executor = self.executor
+        if executor is None:
+            threads = sum(i.workers for i in self.stages if i.blocking) + 1
+            executor = ThreadPoolExecutor(threads)
+        queues = [asyncio.Queue(self.queue_size)
+                  for _ in range(len(self.stages) + 1)]
+        tasks = [loop.create_task(self._read(loop, executor, source,
+                                             queues[0]))]
+        for stage, input_queue, output_queue in \
+                zip(self.stages, queues, queues[1:]):
+            tasks.append(loop.create_task(
+                self._run_stage(loop, executor, stage, input_queue,
+                                output_queue)))
+        tasks.append(loop.create_task(self._write(queues[-1], sink)))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+
+    def run_sync(self, source, sink=None):
+        """Run the pipeline in a new event loop until all items pass."""
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.run(source, sink))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    @staticmethod
+    async def _read(loop, executor, source, queue):
+        """Put items from the source to the first queue."""
+        iterator = iter(source)
+        while True:
+            item = await loop.run_in_executor(executor, next, iterator,
+                                              _END)
+            await queue.put(item)
+            if item is _END:
+                break
+
+    async def _run_stage(self, loop, executor, stage, input_queue,
+                         output_queue):
+        """Run workers of a stage, mark end of items when they finish."""
+        await asyncio.gather(*[self._worker(loop, executor, stage,
+                                            input_queue, output_queue)
+                               for _ in range(stage.workers)])
+        await output_queue.put(_END)
+
+    async def _worker(self, loop, executor, stage, input_queue,
+                      output_queue):
+        """Process items of a single stage."""
+        while True:
+            item = await input_queue.get()
+            if item is _END:
+                # let the other workers of the stage see it too
+                await input_queue.put(_END)
+                break
+            start = time.time()
+            if stage.blocking:
+                item = await loop.run_in_executor(executor, stage.function,
+                                                  item)
+            else:
+                item = await stage.function(item)
+            self.busy_time[stage.name] += time.time() - start
+            self.processed[stage.name] += 1
+            await output_queue.put(item)
+
+    @staticmethod
+    async def _write(queue, sink):
+        """Pass the items leaving the last stage to the sink."""
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if sink is not None:
+                sink(item)
+
+
+async def run_checker(checker, image_name):
+    """
+    Run L{CommandChecker} as an asyncio subprocess.
+
+    Returns L{CheckResult}, like C{checker.check(image_name)}. On timeout
+    the process group of the command is killed.
+    """
+    if not isinstance(checker, CommandChecker):
+        raise TypeError("Only CommandChecker can run as a subprocess, "
+                        "not {0!r}".format(checker))
+    start = time.time()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *checker.args(image_name),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            **process_group_options())
+    except OSError as exc:
+        return CheckResult(CheckResult.ERROR,
+                           output=str(exc).encode('utf-8'),
+                           duration=time.time() - start,
+                           checker=checker.name)
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(),
+                                           checker.timeout)
+    except asyncio.TimeoutError:
+        kill_process_group(process.pid)
+        output, _ = await process.communicate()
+        return CheckResult(CheckResult.TIMEOUT, process.returncode, output,
+                           time.time() - start, checker.name)
+    status = CheckResult.PASSED if process.returncode == 0 \
+        else CheckResult.FAILED
+    return CheckResult(status, process.returncode, output,
+                       time.time() - start, checker.name)
+
+
+class CheckPipeline(Pipeline):
+
+    """
+    Pipeline materialising states and checking them with a command.
+
+    The stages are: creating the image of the window (see
+    L{WindowImages}), copying it and applying the draw group (both in
+    threads) and running the checker. A L{CommandChecker} runs as an
+    asyncio subprocess, other checkers (like L{CheckerChain}) are called
+    in threads. Items of the source are states like returned by
+    L{WritesShuffler.ranked_generator}, the sink receives L{StateResult}.
+    """
+
+    def __init__(self, checker, image_dir="/tmp", materializers=2,
+                 checkers=4, queue_size=8):
+        """
+        Create object.
+
+        @param checker: object with a C{check(image_name)} method returning
+            L{CheckResult}, like L{CommandChecker}
+        @param image_dir: directory for temporary images
+        @param materializers: number of threads creating state images
+        @param checkers: number of checks running at once
+        @param queue_size: largest number of items waiting between stages
+        """
+        self.checker = checker
+        self.image_dir = image_dir
+        self.images = WindowImages(image_dir)
+        if isinstance(checker, CommandChecker):
+            check = Stage(self.check, checkers)
+        else:
+            check = Stage(self.check_in_thread, checkers, blocking=True,
+                          name='check')
+        stages = [Stage(self.prepare, blocking=True),
+                  Stage(self.materialize, materializers, blocking=True),
+                  check]
+        super(CheckPipeline, self).__init__(stages, queue_size)
+
+    async def run(self, source, sink=None):
+        """Pass all states through the stages, remove images of windows."""
+        try:
+            await super(CheckPipeline, self).run(source, sink)
+        finally:
+            self.images.cleanup()
+
+    def prepare(self, state):
+        """Return state with the image of its window."""
+        window_number, rank, image, draw_group = state
+        window_image = self.images.acquire(window_number, image)
+        return window_number, rank, window_image, draw_group
+
+    def materialize(self, state):
+        """Return state with image of the state, or error."""
+        window_number, rank, window_image, draw_group = state
+        image = Image(window_image, draw_group)
+        try:
+            image.create_image(self.image_dir)
+        except (FSError, IOError, OSError) as exc:
+            if image.temp_image_name is not None:
+                image.cleanup()
+            return window_number, rank, draw_group, None, exc
+        return window_number, rank, draw_group, image, None
+
+    async def check(self, state):
+        """Check image of the state with command, return L{StateResult}."""
+        window_number, rank, draw_group, image, error = state
+        try:
+            if error is not None:
+                result = self._error(error)
+            else:
+                result = await run_checker(self.checker,
+                                           image.temp_image_name)
+        finally:
+            self._release(window_number, image)
+        return self._state_result(window_number, rank, draw_group, result)
+
+    def check_in_thread(self, state):
+        """Check image of the state with checker, return L{StateResult}."""
+        window_number, rank, draw_group, image, error = state
+        try:
+            if error is not None:
+                result = self._error(error)
+            else:
+                result = self.checker.check(image.temp_image_name)
+        finally:
+            self._release(window_number, image)
+        return self._state_result(window_number, rank, draw_group, result)
+
+    def _error(self, error):
+        """Return L{CheckResult} of state with image that wasn't created."""
+        return CheckResult(CheckResult.ERROR,
+                           output=str(error).encode('utf-8'),
+                           checker=getattr(self.checker, 'name', None))
+
+    def _release(self, window_number, image):
+        """Remove the image of the state, release image of its window."""
+        if image is not None:
+            image.cleanup()
+        self.images.release(window_number)
+
+    @staticmethod
+    def _state_result(window_number, rank, draw_group, result):
+        """Return L{StateResult} of the state."""
+        writes = tuple((i.offset, i.length, i.disk_id) for i in draw_group)
+        return StateResult(window_number, rank, writes, result)
+
+    async def run(self, source, sink=None):
+        """Check all states from source, remove images when done."""
+        try:
+            await super(CheckPipeline, self).run(source, sink)
+        finally:
+            self.images.cleanup()
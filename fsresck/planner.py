@@ -0,0 +1,204 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Estimation of the size and cost of a run before it is started."""
+
+import os
+
+from .imagegenerator import LogReader
+from .noop import NoopFilter
+from .ranking import WindowSpace
+from .sharding import CostModel
+from .writesshuffler import WritesShuffler
+
+
+class WindowPlan(object):
+
+    """Number of states and amount of data written for a single window."""
+
+    def __init__(self, number, states, base_bytes, written_bytes):
+        """
+        Create object.
+
+        @param number: number of the window
+        @param states: number of states in the window (with the base image)
+        @param base_bytes: size of the in-order writes applied to every state
+        @param written_bytes: size of all draw groups of the window
+        """
+        self.number = number
+        self.states = states
+        self.base_bytes = base_bytes
+        self.written_bytes = written_bytes
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "WindowPlan(number={0}, states={1}, base_bytes={2}, "\
+               "written_bytes={3})".format(self.number, self.states,
+                                           self.base_bytes,
+                                           self.written_bytes)
+
+
+class Plan(object):
+
+    """
+    Size of the state space of a run and its projected cost.
+
+    Disk I/O assumes that every state is materialised by copying the image
+    and applying the in-order writes and the draw group to the copy.
+    """
+
+    def __init__(self, image_size=0):
+        """Create empty plan for image of given size."""
+        self.image_size = image_size
+        self.windows = []
+        self.window_count = 0
+        self.states = 0
+        self.write_bytes = 0
+        self.max_window_states = 0
+
+    def add(self, window, keep=True):
+        """Add the plan of a single window."""
+        if keep:
+            self.windows.append(window)
+        self.window_count += 1
+        self.states += window.states
+        self.max_window_states = max(self.max_window_states, window.states)
+        self.write_bytes += window.base_bytes * window.states + \
+            window.written_bytes
+
+    @property
+    def io_bytes(self):
+        """Return the projected amount of data written to disk."""
+        return self.image_size * self.states + self.write_bytes
+
+    def projected_seconds(self, state_seconds, window_seconds=0.0,
+                          bytes_per_second=None):
+        """
+        Return projected wall-clock time of the run.
+
+        @param state_seconds: measured time of checking a single state
+        @param window_seconds: measured time of preparing a window
+        @param bytes_per_second: measured speed of writing the images,
+            if not set, the time of writing is assumed to be included in
+            state_seconds
+        """
+        seconds = self.states * state_seconds + \
+            self.window_count * window_seconds
+        if bytes_per_second:
+            seconds += float(self.io_bytes) / bytes_per_second
+        return seconds
+
+    def fits(self, budget_seconds, state_seconds, window_seconds=0.0,
+             bytes_per_second=None, workers=1):
+        """Check if the run will finish in budget using workers."""
+        return self.projected_seconds(state_seconds, window_seconds,
+                                      bytes_per_second) / workers \
+            <= budget_seconds
+
+    def cost_model(self, state_seconds, window_seconds=0.0):
+        """Return a cost model for splitting this run between shards."""
+        return CostModel(image_cost=window_seconds, state_cost=state_seconds)
+
+
+class Planner(object):
+
+    """
+    Compute the number of states a run would test without running it.
+
+    Reads only the headers of writes in the log and computes exact number
+    of states that L{WritesShuffler.generator} returns for every window.
+    If ops_to_test is set, the log is first split like
+    L{BaseImageGenerator} does it, and every slice is shuffled separately.
+    """
+
+    def __init__(self, image_name, log_name, group_size=3, ops_to_test=None,
+                 fragmenter=None, noop_horizon=None):
+        """
+        Create object.
+
+        @param image_name: name of the base image file
+        @param log_name: name of the write log
+        @param group_size: size of the permutation window
+        @param ops_to_test: number of writes in slices of the log, None
+            to shuffle the whole log at once
+        @type fragmenter: L{Fragmenter}
+        @param fragmenter: object used to split writes before shuffling
+        @param noop_horizon: if set, writes that don't modify the base
+            image are removed, see L{NoopFilter}; slices of the log don't
+            start from the base image, so it can't be used with ops_to_test
+        """
+        if ops_to_test is not None and noop_horizon is not None:
+            raise ValueError("noop_horizon can't be used with ops_to_test")
+        self.image_name = image_name
+        self.log_name = log_name
+        self.group_size = group_size
+        self.ops_to_test = ops_to_test
+        self.fragmenter = fragmenter
+        self.noop_horizon = noop_horizon
+
+    def _image_size(self):
+        """Return size of the base image, 0 if not available."""
+        try:
+            return os.path.getsize(self.image_name)
+        except (OSError, TypeError):
+            return 0
+
+    def _write_lists(self):
+        """Return lists of writes that are shuffled separately."""
+        writes = LogReader(self.log_name).reader(lazy=True)
+        if self.ops_to_test is None:
+            yield writes
+            return
+        writes = list(writes)
+        for start in range(len(writes) + 1):
+            yield writes[start:start + self.ops_to_test]
+
+    def plan(self, keep_windows=True):
+        """
+        Return the L{Plan} of the run.
+
+        @param keep_windows: keep the plans of individual windows in the
+            returned object
+        """
+        plan = Plan(self._image_size())
+        number = 0
+        for writes in self._write_lists():
+            if self.fragmenter is not None:
+                writes = self.fragmenter.fragment(writes)
+            if self.noop_horizon is not None:
+                writes = NoopFilter(self.image_name,
+                                    self.noop_horizon).filter(writes)
+            shuffler = WritesShuffler(None, writes)
+            base_bytes = 0
+            for _, window in shuffler.windows(self.group_size):
+                space = WindowSpace(window, self.group_size)
+                plan.add(WindowPlan(number, len(space), base_bytes,
+                                    space.written_bytes()),
+                         keep_windows)
+                number += 1
+                # first write of the window is in-order for the next one
+                if window:
+                    base_bytes += window[0].length
+        return plan
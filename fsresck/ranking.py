@@ -0,0 +1,195 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Numbering of states generated for a permutation window."""
+
+from bisect import bisect_right
+from itertools import combinations
+from math import factorial
+
+from .write import overlap_masks
+
+
+def rank_permutation(permutation):
+    """
+    Return the position of permutation among permutations of its items.
+
+    Positions are numbered in lexicographic order of the items (Lehmer code),
+    so the sorted permutation has rank 0.
+    """
+    items = sorted(permutation)
+    rank = 0
+    for position, item in enumerate(permutation):
+        index = items.index(item)
+        rank += index * factorial(len(permutation) - position - 1)
+        del items[index]
+    return rank
+
+
+def unrank_permutation(items, rank):
+    """Return permutation of sorted items with given lexicographic rank."""
+    items = list(items)
+    if not 0 <= rank < factorial(len(items)):
+        raise IndexError("permutation rank out of range")
+    ret = []
+    for remaining in range(len(items), 0, -1):
+        index, rank = divmod(rank, factorial(remaining - 1))
+        ret.append(items.pop(index))
+    return tuple(ret)
+
+
+class WindowSpace(object):
+
+    """
+    Numbering of unique draw groups of a single permutation window.
+
+    Assigns every state returned for the window by
+    L{WritesShuffler.generator} a stable rank: 0 is the base image with
+    writes in order, the draw groups follow ordered by their size, set
+    of writes (in order of L{itertools.combinations}) and, for
+    overlapping writes, by the lexicographic order of the permutation.
+    Converting between rank and draw group doesn't require iterating over
+    the other states.
+    """
+
+    def __init__(self, window, group_size=None):
+        """
+        Create numbering for window.
+
+        @param window: writes in the permutation window, in log order
+        @type group_size: int
+        @param group_size: largest number of writes in a draw group,
+            defaults to the size of the window
+        """
+        self.window = tuple(window)
+        size = len(self.window)
+        if group_size is None or group_size > size:
+            group_size = size
+        self.group_size = group_size
+
+        # bit masks of writes that overlap a given write
+        self._overlaps = overlap_masks(self.window)
+
+        self._subsets = []
+        self._starts = []
+        self._positions = {}
+        total = 1
+        for subset_size in range(1, group_size + 1):
+            for subset in combinations(range(size), subset_size):
+                count = self._count(subset)
+                if not count:
+                    continue
+                self._positions[subset] = len(self._subsets)
+                self._subsets.append(subset)
+                self._starts.append(total)
+                total += count
+        self.size = total
+
+    def _is_overlapping(self, subset):
+        """Check if writes at indexes in subset overlap."""
+        mask = 0
+        for i in subset:
+            mask |= 1 << i
+        return any(self._overlaps[i] & mask for i in subset)
+
+    def _count(self, subset):
+        """Return number of states that use all writes in subset."""
+        # permutations that start with the first write of the window and
+        # sets that include it are returned for the next window
+        if self._is_overlapping(subset):
+            if subset[0] == 0:
+                return factorial(len(subset)) - factorial(len(subset) - 1)
+            return factorial(len(subset))
+        if subset[0] == 0:
+            return 0
+        return 1
+
+    def __len__(self):
+        """Return number of states in window, including the base image."""
+        return self.size
+
+    def subset_counts(self):
+        """
+        Return sets of writes and the number of states that use them.
+
+        Generator returning pairs of tuples of indexes of writes and the
+        number of out of order states that include all of them (and no
+        other writes).
+        """
+        for position, subset in enumerate(self._subsets):
+            if position + 1 < len(self._starts):
+                end = self._starts[position + 1]
+            else:
+                end = self.size
+            yield subset, end - self._starts[position]
+
+    def written_bytes(self):
+        """Return total size of draw groups of all states in the window."""
+        return sum(count * sum(self.window[i].length for i in subset)
+                   for subset, count in self.subset_counts())
+
+    def unrank_indexes(self, rank):
+        """Return indexes of writes in the draw group with given rank."""
+        if not 0 <= rank < self.size:
+            raise IndexError("state rank out of range")
+        if rank == 0:
+            return tuple()
+        position = bisect_right(self._starts, rank) - 1
+        subset = self._subsets[position]
+        local_rank = rank - self._starts[position]
+        if not self._is_overlapping(subset):
+            return subset
+        if subset[0] == 0:
+            local_rank += factorial(len(subset) - 1)
+        return unrank_permutation(subset, local_rank)
+
+    def unrank(self, rank):
+        """Return the draw group (tuple of writes) with given rank."""
+        return tuple(self.window[i] for i in self.unrank_indexes(rank))
+
+    def rank_indexes(self, indexes):
+        """Return rank of a draw group given as indexes of writes."""
+        if not indexes:
+            return 0
+        subset = tuple(sorted(indexes))
+        if len(set(subset)) != len(subset) or subset not in self._positions:
+            raise ValueError("draw group not in window state space")
+        position = self._positions[subset]
+        if not self._is_overlapping(subset):
+            return self._starts[position]
+        local_rank = rank_permutation(indexes)
+        if subset[0] == 0:
+            local_rank -= factorial(len(subset) - 1)
+            if local_rank < 0:
+                raise ValueError("draw group not in window state space")
+        return self._starts[position] + local_rank
+
+    def rank(self, draw_group):
+        """Return rank of a draw group (tuple of writes)."""
+        try:
+            indexes = [self.window.index(i) for i in draw_group]
+        except ValueError:
+            raise ValueError("draw group not in window state space")
+        return self.rank_indexes(indexes)
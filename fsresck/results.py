@@ -0,0 +1,170 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Persistent storage of check results."""
+
+import json
+import sqlite3
+import time
+
+from .checkers import CheckResult
+from .driver import StateResult
+
+
+class ResultStore(object):
+
+    """
+    SQLite database of results of checked states.
+
+    Results are keyed by the digest of the base image, digest of the log
+    (with the options of its reading, see L{StateSource.log_digest}),
+    window number, canonical state signature (see L{state_signature}) and
+    the checker name, so results of a run can be reused by later runs on
+    the same data. Stored results are committed in batches of
+    L{commit_every} results and when the store is closed.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS results (
+            base_digest TEXT NOT NULL,
+            log_digest TEXT NOT NULL,
+            window INTEGER NOT NULL,
+            signature TEXT NOT NULL,
+            checker TEXT NOT NULL,
+            rank INTEGER,
+            status TEXT NOT NULL,
+            returncode INTEGER,
+            output BLOB,
+            duration REAL,
+            draw_group TEXT,
+            created REAL,
+            PRIMARY KEY (base_digest, log_digest, window, signature,
+                         checker));
+        CREATE INDEX IF NOT EXISTS results_status
+            ON results (base_digest, log_digest, status, window);
+        """
+
+    _columns = "window, rank, status, returncode, output, duration, " \
+        "draw_group, checker"
+
+    def __init__(self, path, commit_every=100):
+        """
+        Open or create database.
+
+        @param path: name of the database file, ":memory:" for a temporary
+            database
+        @param commit_every: number of stored results after which they are
+            committed
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(self._schema)
+
+    def __enter__(self):
+        """Return the store."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the store."""
+        self.close()
+
+    def close(self):
+        """Commit stored results and close the database."""
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def commit(self):
+        """Make stored results persistent."""
+        self._connection.commit()
+        self._uncommitted = 0
+
+    @staticmethod
+    def _result(row):
+        """Convert database row to L{StateResult}."""
+        window, rank, status, returncode, output, duration, draw_group, \
+            checker = row
+        result = CheckResult(status, returncode, bytes(output or b''),
+                             duration, checker)
+        draw_group = tuple(tuple(i) for i in json.loads(draw_group or '[]'))
+        return StateResult(window, rank, draw_group, result, cached=True)
+
+    def lookup(self, base_digest, log_digest, window, signature, checker):
+        """Return stored L{StateResult} of the state or None."""
+        cursor = self._connection.execute(
+            "SELECT " + self._columns + " FROM results WHERE "
+            "base_digest = ? AND log_digest = ? AND window = ? AND "
+            "signature = ? AND checker = ?",
+            (base_digest, log_digest, window, signature, checker))
+        row = cursor.fetchone()
+        return None if row is None else self._result(row)
+
+    def store(self, base_digest, log_digest, signature, state_result):
+        """Save result of a state, replacing the previous one."""
+        result = state_result.result
+        self._connection.execute(
+            "INSERT OR REPLACE INTO results VALUES "
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (base_digest, log_digest, state_result.window_number, signature,
+             result.checker, state_result.rank, result.status,
+             result.returncode, sqlite3.Binary(result.output),
+             result.duration, json.dumps(state_result.draw_group),
+             time.time()))
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def failing(self, base_digest, log_digest, first_window=None,
+                last_window=None, checker=None):
+        """
+        Return stored results of states that didn't pass the check.
+
+        @param first_window: lowest window number of returned states
+        @param last_window: highest window number of returned states
+        @param checker: return only results of the checker
+        """
+        query = "SELECT " + self._columns + " FROM results WHERE " \
+            "base_digest = ? AND log_digest = ? AND status != ?"
+        params = [base_digest, log_digest, CheckResult.PASSED]
+        if first_window is not None:
+            query += " AND window >= ?"
+            params.append(first_window)
+        if last_window is not None:
+            query += " AND window <= ?"
+            params.append(last_window)
+        if checker is not None:
+            query += " AND checker = ?"
+            params.append(checker)
+        query += " ORDER BY window, rank"
+        return [self._result(row) for row in
+                self._connection.execute(query, params)]
+
+    def __len__(self):
+        """Return number of stored results."""
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM results").fetchone()[0]
@@ -0,0 +1,126 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Random sampling of states without replacement."""
+
+import time
+
+
+def sample_ranks(rng, total, small_space=65536):
+    """
+    Return generator of unique, uniformly distributed ranks below total.
+
+    Small spaces are shuffled as a whole. Large ones are walked in the
+    order of a random full period linear congruential generator over the
+    next power of two, with its output scrambled by invertible bit mixing
+    and ranks past the end of the space skipped, so the memory use doesn't
+    depend on the size of the space.
+
+    @param rng: source of randomness, object with randrange() and shuffle()
+        methods, like L{random.Random}
+    @param total: size of the space
+    @param small_space: size of spaces that are shuffled as a whole
+    """
+    if total <= small_space:
+        ranks = list(range(total))
+        rng.shuffle(ranks)
+        for rank in ranks:
+            yield rank
+        return
+    bits = (total - 1).bit_length()
+    modulus = 1 << bits
+    mask = modulus - 1
+    shift = max(bits // 2, 1)
+    # a full period needs odd increment and multiplier equal to 1 mod 4
+    multiplier = 4 * rng.randrange(max(modulus // 4, 1)) + 1
+    increment = 2 * rng.randrange(max(modulus // 2, 1)) + 1
+    scramble = 2 * rng.randrange(max(modulus // 2, 1)) + 1
+    start = value = rng.randrange(modulus)
+    while True:
+        value = (multiplier * value + increment) & mask
+        rank = ((value ^ (value >> shift)) * scramble) & mask
+        rank ^= rank >> shift
+        if rank < total:
+            yield rank
+        # the generator visited every value of the period
+        if value == start:
+            return
+
+
+class SamplingReport(object):
+
+    """Coverage of the state space by sampled states."""
+
+    def __init__(self, total=0):
+        """Create report for space of total states."""
+        self.total = total
+        self.sampled = 0
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def coverage(self):
+        """Return the fraction of the space that was sampled."""
+        if not self.total:
+            return 1.0
+        return float(self.sampled) / self.total
+
+    @property
+    def elapsed(self):
+        """Return the duration of sampling in seconds."""
+        end_time = self.end_time
+        if end_time is None:
+            end_time = time.time()
+        return end_time - self.start_time
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "SamplingReport(sampled={0}, total={1}, coverage={2:.2%})"\
+               .format(self.sampled, self.total, self.coverage)
+
+
+class Budget(object):
+
+    """Limit on the number of tested states or the time of testing."""
+
+    def __init__(self, max_states=None, max_seconds=None):
+        """
+        Create object.
+
+        @param max_states: largest number of states, None for no limit
+        @param max_seconds: longest time in seconds, None for no limit
+        """
+        self.max_states = max_states
+        self.max_seconds = max_seconds
+        self.start_time = time.time()
+
+    def exhausted(self, states):
+        """Check if the budget is used up after testing states."""
+        if self.max_states is not None and states >= self.max_states:
+            return True
+        if self.max_seconds is not None and \
+                time.time() - self.start_time >= self.max_seconds:
+            return True
+        return False
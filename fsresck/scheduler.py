@@ -0,0 +1,256 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Ordering of states by the likelihood of their failure."""
+
+import heapq
+from collections import deque
+
+
+def _inversions(sequence):
+    """Return number of pairs of elements that are out of order."""
+    return sum(1 for i, first in enumerate(sequence)
+               for second in sequence[i + 1:] if first > second)
+
+
+class HeuristicScorer(object):
+
+    """
+    Estimate of how likely a state is to fail.
+
+    The score is a weighted sum of features of the draw group of the state,
+    all of them between 0 and 1:
+      - C{rewrite}: how often the most rewritten block the draw group
+        writes to is written in the whole log
+      - C{metadata}: fraction of writes that look like metadata writes,
+        writes to the given regions or, without them, writes of at most
+        one block
+      - C{reorder}: fraction of the pairs of writes that are reordered and
+        fraction of the writes of the window that are left out
+      - C{barrier}: fraction of writes issued only after the previous write
+        of the log completed (the file system waited for it, like for a
+        flush)
+      - C{similarity}: largest Jaccard similarity of the blocks written by
+        the state and blocks written by a failing state
+    """
+
+    WEIGHTS = {'rewrite': 1.0, 'metadata': 1.0, 'reorder': 1.0,
+               'barrier': 1.0, 'similarity': 2.0}
+
+    def __init__(self, writes, block_size=4096, metadata_regions=None,
+                 weights=None, max_failures=100):
+        """
+        Create object.
+
+        @param writes: all writes of the log, like L{StateSource.writes}
+        @param block_size: size of blocks for counting rewrites
+        @param metadata_regions: list of tuples with start and end offsets
+            of areas of the image with metadata
+        @type weights: dict
+        @param weights: weights of the features, replacing the ones in
+            L{WEIGHTS}
+        @param max_failures: number of most recent failing states kept for
+            comparison
+        """
+        self.writes = writes
+        self.block_size = block_size
+        self.metadata_regions = metadata_regions
+        self.weights = dict(self.WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        self.failures = deque(maxlen=max_failures)
+        # changes every time the scores of states may change
+        self.generation = 0
+        self._counts = None
+        self._most = 1
+
+    def blocks(self, write):
+        """Return the set of blocks the write writes to."""
+        first = write.offset // self.block_size
+        last = (write.offset + max(write.length, 1) - 1) // self.block_size
+        return set((write.disk_id, i) for i in range(first, last + 1))
+
+    def _rewrites(self):
+        """Return numbers of writes to blocks in the whole log."""
+        if self._counts is None:
+            counts = {}
+            for write in self.writes:
+                for block in self.blocks(write):
+                    counts[block] = counts.get(block, 0) + 1
+            self._counts = counts
+            self._most = max(counts.values()) if counts else 1
+        return self._counts
+
+    def _is_metadata(self, write):
+        """Check if the write looks like a metadata write."""
+        if self.metadata_regions is None:
+            return write.length <= self.block_size
+        end = write.offset + write.length
+        return any(write.offset < region_end and start < end
+                   for start, region_end in self.metadata_regions)
+
+    def _at_barrier(self, position):
+        """Check if the write was issued after the previous one completed."""
+        if not position:
+            return False
+        previous = self.writes[position - 1]
+        write = self.writes[position]
+        if previous.end_time is None or write.start_time is None:
+            return False
+        return previous.end_time <= write.start_time
+
+    def features(self, spec):
+        """Return dictionary with features of the state of L{StateSpec}."""
+        group = spec.draw_group
+        if not group:
+            return dict((i, 0.0) for i in self.weights)
+        writes = [self.writes[i] for i in group]
+        counts = self._rewrites()
+        blocks = set()
+        for write in writes:
+            blocks.update(self.blocks(write))
+        pairs = len(group) * (len(group) - 1) // 2
+        span = max(group) - spec.base_index + 1
+        rewrite = max(counts.get(i, 0) for i in blocks) / float(self._most)
+        metadata = sum(1 for i in writes if self._is_metadata(i))
+        reorder = (_inversions(group) / float(max(pairs, 1)) +
+                   (span - len(group)) / float(span)) / 2
+        barrier = sum(1 for i in group if self._at_barrier(i))
+        similarity = max([len(blocks & i) / float(len(blocks | i))
+                          for i in self.failures] or [0.0])
+        return {'rewrite': rewrite,
+                'metadata': metadata / float(len(writes)),
+                'reorder': reorder,
+                'barrier': barrier / float(len(group)),
+                'similarity': similarity}
+
+    def score(self, spec):
+        """Return the score of the state of L{StateSpec}."""
+        features = self.features(spec)
+        return sum(self.weights[i] * value for i, value in features.items())
+
+    def learn(self, spec):
+        """Remember the state of L{StateSpec} as failing."""
+        blocks = set()
+        for i in spec.draw_group:
+            blocks.update(self.blocks(self.writes[i]))
+        if blocks:
+            self.failures.append(blocks)
+            self.generation += 1
+
+
+class PriorityScheduler(object):
+
+    """
+    Reordering of states so that the ones likely to fail are checked first.
+
+    States are read ahead into a heap of at most L{max_pending} states of
+    at most L{max_windows} windows and the one with the highest score is
+    returned first, whatever its window. All the states are returned
+    eventually, the ordering is only within the states read ahead. When a
+    reported failure changes the scores, the states in the heap are scored
+    again.
+
+    States of windows read ahead are returned out of order, so the windows
+    with states in the heap are kept in L{ahead}; L{Driver.run} uses it to
+    create images of those windows without replaying the log for each of
+    them. The window limit bounds the number of such images.
+    """
+
+    def __init__(self, states, scorer, max_pending=10000, max_windows=16):
+        """
+        Create object.
+
+        @param states: tuples of window number, rank and L{StateSpec}, like
+            returned by L{StateSource.specs}
+        @type scorer: L{HeuristicScorer}
+        @param scorer: object with C{score(spec)} method and C{generation}
+            attribute
+        @param max_pending: largest number of states read ahead
+        @param max_windows: largest number of windows with states read
+            ahead
+        """
+        self.states = states
+        self.scorer = scorer
+        self.max_pending = max_pending
+        self.max_windows = max_windows
+        # numbers of states read ahead and not returned, keyed by window
+        self.ahead = {}
+        # states returned and not yet reported, keyed by window and rank
+        self._returned = {}
+
+    def __iter__(self):
+        """Return generator of the states, highest score first."""
+        heap = []
+        sequence = 0
+        states = iter(self.states)
+        # state read from source and not yet put to the heap
+        following = None
+        exhausted = False
+        generation = self.scorer.generation
+        while True:
+            while len(heap) < max(self.max_pending, 1):
+                if following is None:
+                    if exhausted:
+                        break
+                    try:
+                        following = next(states)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                if following[0] not in self.ahead and \
+                        len(self.ahead) >= max(self.max_windows, 1):
+                    break
+                heapq.heappush(heap, self._entry(following, sequence))
+                self.ahead[following[0]] = self.ahead.get(following[0], 0) + 1
+                sequence += 1
+                following = None
+            if not heap:
+                return
+            if generation != self.scorer.generation:
+                generation = self.scorer.generation
+                heap = [self._entry(i[2], i[1]) for i in heap]
+                heapq.heapify(heap)
+            state = heapq.heappop(heap)[2]
+            self.ahead[state[0]] -= 1
+            if not self.ahead[state[0]]:
+                del self.ahead[state[0]]
+            self._returned[tuple(state[:2])] = state[2]
+            yield state
+
+    def _entry(self, state, sequence):
+        """Return heap entry of the state."""
+        # earlier states first among states with the same score
+        return (-self.scorer.score(state[2]), sequence, state)
+
+    def report(self, result):
+        """
+        Inform scheduler about the result of a state.
+
+        @type result: L{StateResult}
+        """
+        spec = self._returned.pop((result.window_number, result.rank), None)
+        if spec is not None and not result.result.passed:
+            self.scorer.learn(spec)
@@ -0,0 +1,161 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+"""Append-only sequences with cheap views of their parts."""
+
+
+class AppendLog(object):
+
+    """
+    Append-only sequence stored in fixed size chunks.
+
+    Items are never moved after they are appended, so views of the log
+    (created with L{view}) stay valid while the log grows and creating them
+    does not copy the items.
+    """
+
+    def __init__(self, items=None, chunk_size=1024):
+        """
+        Create an object.
+
+        @param items: initial items of the log
+        @type chunk_size: int
+        @param chunk_size: number of items stored in a single chunk
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._length = 0
+        if items is not None:
+            self.extend(items)
+
+    def append(self, item):
+        """Add item to the end of the log."""
+        if self._length % self.chunk_size == 0:
+            self._chunks.append([])
+        self._chunks[-1].append(item)
+        self._length += 1
+
+    def extend(self, items):
+        """Add all items from iterable to the end of the log."""
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        """Return number of items in the log."""
+        return self._length
+
+    def _get(self, index):
+        """Return item at non-negative index."""
+        return self._chunks[index // self.chunk_size][index % self.chunk_size]
+
+    def _iter_range(self, start, end):
+        """Iterate over items between start and end."""
+        chunk_size = self.chunk_size
+        while start < end:
+            chunk = self._chunks[start // chunk_size]
+            chunk_start = start % chunk_size
+            chunk_end = min(chunk_size, chunk_start + end - start)
+            for item in chunk[chunk_start:chunk_end]:
+                yield item
+            start += chunk_end - chunk_start
+
+    def __iter__(self):
+        """Iterate over all items in the log."""
+        return self._iter_range(0, self._length)
+
+    def __getitem__(self, index):
+        """Return item at index or a view for a slice."""
+        return self.view()[index]
+
+    def view(self, start=0, end=None):
+        """
+        Return a view of items between start and end.
+
+        The view doesn't include items appended to the log after it was
+        created.
+        """
+        if end is None:
+            end = self._length
+        if not 0 <= start <= end <= self._length:
+            raise IndexError("view out of range")
+        return LogView(self, start, end)
+
+
+class LogView(object):
+
+    """Immutable view of a continuous part of L{AppendLog}."""
+
+    def __init__(self, log, start, end):
+        """Create a view of items of log between start and end."""
+        self.log = log
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        """Return number of items in view."""
+        return self.end - self.start
+
+    def __iter__(self):
+        """Iterate over items in the view."""
+        # pylint: disable=protected-access
+        return self.log._iter_range(self.start, self.end)
+
+    def __getitem__(self, index):
+        """Return item at index or a view for a slice."""
+        if isinstance(index, slice):
+            start, end, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            end = max(start, end)
+            return LogView(self.log, self.start + start, self.start + end)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("view index out of range")
+        # pylint: disable=protected-access
+        return self.log._get(self.start + index)
+
+    def __eq__(self, other):
+        """Check if the other sequence has the same items."""
+        try:
+            if len(self) != len(other):
+                return False
+        except TypeError:
+            return NotImplemented
+        return all(i == j for i, j in zip(self, other))
+
+    def __ne__(self, other):
+        """Check if the other sequence has different items."""
+        ret = self.__eq__(other)
+        if ret is NotImplemented:
+            return ret
+        return not ret
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Return representation of items in the view."""
+        return repr(list(self))
@@ -0,0 +1,149 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Deterministic partitioning of the tested states between workers."""
+
+
+class Shard(object):
+
+    """
+    Selection of one of the parts of the state space.
+
+    The state space is split into L{count} parts of (estimated) equal cost,
+    L{index} selects one of them. Shards are numbered from 0. As the split
+    depends only on the tested writes, workers that use different shards of
+    the same count don't need to coordinate and together test every state
+    exactly once.
+    """
+
+    def __init__(self, index, count):
+        """Create object selecting part index out of count parts."""
+        if count < 1:
+            raise ValueError("count must be positive")
+        if not 0 <= index < count:
+            raise ValueError("index must be between 0 and count - 1")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text):
+        """Create object from the "index/count" string representation."""
+        try:
+            index, count = text.split('/')
+            return cls(int(index), int(count))
+        except ValueError:
+            raise ValueError("invalid shard specification: {0!r}, expected "
+                             "'index/count'".format(text))
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "Shard({0}/{1})".format(self.index, self.count)
+
+    def __eq__(self, other):
+        """Check if the other object selects the same part."""
+        return (isinstance(other, Shard) and
+                self.__dict__ == other.__dict__)
+
+    def __ne__(self, other):
+        """Check if the other object selects a different part."""
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        """Return hash of the object."""
+        return hash((self.index, self.count))
+
+    def owner(self, position, total):
+        """Return index of the shard that owns the position in total cost."""
+        if total <= 0:
+            return 0
+        return min(self.count - 1,
+                   int(self.count * float(position) / total))
+
+    def owns(self, position, total):
+        """Check if the position in total cost belongs to this shard."""
+        return self.owner(position, total) == self.index
+
+    def select(self, costs):
+        """
+        Return indexes of items that belong to this shard.
+
+        Items are assigned to shards by the position of their middle in
+        the total cost of all items.
+        """
+        costs = list(costs)
+        total = float(sum(costs))
+        position = 0
+        for item_index, cost in enumerate(costs):
+            if self.owns(position + cost / 2.0, total):
+                yield item_index
+            position += cost
+
+    def rank_range(self, start, image_cost, state_cost, states, total):
+        """
+        Return the range of ranks of a window that belong to this shard.
+
+        @param start: position of the window in the total cost
+        @param image_cost: cost of preparing the base image for the window
+        @param state_cost: cost of testing a single state
+        @param states: number of states in the window
+        @param total: total cost of all windows
+        @return: tuple with first rank and rank after the last one
+        """
+        def owner(rank):
+            """Return shard owning given state of the window."""
+            return self.owner(start + image_cost + (rank + 0.5) * state_cost,
+                              total)
+
+        def first_rank(index):
+            """Return first rank that belongs to shard index or later."""
+            low, high = 0, states
+            while low < high:
+                middle = (low + high) // 2
+                if owner(middle) < index:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        return (first_rank(self.index), first_rank(self.index + 1))
+
+
+class CostModel(object):
+
+    """Estimated cost of testing the states of a permutation window."""
+
+    def __init__(self, image_cost=1.0, state_cost=1.0):
+        """
+        Create object.
+
+        @param image_cost: cost of preparing the base image for a window
+        @param state_cost: cost of testing a single state
+        """
+        self.image_cost = image_cost
+        self.state_cost = state_cost
+
+    def window_cost(self, states):
+        """Return the cost of testing a window with given number of states."""
+        return self.image_cost + self.state_cost * states
@@ -0,0 +1,165 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Symbolic signatures of disk states for deduplication across windows."""
+
+import hashlib
+from collections import OrderedDict
+
+_MODULUS = 1 << 128
+
+
+def _entry_hash(key, value):
+    """Return the hash of a single sector mapping as an integer."""
+    digest = hashlib.md5(repr((key, value)).encode('ascii')).hexdigest()
+    return int(digest, 16)
+
+
+def state_signature(base_length, draw_group):
+    """
+    Return canonical signature of a state.
+
+    The state is identified by the number of writes of the log applied in
+    order and by the offsets and data of the writes of the draw group, in
+    order, so the signature doesn't depend on the numbering of states
+    (window size, ranks) of the run that created it.
+    """
+    digest = hashlib.sha1(repr(base_length).encode('ascii'))
+    for write in draw_group:
+        digest.update(repr((write.offset, write.length, write.disk_id))
+                      .encode('utf-8'))
+        digest.update(hashlib.sha1(bytes(write.data)).digest())
+    return digest.hexdigest()
+
+
+class SignatureTracker(object):
+
+    """
+    Signatures of disk states as mapping of sectors to their last writer.
+
+    Keeps the mapping of every sector touched by the in-order writes to the
+    id of the record that wrote it last and an order-independent digest of
+    that mapping. The signature of a state with additional writes is
+    computed by looking only at the sectors those writes touch, without
+    materialising any image. Sectors written partially get a value derived
+    from the previous value and the part written, so states have equal
+    signatures only if every byte was written by the same records.
+    """
+
+    def __init__(self, sector_size=512):
+        """Create tracker of states of an unmodified image."""
+        self.sector_size = sector_size
+        self._sectors = {}
+        self.digest = 0
+
+    def __len__(self):
+        """Return number of sectors touched by the in-order writes."""
+        return len(self._sectors)
+
+    def _updates(self, write, record_id, lookup):
+        """Return new values of sectors touched by the write."""
+        sector_size = self.sector_size
+        start = write.offset
+        end = start + write.length
+        sector = start // sector_size
+        while sector * sector_size < end:
+            key = (write.disk_id, sector)
+            sector_start = sector * sector_size
+            first = max(start, sector_start) - sector_start
+            last = min(end, sector_start + sector_size) - sector_start
+            if first == 0 and last == sector_size:
+                value = record_id
+            else:
+                value = _entry_hash(lookup(key), (record_id, first, last))
+            yield key, value
+            sector += 1
+
+    def apply(self, write, record_id):
+        """Add a write to the in-order writes."""
+        for key, value in self._updates(write, record_id,
+                                        self._sectors.get):
+            if key in self._sectors:
+                self.digest -= _entry_hash(key, self._sectors[key])
+            self._sectors[key] = value
+            self.digest += _entry_hash(key, value)
+        self.digest %= _MODULUS
+
+    def signature(self, writes):
+        """
+        Return signature of state with additional writes applied.
+
+        @param writes: pairs of writes and their record ids, in the order
+            they are applied
+        """
+        overlay = {}
+
+        def lookup(key):
+            """Return current value of sector."""
+            if key in overlay:
+                return overlay[key]
+            return self._sectors.get(key)
+
+        for write, record_id in writes:
+            for key, value in self._updates(write, record_id, lookup):
+                overlay[key] = value
+
+        digest = self.digest
+        for key, value in overlay.items():
+            if key in self._sectors:
+                digest -= _entry_hash(key, self._sectors[key])
+            digest += _entry_hash(key, value)
+        return digest % _MODULUS
+
+
+class SignatureCache(object):
+
+    """Bounded set of signatures, forgets the least recently seen ones."""
+
+    def __init__(self, max_entries=1000000):
+        """Create cache keeping at most max_entries signatures."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+
+    def __len__(self):
+        """Return number of kept signatures."""
+        return len(self._entries)
+
+    def __contains__(self, signature):
+        """Check if signature is in cache."""
+        return signature in self._entries
+
+    def seen(self, signature):
+        """Add signature to cache, return True if it was already there."""
+        if signature in self._entries:
+            # move to the end, as most recently seen
+            del self._entries[signature]
+            self._entries[signature] = None
+            self.hits += 1
+            return True
+        self._entries[signature] = None
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return False
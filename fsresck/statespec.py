@@ -0,0 +1,286 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Compact descriptions of states for passing between processes."""
+
+import hashlib
+
+from .fragmenter import Fragmenter
+from .image import Image
+from .imagegenerator import LogReader
+from .noop import NoopFilter
+from .payloadstore import PayloadStore
+from .ranking import WindowSpace, rank_permutation, unrank_permutation
+from .sequence import AppendLog
+from .utils import file_digest
+from .writesshuffler import WritesShuffler
+
+
+def _state_spec(log_id, base_index, indexes, rank):
+    """Create L{StateSpec}, used for unpickling."""
+    return StateSpec(log_id, base_index, indexes, rank)
+
+
+class StateSpec(object):
+
+    """
+    State described by positions of writes in the log.
+
+    The state is the base image with the first L{base_index} writes of the
+    log applied in order and then the writes at positions L{indexes} (in
+    the whole log, sorted) in the order given by the lexicographic
+    permutation L{rank}. The writes are not referenced, so the object
+    pickles to a few tens of bytes and the state is rebuilt by a
+    L{StateSource} of the log identified by L{log_id}.
+    """
+
+    __slots__ = ('log_id', 'base_index', 'indexes', 'rank')
+
+    def __init__(self, log_id, base_index, indexes, rank=0):
+        """
+        Create object.
+
+        @param log_id: identifier of the log (and options of its reading)
+        @param base_index: number of writes applied in order
+        @param indexes: sorted positions of the writes of the draw group
+        @param rank: permutation of the draw group
+        """
+        self.log_id = log_id
+        self.base_index = base_index
+        self.indexes = tuple(indexes)
+        self.rank = rank
+
+    @classmethod
+    def from_draw_group(cls, log_id, base_index, draw_group):
+        """Create object from positions of writes of draw group, in order."""
+        return cls(log_id, base_index, sorted(draw_group),
+                   rank_permutation(tuple(draw_group)))
+
+    @property
+    def draw_group(self):
+        """Return positions of writes of the draw group, in order."""
+        return unrank_permutation(self.indexes, self.rank)
+
+    def __reduce__(self):
+        """Pickle only the values of the fields."""
+        return (_state_spec, (self.log_id, self.base_index, self.indexes,
+                              self.rank))
+
+    def __eq__(self, other):
+        """Check if the other object describes the same state."""
+        return isinstance(other, StateSpec) and \
+            (self.log_id, self.base_index, self.indexes, self.rank) == \
+            (other.log_id, other.base_index, other.indexes, other.rank)
+
+    def __ne__(self, other):
+        """Check if the other object describes a different state."""
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        """Return hash of the object."""
+        return hash((self.log_id, self.base_index, self.indexes, self.rank))
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "StateSpec(log_id={0!r}, base_index={1!r}, indexes={2!r}, "\
+            "rank={3!r})".format(self.log_id, self.base_index,
+                                 self.indexes, self.rank)
+
+
+class StateSource(object):
+
+    """
+    Writes of a log for rebuilding states from L{StateSpec}.
+
+    The writes are read (with payloads left in the log file) on first use
+    and kept in an L{AppendLog}. Only the names of the files and the
+    options are pickled, so the object can be sent to worker processes,
+    which read their own copy of the writes. With shared payloads, the
+    writes of draw groups reference a memory mapping of the log shared by
+    all processes (see L{PayloadStore}) instead of reading their data.
+    """
+
+    # number of hex digits of the digest of the log in the default log_id
+    LOG_ID_LENGTH = 12
+
+    def __init__(self, image_name, log_name, sector_size=None,
+                 noop_horizon=None, log_id=None, shared_payloads=False):
+        """
+        Create object.
+
+        @param image_name: name of the base image
+        @param log_name: name of the log file
+        @param sector_size: if set, writes are fragmented to that size
+        @param noop_horizon: if set, writes that don't modify the image are
+            removed, see L{NoopFilter}
+        @param log_id: identifier of the log in L{StateSpec}, a prefix
+            of the L{log_digest} by default
+        @param shared_payloads: return writes of draw groups with payloads
+            from a L{PayloadStore}
+        """
+        self.image_name = image_name
+        self.log_name = log_name
+        self.sector_size = sector_size
+        self.noop_horizon = noop_horizon
+        self._log_id = log_id
+        self.shared_payloads = shared_payloads
+        self._writes = None
+        self._payloads = None
+        self._log_digest = None
+
+    def __getstate__(self):
+        """Return the state for pickling, without the writes."""
+        state = self.__dict__.copy()
+        state['_writes'] = None
+        state['_payloads'] = None
+        return state
+
+    def read_writes(self):
+        """Return generator of the writes of the log, after filtering."""
+        writes = LogReader(self.log_name).reader(lazy=True)
+        if self.sector_size:
+            writes = Fragmenter(self.sector_size).fragment(writes)
+        if self.noop_horizon is not None:
+            writes = NoopFilter(self.image_name,
+                                self.noop_horizon).filter(writes)
+        return writes
+
+    @property
+    def log_digest(self):
+        """
+        Return digest of the log and the options of its reading.
+
+        Fragmenting and removal of writes change the numbering of writes
+        and windows, so logs read with different options get different
+        digests. Without the options it's the L{file_digest} of the log.
+        """
+        if self._log_digest is None:
+            digest = file_digest(self.log_name)
+            if self.sector_size or self.noop_horizon is not None:
+                options = "{0}:{1}:{2}".format(digest, self.sector_size,
+                                               self.noop_horizon)
+                digest = hashlib.sha256(options.encode('ascii')).hexdigest()
+            self._log_digest = digest
+        return self._log_digest
+
+    @property
+    def log_id(self):
+        """
+        Return identifier of the log (and the options of its reading).
+
+        By default it's a prefix of L{log_digest}, long enough to tell
+        logs apart and short enough to keep specs tens of bytes long.
+        """
+        if self._log_id is None:
+            return self.log_digest[:self.LOG_ID_LENGTH]
+        return self._log_id
+
+    @property
+    def writes(self):
+        """Return all writes of the log."""
+        if self._writes is None:
+            self._writes = AppendLog(self.read_writes())
+        return self._writes
+
+    def load(self):
+        """
+        Read the writes, digest the log and index the payloads now.
+
+        Worker processes forked after loading share the loaded data with
+        the parent instead of reading their own copy.
+        """
+        writes = self.writes
+        if self._log_id is None:
+            self._log_id = self.log_id
+        if self.shared_payloads and self._payloads is None:
+            self._payloads = PayloadStore.from_writes(self.log_name, writes)
+
+    @property
+    def payloads(self):
+        """Return L{PayloadStore} with payloads of all writes."""
+        if self._payloads is None:
+            self._payloads = PayloadStore.from_writes(self.log_name,
+                                                      self.writes)
+        return self._payloads
+
+    def shuffler(self):
+        """Return L{WritesShuffler} of the writes."""
+        return WritesShuffler(Image(self.image_name, []), self.writes)
+
+    def specs(self, group_size=3, shard=None, cost_model=None, after=None):
+        """
+        Return states as tuples of window number, rank and L{StateSpec}.
+
+        The states are the same as returned by
+        L{WritesShuffler.ranked_generator}.
+        """
+        for window_number, rank, base_writes, _, indexes in \
+                self.shuffler().ranked_indexes(group_size, shard,
+                                               cost_model, after):
+            base_index = len(base_writes)
+            yield (window_number, rank, StateSpec.from_draw_group(
+                self.log_id, base_index, [base_index + i for i in indexes]))
+
+    def spec(self, window_number, rank, group_size=3):
+        """
+        Return L{StateSpec} of the state with window number and rank.
+
+        Only the writes of the window are used, so states can be looked up
+        in any order.
+        """
+        writes = self.writes
+        if 0 <= window_number <= len(writes):
+            space = WindowSpace(
+                tuple(writes[i] for i in range(
+                    window_number,
+                    min(window_number + group_size, len(writes)))),
+                group_size)
+            if 0 <= rank < len(space):
+                return StateSpec.from_draw_group(
+                    self.log_id, window_number,
+                    [window_number + i for i in space.unrank_indexes(rank)])
+        raise ValueError("No state with rank {0} in window {1}"
+                         .format(rank, window_number))
+
+    def _check(self, spec):
+        """Verify that the state is of this log."""
+        if spec.log_id != self.log_id:
+            raise ValueError("State of a different log: {0!r}"
+                             .format(spec.log_id))
+
+    def image(self, spec):
+        """Return L{Image} with the in-order writes of the state."""
+        self._check(spec)
+        return Image(self.image_name, self.writes.view(0, spec.base_index))
+
+    def draw_group(self, spec):
+        """Return the writes of the draw group of the state, in order."""
+        self._check(spec)
+        writes = self.writes
+        if self.shared_payloads:
+            payloads = self.payloads
+            return tuple(payloads.write(i, writes[i])
+                         for i in spec.draw_group)
+        return tuple(writes[i] for i in spec.draw_group)
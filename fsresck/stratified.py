@@ -0,0 +1,213 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""Sampling of states spread over the whole write log."""
+
+import random
+from bisect import bisect_right
+
+from .sampling import Budget
+
+
+class Stratum(object):
+
+    """Range of consecutive windows of the log sampled as a whole."""
+
+    def __init__(self, first, last, start, end):
+        """
+        Create object.
+
+        @param first: number of the first window of the stratum
+        @param last: number of the window after the last one
+        @param start: global rank of the first state of the stratum
+        @param end: global rank after the last state of the stratum
+        """
+        self.first = first
+        self.last = last
+        self.start = start
+        self.end = end
+        self.sampled = 0
+        self.failed = 0
+        # shuffled ranks not yet sampled, once most of them were sampled
+        self.remaining = None
+
+    @property
+    def total(self):
+        """Return the number of states in the stratum."""
+        return self.end - self.start
+
+    @property
+    def coverage(self):
+        """Return the fraction of the states that were sampled."""
+        if not self.total:
+            return 1.0
+        return float(self.sampled) / self.total
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "Stratum(windows={0}-{1}, sampled={2}, total={3}, "\
+               "failed={4})".format(self.first, self.last - 1, self.sampled,
+                                    self.total, self.failed)
+
+    def to_dict(self):
+        """Return coverage as a dictionary that can be serialised to JSON."""
+        return {'first_window': self.first,
+                'last_window': self.last - 1,
+                'total': self.total,
+                'sampled': self.sampled,
+                'failed': self.failed,
+                'coverage': self.coverage}
+
+
+class StratifiedSampler(object):
+
+    """
+    Random sampling of states spread evenly over the windows of the log.
+
+    The windows are split to strata of consecutive windows of the same
+    length and every stratum gets a share of the sampled states
+    proportional to the number of its windows, so a run that is stopped
+    early tests states from the whole log. Strata with failures get
+    larger shares and are split in halves, so the sampling concentrates
+    on the windows where the failures were found. States are sampled
+    without repetitions.
+    """
+
+    def __init__(self, sizes, strata=16, rng=None, boost=4.0):
+        """
+        Create object.
+
+        @param sizes: number of states of every window
+        @param strata: initial number of strata
+        @param rng: source of randomness, like L{random.Random}
+        @param boost: increase of the share of a stratum for every failure
+            found in it
+        """
+        self.starts = []
+        total = 0
+        for size in sizes:
+            self.starts.append(total)
+            total += size
+        self.total = total
+        windows = len(self.starts)
+        self.rng = random.Random() if rng is None else rng
+        self.boost = boost
+        count = max(min(strata, windows), 1)
+        bounds = [windows * i // count for i in range(count + 1)]
+        self.strata = [self._stratum(first, last)
+                       for first, last in zip(bounds, bounds[1:])
+                       if first < last]
+        self.seen = set()
+        # failures in every window, for splitting strata
+        self._failures = {}
+
+    def _stratum(self, first, last):
+        """Create L{Stratum} of windows from first to last."""
+        start = self.starts[first] if first < len(self.starts) \
+            else self.total
+        end = self.starts[last] if last < len(self.starts) else self.total
+        return Stratum(first, last, start, end)
+
+    def _weight(self, stratum):
+        """Return the share of sampled states of the stratum."""
+        return (stratum.last - stratum.first) * \
+            (1 + self.boost * stratum.failed)
+
+    def _draw(self, stratum):
+        """Return global rank of a state of the stratum not sampled yet."""
+        if stratum.remaining is None and \
+                (stratum.sampled + 1) * 2 <= stratum.total:
+            while True:
+                rank = self.rng.randrange(stratum.start, stratum.end)
+                if rank not in self.seen:
+                    return rank
+        if stratum.remaining is None:
+            stratum.remaining = [i for i in range(stratum.start, stratum.end)
+                                 if i not in self.seen]
+            self.rng.shuffle(stratum.remaining)
+        return stratum.remaining.pop()
+
+    def window(self, global_rank):
+        """Return window number and rank in it of a global rank."""
+        window_number = bisect_right(self.starts, global_rank) - 1
+        return window_number, global_rank - self.starts[window_number]
+
+    def stratum(self, window_number):
+        """Return L{Stratum} with the window."""
+        for stratum in self.strata:
+            if stratum.first <= window_number < stratum.last:
+                return stratum
+        raise ValueError("No window {0}".format(window_number))
+
+    def generate(self, max_states=None, max_seconds=None):
+        """
+        Return generator of window numbers and ranks of sampled states.
+
+        The generator stops when the budget is used up (the time includes
+        the processing of returned states) or all states were returned.
+        """
+        budget = Budget(max_states, max_seconds)
+        sampled = 0
+        while not budget.exhausted(sampled):
+            candidates = [i for i in self.strata if i.sampled < i.total]
+            if not candidates:
+                break
+            stratum = min(candidates, key=lambda i: (
+                i.sampled / float(self._weight(i)), i.first))
+            global_rank = self._draw(stratum)
+            self.seen.add(global_rank)
+            stratum.sampled += 1
+            sampled += 1
+            yield self.window(global_rank)
+
+    def report(self, window_number, failed):
+        """
+        Inform sampler about the result of a sampled state.
+
+        A stratum with a failure is split in halves, the half with the
+        failing window keeps the increased share.
+        """
+        if not failed:
+            return
+        self._failures[window_number] = \
+            self._failures.get(window_number, 0) + 1
+        stratum = self.stratum(window_number)
+        if stratum.last - stratum.first < 2:
+            stratum.failed += 1
+            return
+        middle = (stratum.first + stratum.last) // 2
+        position = self.strata.index(stratum)
+        halves = [self._stratum(stratum.first, middle),
+                  self._stratum(middle, stratum.last)]
+        for half in halves:
+            half.sampled = sum(1 for i in self.seen
+                               if half.start <= i < half.end)
+            half.failed = sum(self._failures.get(i, 0)
+                              for i in range(half.first, half.last))
+        self.strata[position:position + 1] = halves
+
+    def coverage(self):
+        """Return list of L{Stratum} in order of windows."""
+        return list(self.strata)
@@ -21,6 +21,7 @@
 
 """Utility functions."""
 
+import hashlib
 import subprocess
 import tempfile
 import os
@@ -52,3 +53,15 @@ def get_temp_file_name(directory, prefix='fsresck.'):
     handle, file_name = tempfile.mkstemp(prefix=prefix, dir=directory)
     os.close(handle)
     return file_name
+
+
+def file_digest(file_name, chunk_size=1 << 20):
+    """Return hex SHA-256 digest of the contents of a file."""
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as data_file:
+        while True:
+            data = data_file.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
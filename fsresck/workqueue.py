@@ -0,0 +1,480 @@
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+"""
+Distribution of windows to workers over a socket.
+
+The coordinator splits the windows of the log into work units (ranges of
+consecutive windows) and hands them out to workers that connect to it.
+Workers build the states from their own copies of the base image and log,
+check them and send back the results of every finished window. Messages
+are JSON objects, one per line, every message of a worker gets a reply:
+
+ - C{{"type": "request", "worker": name, "finished": unit}} asks for a new
+   unit (reporting the previous one as finished), answered with
+   C{{"type": "unit", "unit": id, "first": window, "last": window}},
+   C{{"type": "wait", "seconds": s}} or C{{"type": "done"}}
+ - C{{"type": "window", "unit": id, "window": w, "results": [...]}} sends
+   results of a window, answered with C{{"type": "ack", "last": window}}
+   with the current end of the unit (it shrinks when other worker steals
+   part of it) or C{{"type": "abort"}} when the unit was given to other
+   worker
+"""
+
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from .driver import Driver, StateResult
+
+
+class WorkUnit(object):
+
+    """Range of windows from first to last (exclusive) given to a worker."""
+
+    def __init__(self, unit_id, first, last):
+        """Create object."""
+        self.unit_id = unit_id
+        self.first = first
+        self.last = last
+        # first window without results
+        self.next = first
+        self.worker = None
+        self.deadline = None
+
+    def __repr__(self):
+        """Return human readable representation of object."""
+        return "WorkUnit(unit_id={0!r}, first={1!r}, last={2!r}, "\
+            "next={3!r}, worker={4!r})".format(self.unit_id, self.first,
+                                               self.last, self.next,
+                                               self.worker)
+
+
+class Coordinator(object):
+
+    """
+    Bookkeeping of work units handed out to workers.
+
+    Units are ranges of windows of about L{unit_cost} estimated cost.
+    Units are leased to workers, the lease is renewed by every message of
+    the worker. Units of workers that disconnect or let the lease expire
+    are returned to the queue (without the windows that have results).
+    When the queue is empty, an idle worker steals the second half of the
+    windows of the leased unit with the largest remaining cost.
+    """
+
+    def __init__(self, costs, unit_cost=None, lease_seconds=600.0,
+                 on_result=None, wait_seconds=0.5):
+        """
+        Create object.
+
+        @param costs: estimated costs of windows, see
+            L{CostModel.window_cost}
+        @param unit_cost: largest cost of a unit that has more than one
+            window, by default a hundredth of the total cost
+        @param lease_seconds: time after which a unit of a worker that
+            didn't send any message is given to other worker
+        @param on_result: function called with every received
+            L{StateResult}
+        @param wait_seconds: time after which idle workers should ask for
+            work again
+        """
+        self.costs = list(costs)
+        total = sum(self.costs)
+        if unit_cost is None:
+            unit_cost = total / 100.0
+        self.unit_cost = unit_cost
+        self.lease_seconds = lease_seconds
+        self.on_result = on_result
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._queue = deque()
+        self._leased = {}
+        self._windows_done = 0
+        self.states = 0
+        self.failed = 0
+        self.requeued = 0
+        self.stolen = 0
+
+        first = 0
+        cost = 0
+        for window, window_cost in enumerate(self.costs):
+            if window > first and cost + window_cost > unit_cost:
+                self._queue.append(self._unit(first, window))
+                first = window
+                cost = 0
+            cost += window_cost
+        if first < len(self.costs):
+            self._queue.append(self._unit(first, len(self.costs)))
+
+    def _unit(self, first, last):
+        """Create a new unit."""
+        unit = WorkUnit(self._next_id, first, last)
+        self._next_id += 1
+        return unit
+
+    @property
+    def finished(self):
+        """Check if all units were done."""
+        with self._lock:
+            return not self._queue and not self._leased
+
+    def progress(self):
+        """Return dictionary with the progress of the run."""
+        with self._lock:
+            return {'windows': len(self.costs),
+                    'windows_done': self._windows_done,
+                    'states': self.states,
+                    'failed': self.failed,
+                    'units_queued': len(self._queue),
+                    'units_leased': len(self._leased),
+                    'requeued': self.requeued,
+                    'stolen': self.stolen}
+
+    def assign(self, worker, finished=None, now=None):
+        """
+        Return reply to request for work from worker.
+
+        @param finished: id of the unit the worker finished
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if finished is not None:
+                unit = self._leased.get(finished)
+                if unit is not None and unit.worker == worker:
+                    self._windows_done += unit.last - unit.next
+                    del self._leased[finished]
+            if self._queue:
+                unit = self._queue.popleft()
+            else:
+                unit = self._steal()
+            if unit is None:
+                if self._leased:
+                    return {'type': 'wait', 'seconds': self.wait_seconds}
+                return {'type': 'done'}
+            unit.worker = worker
+            unit.deadline = now + self.lease_seconds
+            self._leased[unit.unit_id] = unit
+            return {'type': 'unit', 'unit': unit.unit_id,
+                    'first': unit.first, 'last': unit.last}
+
+    def _steal(self):
+        """Split the leased unit with largest remaining cost."""
+        best = None
+        best_cost = 0
+        for unit in self._leased.values():
+            # the window unit.next is being checked by the owner
+            cost = sum(self.costs[unit.next + 1:unit.last])
+            if unit.last - unit.next >= 2 and cost > best_cost:
+                best = unit
+                best_cost = cost
+        if best is None:
+            return None
+        # keep about half of the cost of the windows after the one being
+        # checked with the owner
+        split = best.next + 1
+        kept = 0
+        while split < best.last - 1 and \
+                (kept + self.costs[split]) * 2 <= best_cost:
+            kept += self.costs[split]
+            split += 1
+        stolen = self._unit(split, best.last)
+        best.last = split
+        self.stolen += 1
+        return stolen
+
+    def window_done(self, worker, unit_id, window, results, now=None):
+        """
+        Record results of a window, return reply to the worker.
+
+        @param results: list of L{StateResult}
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            unit = self._leased.get(unit_id)
+            if unit is None or unit.worker != worker:
+                return {'type': 'abort'}
+            unit.deadline = now + self.lease_seconds
+            if unit.next <= window < unit.last:
+                self._windows_done += window - unit.next + 1
+                unit.next = window + 1
+                for result in results:
+                    self.states += 1
+                    if not result.result.passed:
+                        self.failed += 1
+                    if self.on_result is not None:
+                        self.on_result(result)
+            return {'type': 'ack', 'last': unit.last}
+
+    def worker_lost(self, worker):
+        """Return units of a worker to the queue."""
+        with self._lock:
+            for unit in list(self._leased.values()):
+                if unit.worker == worker:
+                    self._requeue(unit)
+
+    def expire(self, now=None):
+        """Return units with expired leases to the queue."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for unit in list(self._leased.values()):
+                if unit.deadline < now:
+                    self._requeue(unit)
+
+    def _requeue(self, unit):
+        """Put not finished windows of a leased unit back to the queue."""
+        del self._leased[unit.unit_id]
+        if unit.next < unit.last:
+            self._queue.appendleft(self._unit(unit.next, unit.last))
+            self.requeued += 1
+
+    def handle(self, worker, message):
+        """Return reply to a message from worker."""
+        if message['type'] == 'request':
+            return self.assign(worker, message.get('finished'))
+        if message['type'] == 'window':
+            results = [StateResult.from_dict(i) for i in message['results']]
+            return self.window_done(worker, message['unit'],
+                                    message['window'], results)
+        return {'type': 'error', 'message': 'unknown message type'}
+
+    def listen(self, address):
+        """
+        Return server listening for workers on address.
+
+        @param address: tuple with host and port for TCP or a path of a
+            Unix socket
+        """
+        server = _make_server(address)
+        server.coordinator = self
+        return server
+
+    def serve(self, server, poll_seconds=1.0):
+        """Accept workers on server from L{listen} until all units are done."""
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            while not self.finished:
+                time.sleep(min(poll_seconds, self.wait_seconds))
+                self.expire()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    """Connection of a single worker."""
+
+    def handle(self):
+        """Reply to messages of the worker."""
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            for line in self.rfile:
+                message = json.loads(line.decode('utf-8'))
+                if worker is None:
+                    # the same name can be reused by a restarted worker
+                    worker = (message.get('worker'), id(self))
+                reply = coordinator.handle(worker, message)
+                self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except (IOError, OSError, ValueError):
+            pass
+        finally:
+            if worker is not None:
+                coordinator.worker_lost(worker)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+
+    """Threaded TCP server."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+
+        """Threaded Unix socket server."""
+
+        daemon_threads = True
+
+
+def _make_server(address):
+    """Return server listening on address."""
+    if isinstance(address, tuple):
+        return _TCPServer(address, _Handler)
+    return _UnixServer(address, _Handler)
+
+
+def parse_address(text):
+    """
+    Convert "host:port" to a tuple, return other strings unchanged.
+
+    Strings with a slash are always paths of Unix sockets.
+    """
+    if '/' in text or ':' not in text:
+        return text
+    host, port = text.rsplit(':', 1)
+    try:
+        return host, int(port)
+    except ValueError:
+        raise ValueError("invalid port in address: {0!r}".format(text))
+
+
+def connect(address):
+    """Return socket connected to coordinator at address."""
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+class Worker(object):
+
+    """
+    Worker checking units of windows received from a coordinator.
+
+    States are created with a L{WritesShuffler} built from local copies of
+    the base image and the log and checked with a L{Driver}.
+    """
+
+    def __init__(self, address, shuffler_factory, checker, group_size=3,
+                 workers=1, image_dir="/tmp", name=None):
+        """
+        Create object.
+
+        @param address: address of the coordinator, see
+            L{Coordinator.listen}
+        @param shuffler_factory: function returning new L{WritesShuffler}
+            for the local base image and log
+        @param checker: checker of states, see L{Driver}
+        @param group_size: size of the permutation window
+        @param workers: number of local worker processes
+        @param image_dir: directory for temporary images
+        @param name: name of the worker reported to the coordinator
+        """
+        self.address = address
+        self.shuffler_factory = shuffler_factory
+        self.checker = checker
+        self.group_size = group_size
+        self.workers = workers
+        self.image_dir = image_dir
+        self.name = socket.gethostname() if name is None else name
+        self.units = 0
+        self.states = 0
+        self._last = None
+        self._stream = None
+
+    def _call(self, message):
+        """Send message to the coordinator and return the reply."""
+        self._stream.write(json.dumps(message).encode('utf-8') + b'\n')
+        self._stream.flush()
+        line = self._stream.readline()
+        if not line:
+            raise EOFError("Coordinator closed connection")
+        return json.loads(line.decode('utf-8'))
+
+    def run(self):
+        """Check units until the coordinator has no more work."""
+        sock = connect(self.address)
+        self._stream = sock.makefile('rwb')
+        try:
+            finished = None
+            while True:
+                reply = self._call({'type': 'request', 'worker': self.name,
+                                    'finished': finished})
+                finished = None
+                if reply['type'] == 'done':
+                    break
+                if reply['type'] == 'wait':
+                    time.sleep(reply['seconds'])
+                    continue
+                self._run_unit(reply)
+                self.units += 1
+                finished = reply['unit']
+        finally:
+            self._stream.close()
+            sock.close()
+
+    def _limited(self, states):
+        """Return states of windows before the end of the unit."""
+        for state in states:
+            if state[0] >= self._last:
+                break
+            yield state
+
+    def _run_unit(self, unit):
+        """Check states of the unit, send results of every window."""
+        self._last = unit['last']
+        shuffler = self.shuffler_factory()
+        shuffler.image_dir = self.image_dir
+        driver = Driver(self.checker, self.workers, self.image_dir)
+        states = shuffler.ranked_generator(self.group_size,
+                                           after=(unit['first'], -1))
+        results = driver.run(self._limited(states))
+        try:
+            current = None
+            batch = []
+            for result in results:
+                if result.window_number >= self._last:
+                    continue
+                if batch and result.window_number != current:
+                    if not self._send_window(unit, current, batch):
+                        return
+                    batch = []
+                current = result.window_number
+                batch.append(result)
+            if batch and current < self._last:
+                self._send_window(unit, current, batch)
+        finally:
+            results.close()
+            if shuffler.base_image.temp_image_name is not None:
+                shuffler.cleanup()
+
+    def _send_window(self, unit, window, batch):
+        """Send results of a window, return False if unit was aborted."""
+        reply = self._call({'type': 'window', 'unit': unit['unit'],
+                            'window': window,
+                            'results': [i.to_dict() for i in batch]})
+        self.states += len(batch)
+        if reply['type'] == 'abort':
+            return False
+        self._last = reply['last']
+        return True
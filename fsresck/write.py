@@ -24,6 +24,8 @@
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 """Handling of image modification requests (writes)."""
 
+from .errors import TruncatedFileError
+
 
 def overlapping(iterator):
     """Check if the writes in iterator are not overlapping each other."""
@@ -36,17 +38,33 @@ def overlapping(iterator):
             if write.disk_id != other_write.disk_id:
                 continue
             write_start = write.offset
-            write_end = write.offset + len(write.data)
+            write_end = write.offset + write.length
             other_write_start = other_write.offset
-            other_write_end = other_write.offset + len(other_write.data)
+            other_write_end = other_write.offset + other_write.length
 
-            if other_write_start < write_end < other_write_end:
-                return True
-            if other_write_start <= write_start < other_write_end:
+            if write_start < other_write_end and \
+                    other_write_start < write_end:
                 return True
     return False
 
 
+def overlap_masks(writes):
+    """
+    Return bit masks of writes overlapping each of the writes.
+
+    Bit j of the i-th returned integer is set if write i and write j
+    overlap.
+    """
+    writes = list(writes)
+    masks = [0] * len(writes)
+    for i, write in enumerate(writes):
+        for j in range(i + 1, len(writes)):
+            if overlapping((write, writes[j])):
+                masks[i] |= 1 << j
+                masks[j] |= 1 << i
+    return masks
+
+
 class Write(object):
 
     """Single image modification request."""
@@ -67,6 +85,11 @@ class Write(object):
         self.start_time = None
         self.end_time = None
 
+    @property
+    def length(self):
+        """Return the length of the data written."""
+        return len(self.data)
+
     def __hash__(self):
         """Return the hash of the object."""
         return hash((self.offset, bytes(self.data), self.disk_id,
@@ -77,14 +100,14 @@ class Write(object):
         if self.disk_id is None and self.start_time is None and \
                 self.end_time is None:
             return "<Write offset={0}, len(data)={1}>".format(
-                self.offset, len(self.data))
+                self.offset, self.length)
         elif self.start_time is None and self.end_time is None:
             return "<Write offset={0}, len(data)={1}, disk_id={2}>".format(
-                self.offset, len(self.data), self.disk_id)
+                self.offset, self.length, self.disk_id)
         else:
             return "<Write offset={0}, len(data)={1}, disk_id={2}, "\
                    "start_time={3}, end_time={4}>".format(
-                       self.offset, len(self.data), self.disk_id,
+                       self.offset, self.length, self.disk_id,
                        self.start_time, self.end_time)
 
     def set_times(self, start_time, end_time):
@@ -92,6 +115,16 @@ class Write(object):
         self.start_time = start_time
         self.end_time = end_time
 
+    def slice(self, start, end):
+        """
+        Return a write of part of the data of this write.
+
+        The data of returned write is a memoryview of the data of this write,
+        start and end are positions in the data. Times are not copied.
+        """
+        return Write(self.offset + start, memoryview(self.data)[start:end],
+                     self.disk_id)
+
     def __eq__(self, other):
         """
         Check if objects are identical.
@@ -109,3 +142,72 @@ class Write(object):
         Compare the object with another to check if they are different
         """
         return not self.__eq__(other)
+
+
+class LazyWrite(Write):
+
+    """
+    Image modification request with data stored in a file.
+
+    The data is not kept in memory, it is read from the file every time
+    it is accessed, so the object can be kept around at a constant memory
+    cost. Two lazy writes are equal if they reference the same data.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, offset, file_name, data_offset, data_length,
+                 disk_id=None):
+        """
+        Create an object instance.
+
+        @type offset: int
+        @param offset: the start place for the write modification request
+        @type file_name: str
+        @param file_name: name of the file with the data (the write log)
+        @type data_offset: int
+        @param data_offset: position of the data in the file
+        @type data_length: int
+        @param data_length: length of the data
+        @param disk_id: base image disk UUID
+        """
+        self.offset = offset
+        self.file_name = file_name
+        self.data_offset = data_offset
+        self.data_length = data_length
+        self.disk_id = disk_id
+        self.start_time = None
+        self.end_time = None
+    # pylint: enable=super-init-not-called
+
+    @property
+    def data(self):
+        """Read the data of the write from file."""
+        with open(self.file_name, 'rb') as data_file:
+            data_file.seek(self.data_offset)
+            data = data_file.read(self.data_length)
+        if len(data) != self.data_length:
+            raise TruncatedFileError("truncated file")
+        return data
+
+    @property
+    def length(self):
+        """Return the length of the data written."""
+        return self.data_length
+
+    def __hash__(self):
+        """Return the hash of the object."""
+        return hash((self.offset, self.file_name, self.data_offset,
+                     self.data_length, self.disk_id, self.start_time,
+                     self.end_time))
+
+    def slice(self, start, end):
+        """
+        Return a lazy write of part of the data of this write.
+
+        Start and end are positions in the data. Times are not copied.
+        """
+        start = min(start, self.data_length)
+        end = max(start, min(end, self.data_length))
+        return LazyWrite(self.offset + start, self.file_name,
+                         self.data_offset + start, end - start,
+                         self.disk_id)
@@ -28,10 +28,198 @@
 from .image import Image
 
 import random
-from itertools import permutations, islice
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import permutations, islice, combinations, chain, product
 from collections import deque
 
-from .write import overlapping
+from .compat import UINT64
+from .write import overlapping, overlap_masks
+from .sequence import AppendLog
+from .ranking import WindowSpace
+from .sharding import CostModel
+from .sampling import sample_ranks, SamplingReport, Budget
+from .signature import SignatureTracker
+
+
+def logical_groups(window, group_size, bloom_filter=None):
+    """
+    Return unique groups of writes that can reach disk from a window.
+
+    Generator that returns pairs of draw groups (tuples of writes from the
+    window, in order they are applied) and a flag that says if the group
+    creates an image not reachable from writes applied in order.
+
+    Groups of overlapping writes are returned in every order, as the order
+    matters for them, groups of non-overlapping writes are returned just
+    once.
+
+    Already returned groups are remembered as integers: ordered groups as
+    indexes of writes in the window packed into a single number, unordered
+    ones as bit masks of the indexes.
+
+    @type bloom_filter: L{BloomFilter}
+    @param bloom_filter: remember the groups in the filter instead (it is
+        cleared first), memory use is then fixed, but groups reported as
+        false positives by the filter are silently skipped
+    """
+    if not window:
+        return
+    size = len(window)
+    overlaps = overlap_masks(window)
+    if bloom_filter is None:
+        existing_lists = set()
+        existing_sets = set()
+    else:
+        bloom_filter.clear()
+        existing_lists = existing_sets = bloom_filter
+    # slice the permutations so that we get partial non-in-order writes
+    for indexes in permutations(range(size)):
+        list_key = 0
+        mask = 0
+        is_overlapping = False
+        for length in range(1, min(group_size, size) + 1):
+            index = indexes[length - 1]
+            # digits are shifted by one so that groups of different length
+            # have different keys
+            list_key = list_key * (size + 1) + index + 1
+            is_overlapping = is_overlapping or bool(overlaps[index] & mask)
+            mask |= 1 << index
+            # make sure we do not return the same list of writes
+            # as we are slicing the tuples returned by permutations()
+            # so for large group sizes there would be a lot of duplication
+            if list_key in existing_lists:
+                continue
+            existing_lists.add(list_key)
+            # if the writes overlap then the order matters so return them,
+            # unless they are in-order, then they will be returned as a
+            # base image
+            if is_overlapping:
+                yield (tuple(window[i] for i in indexes[:length]),
+                       indexes[0] != 0)
+            else:
+                # if they don't overlap, then order doesn't matter
+                # so don't return duplicates of such lists
+                # (negative keys, so they differ from list keys in filter)
+                if -mask in existing_sets:
+                    continue
+                existing_sets.add(-mask)
+                # skip ones that include the first element (as this has
+                # the same effect as an in-order set of writes for
+                # overlapping)
+                yield (tuple(window[i] for i in indexes[:length]),
+                       not mask & 1)
+
+
+def draw_groups(window, group_size, bloom_filter=None):
+    """
+    Return unique draw groups for a window of writes.
+
+    Skips the groups that have the same effect as writes applied in order,
+    as those are returned as base images.
+    """
+    return (group for group, out_of_order in
+            logical_groups(window, group_size, bloom_filter)
+            if out_of_order)
+
+
+def reorder_distance(indexes):
+    """
+    Return the number of writes that are dropped or displaced in a group.
+
+    indexes are positions of the writes of a draw group in the log. Writes
+    before the last one that are missing in the group are dropped, writes
+    outside the longest increasing subsequence of the group are displaced.
+    """
+    if not indexes:
+        return 0
+    # length of longest increasing subsequence
+    tails = []
+    for index in indexes:
+        position = bisect_left(tails, index)
+        if position == len(tails):
+            tails.append(index)
+        else:
+            tails[position] = index
+    return max(indexes) + 1 - len(tails)
+
+
+def _perturbations(sequence, items):
+    """Return sequences with every item inserted anywhere or skipped."""
+    if not items:
+        yield sequence
+        return
+    for ret in _perturbations(sequence, items[1:]):
+        yield ret
+        for position in range(len(ret) + 1):
+            yield ret[:position] + (items[0], ) + ret[position:]
+
+
+def bounded_groups(window, max_distance):
+    """
+    Return unique draw groups at most max_distance from in-order writes.
+
+    Works like L{draw_groups}, but instead of all permutations returns
+    only groups in which at most max_distance writes are dropped or
+    displaced (see L{reorder_distance}). The number of returned groups
+    grows polynomially with the size of the window.
+    """
+    if not window:
+        return
+    existing_lists = set()
+    existing_sets = set()
+    for last in range(len(window)):
+        in_order = tuple(range(last + 1))
+        for count in range(min(max_distance, last + 1) + 1):
+            for moved in combinations(in_order, count):
+                kept = tuple(i for i in in_order if i not in moved)
+                for indexes in _perturbations(kept, moved):
+                    if last not in indexes:
+                        continue
+                    if indexes in existing_lists or indexes == in_order:
+                        continue
+                    existing_lists.add(indexes)
+                    if reorder_distance(indexes) > max_distance:
+                        continue
+                    draw_group = tuple(window[i] for i in indexes)
+                    # same rules as in logical_groups(): if the first write
+                    # of window is first, or is in group of non-overlapping
+                    # writes, the image is returned for the next window
+                    if overlapping(draw_group):
+                        if indexes[0] != 0:
+                            yield draw_group
+                    else:
+                        index_set = frozenset(indexes)
+                        if index_set in existing_sets:
+                            continue
+                        existing_sets.add(index_set)
+                        if 0 not in index_set:
+                            yield tuple(window[i] for i in
+                                        sorted(index_set))
+
+
+def tear_patterns(fragments, max_subset_fragments=4):
+    """
+    Return the ways in which a write split into fragments can be torn.
+
+    Returns tuples of fragments that were written to disk when the
+    write was interrupted. For writes with at most max_subset_fragments
+    fragments all proper subsets are returned, for longer writes only
+    prefixes and suffixes (as happens with sequential write-back).
+    """
+    count = len(fragments)
+    if count < 2:
+        return
+    if count <= max_subset_fragments:
+        for size in range(1, count):
+            for subset in combinations(fragments, size):
+                yield subset
+    else:
+        for size in range(1, count):
+            yield tuple(fragments[:size])
+        for size in range(1, count):
+            yield tuple(fragments[size:])
 
 
 class WritesShuffler(object):
@@ -41,20 +229,22 @@ class WritesShuffler(object):
 
     Generator that takes an image, set of writes and generates permutations
     of images and writes to test
-
-    @todo: parametrise random source
     """
 
-    def __init__(self, base_image, writes):
+    def __init__(self, base_image, writes, rng=None):
         """
         Link image file with writes.
 
         Provide the image that will create the base for the tests and the
         writes that should get tested.
+
+        @param rng: source of randomness for L{shuffle} and L{sample}, like
+            a seeded L{random.Random} instance, the random module by default
         """
         self.base_image = base_image
         self.writes = writes
         self.image_dir = "/tmp"
+        self.rng = random if rng is None else rng
 
     def shuffle(self):
         """Return a random permutation of writes with the image."""
@@ -66,13 +256,13 @@ class WritesShuffler(object):
 
         while True:
             writes = self.writes[:]
-            random.shuffle(writes)
+            self.rng.shuffle(writes)
             # skip permutations which have writes in order
             if writes[0] == self.writes[0]:
                 continue
             yield (Image(image, []), writes)
 
-    def generator(self, group_size=3):
+    def generator(self, group_size=3, signatures=None, bloom_filter=None):
         """
         Return all permutations of writes on an image.
 
@@ -82,56 +272,243 @@ class WritesShuffler(object):
 
         The group_size specifies how big the permutation group will be, where
         the group is a set of last written blocks to image.
+
+        @type signatures: L{SignatureCache}
+        @param signatures: cache of signatures of already returned states,
+            if set, states equivalent to already returned ones (every sector
+            last written by the same write, see L{SignatureTracker}) are
+            skipped, also across windows
+        @type bloom_filter: L{BloomFilter}
+        @param bloom_filter: filter used for removing duplicate draw groups
+            in a window, instead of exact sets, see L{logical_groups}
+        """
+        if self.base_image is None:
+            raise TypeError("base_image can't be None")
+        if self.writes is None:
+            raise TypeError("writes can't be None")
+        image = self.base_image.create_image(self.image_dir)
+
+        tracker = None if signatures is None else SignatureTracker()
+        for base_writes, window in self.windows(group_size):
+            if tracker is None:
+                # first return the base image with writes in order
+                yield (Image(image, base_writes), tuple())
+                for draw_group in draw_groups(window, group_size,
+                                              bloom_filter):
+                    yield (Image(image, base_writes), draw_group)
+                continue
+
+            # the writes are added to base one at a time, record id of a
+            # write is its position in the log
+            base_len = len(base_writes)
+            if base_len:
+                tracker.apply(base_writes[base_len - 1], base_len - 1)
+            if not signatures.seen(tracker.digest):
+                yield (Image(image, base_writes), tuple())
+            record_ids = dict((id(write), base_len + i)
+                              for i, write in enumerate(window))
+            for draw_group in draw_groups(window, group_size, bloom_filter):
+                signature = tracker.signature(
+                    (i, record_ids[id(i)]) for i in draw_group)
+                if not signatures.seen(signature):
+                    yield (Image(image, base_writes), draw_group)
+
+    def distance_generator(self, window_size=10, max_distance=1):
+        """
+        Return states with few writes dropped or reordered.
+
+        Works like L{generator}, but for every window returns only the
+        draw groups in which at most max_distance writes are dropped or
+        displaced relative to log order (see L{bounded_groups}), so much
+        larger windows can be tested.
+
+        @param window_size: number of writes in the window
+        @param max_distance: largest number of dropped or displaced writes
+        """
+        if self.base_image is None:
+            raise TypeError("base_image can't be None")
+        if self.writes is None:
+            raise TypeError("writes can't be None")
+        image = self.base_image.create_image(self.image_dir)
+
+        for base_writes, window in self.windows(window_size):
+            yield (Image(image, base_writes), tuple())
+            for draw_group in bounded_groups(window, max_distance):
+                yield (Image(image, base_writes), draw_group)
+
+    def ranked_generator(self, group_size=3, shard=None, cost_model=None,
+                         after=None):
+        """
+        Return all permutations of writes on an image with their ranks.
+
+        Returns the same states as L{generator}, but as tuples of window
+        number, rank of the state in the window (see L{WindowSpace}),
+        image and draw group, ordered by the window and rank.
+
+        @type shard: L{Shard}
+        @param shard: return only the states that belong to the shard,
+            requires reading the writes twice
+        @type cost_model: L{CostModel}
+        @param cost_model: estimated cost of windows, used for splitting
+            the states between shards
+        @type after: tuple
+        @param after: window number and rank of the last state that should
+            not be returned, used for resuming interrupted runs
         """
         if self.base_image is None:
             raise TypeError("base_image can't be None")
+        image = None
+        for window_number, rank, base_writes, window, indexes in \
+                self.ranked_indexes(group_size, shard, cost_model, after):
+            # create the base image only if there are states to return
+            if image is None:
+                image = self.base_image.create_image(self.image_dir)
+            yield (window_number, rank, Image(image, base_writes),
+                   tuple(window[i] for i in indexes))
+
+    def ranked_indexes(self, group_size=3, shard=None, cost_model=None,
+                       after=None):
+        """
+        Return the states of L{ranked_generator} as indexes of writes.
+
+        Returns tuples of window number, rank, in-order writes, the window
+        and indexes of the writes of the draw group in the window. Doesn't
+        create any image.
+        """
         if self.writes is None:
             raise TypeError("writes can't be None")
+
+        if shard is None:
+            ranges = None
+        else:
+            # writes need to be read twice
+            self.writes = list(self.writes)
+            ranges = self._shard_ranges(group_size, shard, cost_model)
+
+        for window_number, (base_writes, window) in \
+                enumerate(self.windows(group_size)):
+            if ranges is not None:
+                first, last = next(ranges)
+            if after is not None and window_number < after[0]:
+                continue
+            space = WindowSpace(window, group_size)
+            if ranges is None:
+                first, last = 0, len(space)
+            if after is not None and window_number == after[0]:
+                first = max(first, after[1] + 1)
+            for rank in range(first, last):
+                yield (window_number, rank, base_writes, window,
+                       space.unrank_indexes(rank))
+
+    def _shard_ranges(self, group_size, shard, cost_model):
+        """Return generator of rank ranges of windows that shard owns."""
+        if cost_model is None:
+            cost_model = CostModel()
+        sizes = [len(space) for _, space in self.window_spaces(group_size)]
+        total = float(sum(cost_model.window_cost(i) for i in sizes))
+        start = 0
+        for size in sizes:
+            yield shard.rank_range(start, cost_model.image_cost,
+                                   cost_model.state_cost, size, total)
+            start += cost_model.window_cost(size)
+
+    def sample(self, group_size=3, max_states=None, max_seconds=None,
+               report=None):
+        """
+        Return states drawn at random, without repetitions.
+
+        Every state that L{generator} returns is equally likely to be drawn
+        and is returned at most once. States are returned as tuples of
+        window number, rank, image and draw group, like in
+        L{ranked_generator}. The generator stops when the budget is used
+        up (the time includes the processing of returned states) or all
+        states were returned.
+
+        @param max_states: largest number of returned states
+        @param max_seconds: longest time of sampling in seconds
+        @type report: L{SamplingReport}
+        @param report: object updated with the coverage of the state space
+        """
+        if self.base_image is None:
+            raise TypeError("base_image can't be None")
+        if self.writes is None:
+            raise TypeError("writes can't be None")
+
+        # only the first global rank of every window is kept, the numbering
+        # of a window is created again when a rank lands in it
+        starts = array(UINT64)
+        total = 0
+        for base_writes, space in self.window_spaces(group_size):
+            starts.append(total)
+            total += len(space)
+        # the in-order writes of the last window are all the writes
+        writes = base_writes.log
+
+        if report is None:
+            report = SamplingReport()
+        report.total = total
+        budget = Budget(max_states, max_seconds)
         image = self.base_image.create_image(self.image_dir)
 
+        number, space = None, None
+        try:
+            for global_rank in sample_ranks(self.rng, total):
+                if budget.exhausted(report.sampled):
+                    break
+                window_number = bisect_right(starts, global_rank) - 1
+                if number != window_number:
+                    number = window_number
+                    base_writes = writes.view(0, window_number)
+                    space = WindowSpace(
+                        writes[window_number:window_number + group_size],
+                        group_size)
+                rank = global_rank - starts[window_number]
+                report.sampled += 1
+                yield (window_number, rank, Image(image, base_writes),
+                       space.unrank(rank))
+        finally:
+            report.end_time = time.time()
+
+    def state(self, window_number, rank, group_size=3):
+        """
+        Return the image and draw group of a state with given rank.
+
+        Only the windows before the selected one are read, no permutations
+        are generated.
+        """
+        if self.base_image is None:
+            raise TypeError("base_image can't be None")
+        if self.writes is None:
+            raise TypeError("writes can't be None")
+        for number, (base_writes, window) in \
+                enumerate(self.windows(group_size)):
+            if number == window_number:
+                space = WindowSpace(window, group_size)
+                image = self.base_image.create_image(self.image_dir)
+                return (Image(image, base_writes), space.unrank(rank))
+        raise IndexError("window number out of range")
+
+    def window_spaces(self, group_size=3):
+        """Return pairs of in-order writes and numbering of window states."""
+        for base_writes, window in self.windows(group_size):
+            yield base_writes, WindowSpace(window, group_size)
+
+    def windows(self, group_size=3):
+        """
+        Return pairs of writes applied in order and the permutation window.
+
+        The window slides over the writes one write at a time, the writes
+        that leave the window are added to the in-order writes. In-order
+        writes are returned as views of a single L{AppendLog}, so returning
+        them doesn't copy them.
+        """
         # process writes in memory efficient way
         iter_writes = iter(self.writes)
         writes = deque(islice(iter_writes, group_size))
-        base_writes = list()
+        base_writes = AppendLog()
 
-        new_write = True
         while True:
-            # first return the base image with writes in order
-            yield (Image(image, list(base_writes)), tuple())
-            existing_lists = set()
-            existing_sets = set()
-            # slice the permutations so that we get partial non-in-order writes
-            for draw_group in (i[:l] for i in permutations(writes)
-                    for l in range(1, group_size+1)):
-                # make sure we do not return the same list of writes
-                # as we are slicing the tuples returned by permutations()
-                # so for large group sizes there would be a lot of duplication
-                if draw_group in existing_lists:
-                    continue
-                existing_lists.add(draw_group)
-                # if the writes are in-order, skip them as they will be
-                # returned as a base image
-                if writes and writes[0] == draw_group[0]:
-                    continue
-                # if the writes overlap then the order matters so return them
-                if overlapping(draw_group):
-                    yield (Image(image, list(base_writes)), draw_group)
-                else:
-                    # if they don't overlap, then order doesn't matter
-                    # so don't return duplicates of such lists
-                    if set(draw_group) in existing_sets:
-                        continue
-                    existing_sets.add(frozenset(draw_group))
-                    # that also means that we should skip ones that are just
-                    # permutation of the first few writes as those will be
-                    # returned as base image
-                    if set(draw_group) == set(islice(writes, len(draw_group))):
-                        continue
-                    # or ones that include the first element (as this has the
-                    # same effect as an in-order set of writes for overlapping)
-                    if writes and writes[0] in draw_group:
-                        continue
-                    yield (Image(image, list(base_writes)), draw_group)
+            yield base_writes.view(), tuple(writes)
 
             if not writes:
                 break
@@ -139,10 +516,75 @@ class WritesShuffler(object):
             # permutations, if available
             base_writes.append(writes.popleft())
             new_write = next(iter_writes, None)
-            if new_write:
+            if new_write is not None:
                 writes.append(new_write)
             # TODO fold down base image when base_writes grows very large?
 
+    def hierarchical_generator(self, fragmenter, group_size=3, max_torn=1,
+                               max_subset_fragments=4):
+        """
+        Return permutations of logical writes with some of them torn.
+
+        Works like L{generator} on the logical writes, the permutation window
+        is not filled with fragments of a single write. Then, for every
+        group of writes, up to max_torn of them are replaced by the subset of
+        their fragments (as split by fragmenter) that reached the disk before
+        the write was interrupted. Returned draw groups contain the whole
+        writes and fragments in order they should be applied.
+
+        @type fragmenter: L{Fragmenter}
+        @param fragmenter: object used for splitting writes to fragments
+        @param group_size: size of the logical writes permutation window
+        @param max_torn: maximum number of torn writes in a single group
+        @param max_subset_fragments: largest number of fragments for which
+            all subsets are tested, larger writes are torn only at fragment
+            boundaries (the prefix or suffix of the write reaches disk)
+        """
+        if self.base_image is None:
+            raise TypeError("base_image can't be None")
+        if self.writes is None:
+            raise TypeError("writes can't be None")
+        image = self.base_image.create_image(self.image_dir)
+
+        for base_writes, window in self.windows(group_size):
+            yield (Image(image, base_writes), tuple())
+            fragments = dict((id(i), fragmenter.fragment_write(i))
+                             for i in window)
+            for group, out_of_order in logical_groups(window, group_size):
+                if out_of_order:
+                    yield (Image(image, base_writes), group)
+                tearable = [pos for pos, write in enumerate(group)
+                            if len(fragments[id(write)]) > 1]
+                # if the group has the same effect as in-order writes, only
+                # tearing the first write of the window creates a new image
+                if not out_of_order:
+                    if group.index(window[0]) not in tearable:
+                        continue
+                    required = group.index(window[0])
+                else:
+                    required = None
+                for torn_count in range(1, max_torn+1):
+                    for torn in combinations(tearable, torn_count):
+                        if required is not None and required not in torn:
+                            continue
+                        for draw_group in self._torn_groups(
+                                group, torn, fragments,
+                                max_subset_fragments):
+                            yield (Image(image, base_writes), draw_group)
+
+    @staticmethod
+    def _torn_groups(group, torn, fragments, max_subset_fragments):
+        """Return draw groups with writes at positions torn replaced."""
+        options = []
+        for pos, write in enumerate(group):
+            if pos in torn:
+                options.append(list(tear_patterns(fragments[id(write)],
+                                                  max_subset_fragments)))
+            else:
+                options.append([(write, )])
+        for selection in product(*options):
+            yield tuple(chain.from_iterable(selection))
+
     def cleanup(self):
         """Remove the temporary image created by generator and shuffle."""
         self.base_image.cleanup()
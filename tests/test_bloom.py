@@ -0,0 +1,78 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from fsresck.bloom import BloomFilter
+
+class TestBloomFilter(unittest.TestCase):
+    def test___init__(self):
+        bloom = BloomFilter(1000, 0.01)
+
+        self.assertEqual(bloom.bit_count, 9586)
+        self.assertEqual(bloom.hash_count, 7)
+        self.assertEqual(bloom.size, 1199)
+        self.assertEqual(bloom.count, 0)
+
+    def test___init___with_invalid_values(self):
+        with self.assertRaises(ValueError):
+            BloomFilter(0)
+
+        with self.assertRaises(ValueError):
+            BloomFilter(10, 1.0)
+
+    def test_add(self):
+        bloom = BloomFilter(100)
+
+        for key in range(-50, 50):
+            bloom.add(key)
+
+        self.assertEqual(bloom.count, 100)
+        for key in range(-50, 50):
+            self.assertIn(key, bloom)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+
+        for key in range(1000):
+            bloom.add(key * 7919)
+
+        false_positives = sum(1 for key in range(10**6, 10**6 + 10000)
+                              if key in bloom)
+        self.assertTrue(false_positives < 200)
+
+    def test_clear(self):
+        bloom = BloomFilter(10)
+        bloom.add(1)
+
+        bloom.clear()
+
+        self.assertNotIn(1, bloom)
+        self.assertEqual(bloom.count, 0)
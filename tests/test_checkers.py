@@ -0,0 +1,352 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+from fsresck.checkers import CheckResult, CommandChecker, MagicChecker, \
+        KnownImageChecker, Tier, CheckerChain
+
+class TestCheckResult(unittest.TestCase):
+    def test_passed(self):
+        self.assertTrue(CheckResult(CheckResult.PASSED).passed)
+        self.assertFalse(CheckResult(CheckResult.FAILED).passed)
+
+    def test___repr__(self):
+        result = CheckResult(CheckResult.FAILED, 4, checker='fsck')
+
+        self.assertEqual(repr(result), "CheckResult(status='failed', "
+                                       "returncode=4, checker='fsck')")
+
+    def test_to_dict_with_tiers(self):
+        result = CheckResult(CheckResult.FAILED, checker='fsck',
+                             tiers=[('magic', CheckResult.UNDECIDED, 0.5),
+                                    ('fsck', CheckResult.FAILED, 2.0)])
+
+        self.assertEqual(result.to_dict()['tiers'],
+                         [['magic', 'undecided', 0.5],
+                          ['fsck', 'failed', 2.0]])
+
+    def test_to_dict(self):
+        result = CheckResult(CheckResult.PASSED, 0, b'clean\n', 0.5, 'fsck')
+
+        self.assertEqual(result.to_dict(), {'status': 'passed',
+                                            'returncode': 0,
+                                            'output': 'clean\n',
+                                            'duration': 0.5,
+                                            'checker': 'fsck'})
+
+class TestCommandChecker(unittest.TestCase):
+    def test___init__(self):
+        checker = CommandChecker(['fsck', '-n'])
+
+        self.assertEqual(checker.name, 'fsck -n')
+        self.assertIsNone(checker.timeout)
+
+    def test_args(self):
+        checker = CommandChecker(['fsck', '-n'])
+
+        self.assertEqual(checker.args('/tmp/img'), ['fsck', '-n', '/tmp/img'])
+
+    def test_args_with_placeholder(self):
+        checker = CommandChecker(['check', '{image}', '-v'])
+
+        self.assertEqual(checker.args('/tmp/img'), ['check', '/tmp/img', '-v'])
+
+    def test_check(self):
+        checker = CommandChecker([sys.executable, '-c',
+                                  'import sys; print(sys.argv[1])'])
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.PASSED)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.output.strip(), b'/tmp/img')
+        self.assertEqual(result.checker, checker.name)
+
+    def test_check_with_failure(self):
+        checker = CommandChecker([sys.executable, '-c',
+                                  'import sys; sys.exit(4)'])
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.FAILED)
+        self.assertEqual(result.returncode, 4)
+
+    def test_check_with_timeout(self):
+        checker = CommandChecker([sys.executable, '-c',
+                                  'import time; time.sleep(10)'],
+                                 timeout=0.1)
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.TIMEOUT)
+        self.assertLess(result.duration, 5)
+
+    def test_check_with_timeout_and_child_process(self):
+        checker = CommandChecker(['sh', '-c', 'sleep 5; echo done', 'x'],
+                                 timeout=0.5)
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.TIMEOUT)
+        self.assertLess(result.duration, 2)
+
+    def test_check_with_timeout_and_background_process(self):
+        start = time.time()
+        checker = CommandChecker(['sh', '-c', '(sleep 5; echo done) & wait',
+                                  'x'], timeout=0.5)
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.TIMEOUT)
+        self.assertNotIn(b'done', result.output)
+        self.assertLess(time.time() - start, 2)
+
+    def test_check_with_missing_command(self):
+        checker = CommandChecker(['/nonexistent/fsck'])
+
+        result = checker.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.ERROR)
+
+
+class StaticChecker(object):
+    def __init__(self, name, status):
+        self.name = name
+        self.status = status
+        self.checked = []
+
+    def check(self, image_name):
+        self.checked.append(image_name)
+        return CheckResult(self.status, duration=1.0, checker=self.name)
+
+
+class TestMagicChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'\x00' * 1080 + b'\x53\xef' + b'\x00' * 10)
+
+    def test___init__(self):
+        checker = MagicChecker('ext4')
+
+        self.assertEqual(checker.magics, [(1080, b'\x53\xef')])
+        self.assertEqual(checker.name, 'magic')
+
+    def test___init___with_unknown_file_system(self):
+        with self.assertRaises(ValueError):
+            MagicChecker('fat')
+
+    def test_check(self):
+        result = MagicChecker('ext4').check(self.image_name)
+
+        self.assertEqual(result.status, CheckResult.UNDECIDED)
+        self.assertEqual(result.checker, 'magic')
+
+    def test_check_with_bad_magic(self):
+        result = MagicChecker('xfs').check(self.image_name)
+
+        self.assertEqual(result.status, CheckResult.FAILED)
+        self.assertEqual(result.output, b'bad magic at offset 0')
+
+    def test_check_with_short_image(self):
+        result = MagicChecker('btrfs').check(self.image_name)
+
+        self.assertEqual(result.status, CheckResult.FAILED)
+
+    def test_check_with_missing_image(self):
+        result = MagicChecker('ext4').check(
+            os.path.join(self.tmp_dir, 'missing'))
+
+        self.assertEqual(result.status, CheckResult.ERROR)
+
+
+class TestKnownImageChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'abcd')
+
+    def test_check(self):
+        checker = KnownImageChecker()
+
+        result = checker.check(self.image_name)
+
+        self.assertEqual(result.status, CheckResult.UNDECIDED)
+        self.assertEqual(result.checker, 'known')
+
+    def test_learn(self):
+        checker = KnownImageChecker()
+        checker.check(self.image_name)
+
+        checker.learn(self.image_name, CheckResult(CheckResult.PASSED))
+
+        self.assertEqual(checker.check(self.image_name).status,
+                         CheckResult.PASSED)
+
+    def test_learn_with_failure(self):
+        checker = KnownImageChecker()
+        checker.check(self.image_name)
+
+        checker.learn(self.image_name, CheckResult(CheckResult.FAILED))
+
+        self.assertEqual(checker.check(self.image_name).status,
+                         CheckResult.UNDECIDED)
+
+    def test_learn_with_file(self):
+        file_name = os.path.join(self.tmp_dir, 'known')
+        checker = KnownImageChecker(file_name)
+        other = KnownImageChecker(file_name)
+        checker.check(self.image_name)
+
+        checker.learn(self.image_name, CheckResult(CheckResult.PASSED))
+
+        self.assertEqual(other.check(self.image_name).status,
+                         CheckResult.PASSED)
+        with open(file_name) as known:
+            self.assertEqual(known.read(),
+                             checker.digest(self.image_name) + '\n')
+
+    def test_learn_with_interleaved_images(self):
+        other_name = os.path.join(self.tmp_dir, 'other')
+        with open(other_name, 'wb') as image:
+            image.write(b'efgh')
+        checker = KnownImageChecker()
+        checker.check(self.image_name)
+        checker.check(other_name)
+
+        checker.learn(self.image_name, CheckResult(CheckResult.PASSED))
+        checker.learn(other_name, CheckResult(CheckResult.PASSED))
+
+        self.assertEqual(len(checker.known), 2)
+
+    def test_pickle(self):
+        checker = KnownImageChecker()
+        checker.check(self.image_name)
+        checker.learn(self.image_name, CheckResult(CheckResult.PASSED))
+
+        copy = pickle.loads(pickle.dumps(checker))
+
+        self.assertEqual(copy.check(self.image_name).status,
+                         CheckResult.PASSED)
+
+    def test_pickle_with_file(self):
+        file_name = os.path.join(self.tmp_dir, 'known')
+        checker = KnownImageChecker(file_name)
+        checker.check(self.image_name)
+        checker.learn(self.image_name, CheckResult(CheckResult.PASSED))
+        os.unlink(file_name)
+
+        copy = pickle.loads(pickle.dumps(checker))
+
+        # the digests are not read from the file again
+        self.assertEqual(copy.check(self.image_name).status,
+                         CheckResult.PASSED)
+
+    def test_check_with_missing_image(self):
+        result = KnownImageChecker().check(
+            os.path.join(self.tmp_dir, 'missing'))
+
+        self.assertEqual(result.status, CheckResult.ERROR)
+
+
+class TestCheckerChain(unittest.TestCase):
+    def test___init__(self):
+        chain = CheckerChain([StaticChecker('magic', CheckResult.UNDECIDED),
+                              StaticChecker('fsck', CheckResult.PASSED)])
+
+        self.assertEqual(chain.name, 'magic | fsck')
+        self.assertEqual(chain.tiers[0].escalate,
+                         frozenset([CheckResult.UNDECIDED]))
+
+    def test___init___with_no_tiers(self):
+        with self.assertRaises(ValueError):
+            CheckerChain([])
+
+    def test_check(self):
+        magic = StaticChecker('magic', CheckResult.UNDECIDED)
+        fsck = StaticChecker('fsck', CheckResult.PASSED)
+        chain = CheckerChain([magic, fsck])
+
+        result = chain.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.PASSED)
+        self.assertEqual(result.checker, 'magic | fsck')
+        self.assertEqual(result.tiers,
+                         [('magic', CheckResult.UNDECIDED, 1.0),
+                          ('fsck', CheckResult.PASSED, 1.0)])
+
+    def test_check_with_decided_tier(self):
+        magic = StaticChecker('magic', CheckResult.FAILED)
+        fsck = StaticChecker('fsck', CheckResult.PASSED)
+        chain = CheckerChain([magic, fsck])
+
+        result = chain.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.FAILED)
+        self.assertEqual(fsck.checked, [])
+        self.assertEqual(result.tiers, [('magic', CheckResult.FAILED, 1.0)])
+
+    def test_check_with_escalation_on_failure(self):
+        quick = StaticChecker('quick', CheckResult.FAILED)
+        fsck = StaticChecker('fsck', CheckResult.PASSED)
+        chain = CheckerChain([Tier(quick, (CheckResult.FAILED, )), fsck])
+
+        result = chain.check('/tmp/img')
+
+        self.assertEqual(result.status, CheckResult.PASSED)
+        self.assertEqual(fsck.checked, ['/tmp/img'])
+
+    def test_check_with_known_images(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        image_name = os.path.join(tmp_dir, 'image')
+        with open(image_name, 'wb') as image:
+            image.write(b'abcd')
+        fsck = StaticChecker('fsck', CheckResult.PASSED)
+        chain = CheckerChain([KnownImageChecker(), fsck])
+
+        chain.check(image_name)
+        result = chain.check(image_name)
+
+        self.assertEqual(result.status, CheckResult.PASSED)
+        self.assertEqual([i[0] for i in result.tiers], ['known'])
+        self.assertEqual(len(fsck.checked), 1)
@@ -0,0 +1,112 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import json
+import os
+import shutil
+import tempfile
+
+from fsresck.checkpoint import Checkpoint
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'progress.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test___init__(self):
+        checkpoint = Checkpoint(self.path)
+
+        self.assertIsNone(checkpoint.position)
+        self.assertEqual(checkpoint.done, set())
+
+    def test_load_without_file(self):
+        checkpoint = Checkpoint(self.path)
+
+        self.assertFalse(checkpoint.load())
+
+    def test_complete_in_order(self):
+        checkpoint = Checkpoint(self.path)
+
+        for position in [(0, 0), (0, 1), (1, 0)]:
+            checkpoint.issue(position)
+            checkpoint.complete(position)
+
+        self.assertEqual(checkpoint.position, (1, 0))
+        self.assertEqual(checkpoint.done, set())
+        self.assertTrue(checkpoint.is_done((0, 1)))
+        self.assertFalse(checkpoint.is_done((1, 1)))
+
+    def test_complete_out_of_order(self):
+        checkpoint = Checkpoint(self.path)
+
+        for position in [(0, 0), (0, 1), (0, 2)]:
+            checkpoint.issue(position)
+        checkpoint.complete((0, 2))
+        checkpoint.complete((0, 0))
+
+        self.assertEqual(checkpoint.position, (0, 0))
+        self.assertEqual(checkpoint.done, set([(0, 2)]))
+        self.assertFalse(checkpoint.is_done((0, 1)))
+        self.assertTrue(checkpoint.is_done((0, 2)))
+
+        checkpoint.complete((0, 1))
+
+        self.assertEqual(checkpoint.position, (0, 2))
+        self.assertEqual(checkpoint.done, set())
+
+    def test_save_and_load(self):
+        checkpoint = Checkpoint(self.path, save_every=2)
+
+        for position in [(0, 0), (0, 1), (0, 2)]:
+            checkpoint.issue(position)
+        checkpoint.complete((0, 0))
+        checkpoint.complete((0, 2))
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(os.listdir(self.directory), ['progress.json'])
+
+        resumed = Checkpoint(self.path)
+        self.assertTrue(resumed.load())
+        self.assertEqual(resumed.position, (0, 0))
+        self.assertEqual(resumed.done, set([(0, 2)]))
+
+    def test_save_on_interval(self):
+        checkpoint = Checkpoint(self.path, interval=0)
+
+        checkpoint.issue((0, 0))
+        checkpoint.complete((0, 0))
+
+        with open(self.path) as state_file:
+            self.assertEqual(json.load(state_file)['position'], [0, 0])
@@ -0,0 +1,401 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+from fsresck.cli import build_parser, main, _write_result
+from fsresck.sharding import Shard
+
+from .helpers import write_log
+
+# top directory of the source tree
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestBuildParser(unittest.TestCase):
+    def test_run(self):
+        args = build_parser().parse_args(['run', 'image', 'log',
+                                          '--checker', 'fsck -n',
+                                          '--shard', '1/4',
+                                          '--workers', '2'])
+
+        self.assertEqual(args.command, 'run')
+        self.assertEqual(args.image, 'image')
+        self.assertEqual(args.log, 'log')
+        self.assertEqual(args.checker, ['fsck -n'])
+        self.assertEqual(args.shard, Shard(1, 4))
+        self.assertEqual(args.workers, 2)
+        self.assertEqual(args.group_size, 3)
+        self.assertIsNone(args.timeout)
+
+    def test_coordinate_and_work(self):
+        args = build_parser().parse_args(['coordinate', 'image', 'log',
+                                          '--listen', '0.0.0.0:4000'])
+        self.assertEqual(args.listen, ('0.0.0.0', 4000))
+        self.assertEqual(args.lease, 600.0)
+
+        args = build_parser().parse_args(['work', 'image', 'log',
+                                          '--connect', '/tmp/socket',
+                                          '--checker', 'fsck'])
+        self.assertEqual(args.connect, '/tmp/socket')
+        self.assertEqual(args.group_size, 3)
+
+    def test_run_with_invalid_shard(self):
+        with self.assertRaises(SystemExit):
+            build_parser().parse_args(['run', 'image', 'log',
+                                       '--checker', 'fsck',
+                                       '--shard', '4/4'])
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'\x00' * 1024)
+        self.log_name = os.path.join(self.tmp_dir, 'log')
+        write_log(self.log_name, [(0, b'a'), (0, b'b'), (512, b'\x00')])
+        self.output = os.path.join(self.tmp_dir, 'results')
+        # fails images starting with "b"
+        self.checker = '{0} -c "import sys; sys.exit(open(sys.argv[1], ' \
+                       '\'rb\').read(1) == b\'b\')"'.format(sys.executable)
+        self.stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+
+    def tearDown(self):
+        sys.stderr.close()
+        sys.stderr = self.stderr
+
+    def run_main(self, *args):
+        status = main(['run', self.image_name, self.log_name,
+                       '--checker', self.checker, '--workers', '1',
+                       '--group-size', '2', '--image-dir', self.tmp_dir,
+                       '--output', self.output] + list(args))
+        with open(self.output) as results:
+            return status, [json.loads(i) for i in results]
+
+    def test_run(self):
+        status, results = self.run_main()
+
+        self.assertEqual(status, 1)
+        self.assertEqual([(i['window'], i['rank'], i['status'])
+                          for i in results],
+                         [(0, 0, 'passed'), (0, 1, 'failed'),
+                          (0, 2, 'passed'), (1, 0, 'passed'),
+                          (1, 1, 'passed'), (2, 0, 'failed'),
+                          (3, 0, 'failed')])
+        self.assertEqual(results[1]['draw_group'], [[0, 1, None]])
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ['image', 'log', 'results'])
+        self.assertFalse(results[0]['cached'])
+
+    def test_run_with_checker_chain(self):
+        known = os.path.join(self.tmp_dir, 'known')
+        failing = '{0} -c "import sys; sys.exit(1)"'.format(sys.executable)
+
+        status, results = self.run_main('--checker', failing,
+                                        '--known-images', known)
+
+        self.assertEqual(status, 1)
+        # the second checker runs only on the states the first one failed
+        self.assertEqual([(i['window'], i['rank'], i['status'])
+                          for i in results],
+                         [(0, 0, 'passed'), (0, 1, 'failed'),
+                          (0, 2, 'passed'), (1, 0, 'passed'),
+                          (1, 1, 'passed'), (2, 0, 'failed'),
+                          (3, 0, 'failed')])
+        chain = results[0]['checker']
+        self.assertTrue(all(i['checker'] == chain for i in results))
+        checker = results[0]['tiers'][1][0]
+        self.assertEqual([i[0] for i in results[0]['tiers']],
+                         ['known', checker])
+        self.assertEqual([i[0] for i in results[1]['tiers']],
+                         ['known', checker, chain.split(' | ')[2]])
+        # the image of state (1, 1) is the same as of state (0, 0)
+        self.assertEqual([i[0] for i in results[4]['tiers']], ['known'])
+
+    def test_minimize(self):
+        _, results = self.run_main()
+        failed = results[1]
+
+        status = main(['minimize', self.image_name, self.log_name,
+                       '--checker', self.checker, '--group-size', '2',
+                       '--image-dir', self.tmp_dir,
+                       '--window', str(failed['window']),
+                       '--rank', str(failed['rank']),
+                       '--output', self.output])
+
+        self.assertEqual(status, 0)
+        with open(self.output) as output:
+            state = json.loads(output.read())
+        self.assertEqual(state['status'], 'failed')
+        self.assertEqual(state['base_index'], 0)
+        self.assertEqual(state['draw_group'], [1])
+        self.assertEqual(state['writes'], [[0, 1, None]])
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ['image', 'log', 'results'])
+
+    def test_run_with_prioritize(self):
+        _, expected = self.run_main()
+        status, results = self.run_main('--prioritize')
+
+        self.assertEqual(status, 1)
+        self.assertEqual(sorted((i['window'], i['rank'], i['status'])
+                                for i in results),
+                         [(i['window'], i['rank'], i['status'])
+                          for i in expected])
+
+    def test_run_with_max_states(self):
+        _, expected = self.run_main()
+        _, results = self.run_main('--max-states', '3', '--strata', '3')
+
+        self.assertEqual(len(results), 3)
+        # one state from each of windows 0, 1 and 2-3
+        self.assertEqual(sorted(min(i['window'], 2) for i in results),
+                         [0, 1, 2])
+        expected = dict(((i['window'], i['rank']), i) for i in expected)
+        for result in results:
+            state = expected[(result['window'], result['rank'])]
+            self.assertEqual(result['draw_group'], state['draw_group'])
+            self.assertEqual(result['status'], state['status'])
+
+    def test_run_with_max_states_and_shard(self):
+        with self.assertRaises(SystemExit):
+            self.run_main('--max-states', '3', '--shard', '0/2')
+
+    def run_command(self, command, env=None):
+        status = subprocess.call(
+            command + ['run', self.image_name, self.log_name,
+                       '--checker', self.checker, '--workers', '2',
+                       '--group-size', '2', '--image-dir', self.tmp_dir,
+                       '--output', self.output],
+            cwd=self.tmp_dir, env=env, stderr=sys.stderr)
+        with open(self.output) as results:
+            return status, [json.loads(i) for i in results]
+
+    def test_script(self):
+        status, results = self.run_command(
+            [sys.executable, os.path.join(SOURCE_DIR, 'scripts', 'fsresck')])
+
+        self.assertEqual(status, 1)
+        self.assertEqual(len(results), 7)
+
+    def test_module(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SOURCE_DIR
+        status, results = self.run_command([sys.executable, '-m', 'fsresck'],
+                                           env)
+
+        self.assertEqual(status, 1)
+        self.assertEqual(len(results), 7)
+
+    def test_run_with_checkpoint(self):
+        _, expected = self.run_main()
+        checkpoint = os.path.join(self.tmp_dir, 'checkpoint')
+        written = []
+
+        def write_result(output, result):
+            if len(written) == 3:
+                raise KeyboardInterrupt()
+            written.append(result)
+            _write_result(output, result)
+
+        with mock.patch('fsresck.cli._write_result', write_result):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_main('--checkpoint', checkpoint)
+        _, results = self.run_main('--checkpoint', checkpoint)
+
+        self.assertEqual([(i['window'], i['rank'], i['status'])
+                          for i in results],
+                         [(i['window'], i['rank'], i['status'])
+                          for i in expected])
+        with open(checkpoint) as state:
+            self.assertEqual(json.load(state)['position'], [3, 0])
+
+    def test_run_with_checkpoint_after_crash(self):
+        _, expected = self.run_main()
+        checkpoint = os.path.join(self.tmp_dir, 'checkpoint')
+        self.run_main('--checkpoint', checkpoint)
+        # the run crashed after writing all results, the last save of the
+        # checkpoint was after the second state, last line is cut short
+        with open(checkpoint, 'w') as state:
+            json.dump({'position': [0, 1], 'done': [[1, 0]]}, state)
+        with open(self.output, 'a') as output:
+            output.write('{"window": 3, ')
+
+        _, results = self.run_main('--checkpoint', checkpoint)
+
+        self.assertEqual([(i['window'], i['rank'], i['status'])
+                          for i in results],
+                         [(i['window'], i['rank'], i['status'])
+                          for i in expected[:2] + expected[3:4] +
+                          expected[2:3] + expected[4:]])
+
+    def test_run_with_checkpoint_and_no_output(self):
+        with self.assertRaises(SystemExit):
+            main(['run', self.image_name, self.log_name,
+                  '--checker', self.checker, '--checkpoint', 'checkpoint'])
+
+    def test_run_with_checkpoint_and_prioritize(self):
+        with self.assertRaises(SystemExit):
+            self.run_main('--checkpoint', 'checkpoint', '--prioritize')
+
+    @unittest.skipIf(sys.version_info < (3, 5),
+                     "requires asyncio with async/await")
+    def test_run_with_pipeline(self):
+        _, expected = self.run_main()
+        status, results = self.run_main('--pipeline', '--shard', '0/1')
+
+        self.assertEqual(status, 1)
+        self.assertEqual(sorted((i['window'], i['rank'], i['status'],
+                                 i['draw_group']) for i in results),
+                         [(i['window'], i['rank'], i['status'],
+                           i['draw_group']) for i in expected])
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ['image', 'log', 'results'])
+
+    def test_run_with_pipeline_and_old_python(self):
+        with mock.patch.object(sys, 'version_info', (3, 4, 0)):
+            with self.assertRaises(SystemExit):
+                self.run_main('--pipeline')
+
+    def test_run_with_pipeline_and_results(self):
+        with self.assertRaises(SystemExit):
+            self.run_main('--pipeline', '--results', 'results.db')
+
+    def test_plan(self):
+        status = main(['plan', self.image_name, self.log_name,
+                       '--group-size', '2', '--state-seconds', '0.5',
+                       '--workers', '2', '--output', self.output])
+
+        self.assertEqual(status, 0)
+        with open(self.output) as output:
+            plan = json.load(output)
+        self.assertEqual(plan['states'], 7)
+        self.assertEqual(plan['windows'], 4)
+        self.assertEqual(plan['max_window_states'], 3)
+        self.assertEqual(plan['seconds'], 1.75)
+
+    def test_plan_with_checker(self):
+        main(['plan', self.image_name, self.log_name, '--skip-noop',
+              '--group-size', '2', '--checker', self.checker,
+              '--image-dir', self.tmp_dir, '--output', self.output])
+
+        with open(self.output) as output:
+            plan = json.load(output)
+        # the write of zero at offset 512 is removed
+        self.assertEqual(plan['states'], 5)
+        self.assertGreater(plan['state_seconds'], 0)
+        self.assertGreater(plan['seconds'], 0)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ['image', 'log', 'results'])
+
+    def test_run_with_shard(self):
+        _, results = self.run_main('--shard', '0/2')
+        _, other = self.run_main('--shard', '1/2')
+
+        self.assertEqual(len(results) + len(other), 7)
+
+    def test_run_with_skip_noop(self):
+        _, results = self.run_main('--skip-noop')
+
+        # the write of zero at offset 512 is removed
+        self.assertEqual([(i['window'], i['rank']) for i in results],
+                         [(0, 0), (0, 1), (0, 2), (1, 0), (2, 0)])
+
+    def test_run_with_results(self):
+        database = os.path.join(self.tmp_dir, 'results.db')
+
+        _, results = self.run_main('--results', database)
+        _, cached = self.run_main('--results', database)
+
+        self.assertFalse(any(i['cached'] for i in results))
+        self.assertTrue(all(i['cached'] for i in cached))
+        self.assertEqual(len(results), len(cached))
+
+        status = main(['failures', database, self.image_name, self.log_name,
+                       '--first-window', '1', '--output', self.output])
+
+        self.assertEqual(status, 1)
+        with open(self.output) as output:
+            failed = [json.loads(i) for i in output]
+        self.assertEqual([(i['window'], i['rank']) for i in failed],
+                         [(2, 0), (3, 0)])
+
+    def test_failures_with_checker(self):
+        database = os.path.join(self.tmp_dir, 'results.db')
+        self.run_main('--results', database)
+
+        # quoted and spaced differently than the command given to run
+        checker = '  '.join(quote(i) for i in shlex.split(self.checker))
+        status = main(['failures', database, self.image_name, self.log_name,
+                       '--group-size', '2', '--checker', checker,
+                       '--output', self.output])
+
+        self.assertEqual(status, 1)
+        with open(self.output) as output:
+            self.assertEqual(len(output.readlines()), 3)
+
+    def test_run_with_results_and_different_reading_options(self):
+        database = os.path.join(self.tmp_dir, 'results.db')
+
+        self.run_main('--results', database)
+        _, filtered = self.run_main('--results', database, '--skip-noop')
+        _, cached = self.run_main('--results', database, '--skip-noop')
+
+        self.assertFalse(any(i['cached'] for i in filtered))
+        self.assertTrue(all(i['cached'] for i in cached))
+
+        status = main(['failures', database, self.image_name, self.log_name,
+                       '--group-size', '2', '--skip-noop',
+                       '--output', self.output])
+
+        with open(self.output) as output:
+            failed = [json.loads(i) for i in output]
+        self.assertEqual(status, 1)
+        self.assertEqual(sorted((i['window'], i['rank']) for i in failed),
+                         sorted((i['window'], i['rank'])
+                                for i in filtered if i['status'] != 'passed'))
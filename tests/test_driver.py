@@ -0,0 +1,361 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+from fsresck.checkers import CheckerChain, CheckResult, CommandChecker, \
+    KnownImageChecker, MagicChecker
+from fsresck.checkpoint import Checkpoint
+from fsresck.driver import Driver, StateResult, WindowImages, check_state
+from fsresck.image import Image
+from fsresck.results import ResultStore
+from fsresck.statespec import StateSource
+from fsresck.write import Write
+from fsresck.writesshuffler import WritesShuffler
+
+from .helpers import write_log
+
+# prints the image contents, fails if the image starts with 'b'
+CHECKER = [sys.executable, '-c',
+           'import sys; data = open(sys.argv[1], "rb").read(); '
+           'sys.stdout.write(repr(data)); '
+           'sys.exit(data.startswith(b"b"))']
+
+class TestStateResult(unittest.TestCase):
+    def test_to_dict(self):
+        result = StateResult(1, 2, ((0, 512, None), ),
+                             CheckResult(CheckResult.PASSED, 0))
+
+        ret = result.to_dict()
+
+        self.assertEqual(ret['window'], 1)
+        self.assertEqual(ret['rank'], 2)
+        self.assertEqual(ret['draw_group'], [[0, 512, None]])
+        self.assertEqual(ret['status'], 'passed')
+
+    def test___repr__(self):
+        result = StateResult(1, 2, (), CheckResult(CheckResult.PASSED, 0))
+
+        self.assertEqual(repr(result),
+                         "StateResult(window_number=1, rank=2, "
+                         "result=CheckResult(status='passed', returncode=0, "
+                         "checker=None))")
+
+class TestWindowImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'....')
+
+    def read(self, name):
+        with open(name, 'rb') as image:
+            return image.read()
+
+    def test_acquire(self):
+        images = WindowImages(self.tmp_dir)
+        writes = [Write(0, b'a'), Write(1, b'b')]
+
+        first = images.acquire(0, Image(self.image_name, writes[:1]))
+        self.assertEqual(first, images.acquire(0, Image(self.image_name,
+                                                        writes[:1])))
+        second = images.acquire(1, Image(self.image_name, writes))
+
+        self.assertEqual(self.read(first), b'a...')
+        self.assertEqual(self.read(second), b'ab..')
+        self.assertEqual(len(images), 2)
+
+        images.release(0)
+        images.release(0)
+
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(len(images), 1)
+
+        images.release(1)
+
+        # image of the last acquired window is kept for next states
+        self.assertTrue(os.path.exists(second))
+
+        images.cleanup()
+
+        self.assertEqual(os.listdir(self.tmp_dir), ['image'])
+
+    def test_acquire_with_earlier_window(self):
+        images = WindowImages(self.tmp_dir)
+        self.addCleanup(images.cleanup)
+        writes = [Write(0, b'a'), Write(1, b'b')]
+        images.acquire(1, Image(self.image_name, writes))
+
+        name = images.acquire(0, Image(self.image_name, writes[:1]))
+
+        self.assertEqual(self.read(name), b'a...')
+
+    def test_acquire_with_windows_ahead(self):
+        ahead = {0: 1, 1: 1}
+        images = WindowImages(self.tmp_dir, ahead)
+        self.addCleanup(images.cleanup)
+        writes = [Write(0, b'a'), Write(1, b'b')]
+        last = images.acquire(2, Image(self.image_name, writes))
+        # the base image isn't read again for the windows ahead
+        with open(self.image_name, 'wb') as image:
+            image.write(b'XXXX')
+
+        self.assertEqual(len(images), 3)
+        self.assertEqual(self.read(last), b'ab..')
+        del ahead[0]
+        first = images.acquire(0, Image(self.image_name, []))
+        self.assertEqual(self.read(first), b'....')
+        images.release(0)
+        images.release(2)
+        del ahead[1]
+        second = images.acquire(1, Image(self.image_name, writes[:1]))
+        self.assertEqual(self.read(second), b'a...')
+
+        # windows not ahead and not used any more are removed
+        images.release(1)
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(last))
+        self.assertEqual(len(images), 1)
+
+class TestDriver(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'....')
+
+    def states(self):
+        writes = [Write(0, b'a'), Write(0, b'b'), Write(1, b'c')]
+        shuffler = WritesShuffler(Image(self.image_name, []), writes)
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        return shuffler.ranked_generator(group_size=2)
+
+    def test_check_state(self):
+        checker = CommandChecker(CHECKER)
+        task = (0, 1, self.image_name, (Write(1, b'x'), ), checker,
+                self.tmp_dir)
+
+        result = check_state(task)
+
+        self.assertEqual(result.window_number, 0)
+        self.assertEqual(result.rank, 1)
+        self.assertEqual(result.draw_group, ((1, 1, None), ))
+        self.assertTrue(result.result.passed)
+        self.assertIn(b'.x..', result.result.output)
+        self.assertEqual(os.listdir(self.tmp_dir), ['image'])
+
+    def test_check_state_with_missing_image(self):
+        checker = CommandChecker(CHECKER)
+        task = (0, 1, os.path.join(self.tmp_dir, 'missing'), (), checker,
+                self.tmp_dir)
+
+        result = check_state(task)
+
+        self.assertEqual(result.result.status, CheckResult.ERROR)
+
+    def run_driver(self, workers):
+        driver = Driver(CommandChecker(CHECKER), workers=workers,
+                        image_dir=self.tmp_dir)
+
+        results = list(driver.run(self.states()))
+
+        return [(i.window_number, i.rank, i.result.status,
+                 i.result.output) for i in results]
+
+    def test_run_in_process(self):
+        results = self.run_driver(1)
+
+        self.assertEqual(results,
+                         [(0, 0, 'passed', repr(b'....').encode()),
+                          (0, 1, 'failed', repr(b'b...').encode()),
+                          (0, 2, 'passed', repr(b'a...').encode()),
+                          (1, 0, 'passed', repr(b'a...').encode()),
+                          (1, 1, 'passed', repr(b'ac..').encode()),
+                          (2, 0, 'failed', repr(b'b...').encode()),
+                          (3, 0, 'failed', repr(b'bc..').encode())])
+        # only the base image copy of the shuffler is left
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    def test_run_with_pool(self):
+        self.assertEqual(self.run_driver(3), self.run_driver(1))
+        # base image copies of the two shufflers
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 3)
+
+    def test_run_with_pool_interrupted(self):
+        # checks of images starting with "b" are still running when the
+        # consumer stops
+        checker = CommandChecker(
+            [sys.executable, '-c',
+             'import sys, time; '
+             'open(sys.argv[1], "rb").read(1) == b"b" and time.sleep(3)'])
+        driver = Driver(checker, workers=2, image_dir=self.tmp_dir)
+        results = driver.run(self.states())
+
+        first = next(results)
+        results.close()
+
+        self.assertEqual((first.window_number, first.rank), (0, 0))
+        # only the base image copy of the shuffler is left
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    def test_run_with_pool_and_known_images(self):
+        # all writes write the same data
+        writes = [Write(0, b'a') for _ in range(6)]
+        shuffler = WritesShuffler(Image(self.image_name, []), writes)
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        chain = CheckerChain([KnownImageChecker(),
+                              CommandChecker(CHECKER, name='fsck')])
+        driver = Driver(chain, workers=2, image_dir=self.tmp_dir)
+
+        results = list(driver.run(shuffler.ranked_generator(group_size=2)))
+
+        self.assertEqual(len(results), 17)
+        self.assertTrue(all(i.result.passed for i in results))
+        self.assertEqual(driver.tier_timing['known'][0], 17)
+        # only the base image and the image with "a" written exist, every
+        # worker runs the command at most once for each
+        self.assertLessEqual(driver.tier_timing['fsck'][0], 4)
+
+    def test_run_with_states_out_of_order(self):
+        driver = Driver(CommandChecker(CHECKER), workers=1,
+                        image_dir=self.tmp_dir)
+        states = list(self.states())
+        states.reverse()
+
+        results = list(driver.run(states))
+
+        self.assertEqual([i.result.output for i in results],
+                         [repr(i).encode() for i in
+                          [b'bc..', b'b...', b'ac..', b'a...',
+                           b'a...', b'b...', b'....']])
+
+    def test_run_with_store(self):
+        store = ResultStore(':memory:')
+        self.addCleanup(store.close)
+        driver = Driver(CommandChecker(CHECKER), workers=1,
+                        image_dir=self.tmp_dir, store=store,
+                        digests=('base', 'log'))
+
+        first = list(driver.run(self.states()))
+
+        self.assertEqual(driver.cached, 0)
+        self.assertEqual(len(store), 7)
+        self.assertEqual(len(store.failing('base', 'log')), 3)
+
+        second = list(driver.run(self.states()))
+
+        self.assertEqual(driver.cached, 7)
+        self.assertTrue(all(i.cached for i in second))
+        self.assertEqual([(i.window_number, i.rank, i.result.status)
+                          for i in first],
+                         [(i.window_number, i.rank, i.result.status)
+                          for i in second])
+
+    def test_run_with_store_and_checker_chain(self):
+        store = ResultStore(':memory:')
+        self.addCleanup(store.close)
+        chain = CheckerChain([MagicChecker([(0, b'.')]),
+                              CommandChecker(CHECKER, name='fsck')])
+        driver = Driver(chain, workers=1, image_dir=self.tmp_dir,
+                        store=store, digests=('base', 'log'))
+
+        first = list(driver.run(self.states()))
+        second = list(driver.run(self.states()))
+
+        self.assertFalse(any(i.cached for i in first))
+        self.assertEqual(driver.cached, 7)
+        self.assertTrue(all(i.cached for i in second))
+        self.assertEqual([(i.window_number, i.rank, i.result.status)
+                          for i in first],
+                         [(i.window_number, i.rank, i.result.status)
+                          for i in second])
+
+    def test_run_with_checkpoint(self):
+        checkpoint = Checkpoint(os.path.join(self.tmp_dir, 'checkpoint'))
+        driver = Driver(CommandChecker(CHECKER), workers=1,
+                        image_dir=self.tmp_dir, checkpoint=checkpoint)
+        results = driver.run(self.states())
+
+        first = [next(results) for _ in range(3)]
+        results.close()
+
+        saved = Checkpoint(checkpoint.path)
+        self.assertTrue(saved.load())
+        # the third result wasn't processed by the consumer
+        self.assertEqual(saved.position, (0, 1))
+        driver = Driver(CommandChecker(CHECKER), workers=1,
+                        image_dir=self.tmp_dir, checkpoint=saved)
+        rest = list(driver.run(self.states()))
+
+        self.assertEqual([(i.window_number, i.rank) for i in first + rest],
+                         [(0, 0), (0, 1), (0, 2), (0, 2), (1, 0), (1, 1),
+                          (2, 0), (3, 0)])
+
+    def test___init___with_store_and_no_digests(self):
+        with self.assertRaises(ValueError):
+            Driver(CommandChecker(CHECKER), store=ResultStore(':memory:'))
+
+    def spec_source(self):
+        log_name = os.path.join(self.tmp_dir, 'log')
+        write_log(log_name, [(0, b'a'), (0, b'b'), (1, b'c')])
+        return StateSource(self.image_name, log_name)
+
+    def test_run_with_specs(self):
+        source = self.spec_source()
+        driver = Driver(CommandChecker(CHECKER), workers=1,
+                        image_dir=self.tmp_dir, source=source)
+
+        results = list(driver.run(source.specs(group_size=2)))
+
+        # no base image copy is needed
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['image', 'log'])
+        self.assertEqual([(i.window_number, i.rank, i.result.status,
+                           i.result.output) for i in results],
+                         self.run_driver(1))
+
+    def test_run_with_specs_and_pool(self):
+        source = self.spec_source()
+        driver = Driver(CommandChecker(CHECKER), workers=2,
+                        image_dir=self.tmp_dir, source=source)
+
+        results = list(driver.run(source.specs(group_size=2)))
+
+        self.assertEqual([(i.window_number, i.rank, i.result.status,
+                           i.result.output) for i in results],
+                         self.run_driver(1))
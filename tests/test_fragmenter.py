@@ -30,7 +30,7 @@ except ImportError:
         import unittest
 
 from fsresck.write import Write
-from fsresck.fragmenter import Fragmenter
+from fsresck.fragmenter import Fragmenter, AtomicityRules
 
 class TestFragmenter(unittest.TestCase):
     def test___init__(self):
@@ -109,3 +109,136 @@ class TestFragmenter(unittest.TestCase):
         self.assertEqual(ret[0].data, bytearray(512))
         self.assertEqual(ret[1].data, bytearray(512))
         self.assertEqual(ret[2].data, bytearray(2))
+
+    def test_fragment_with_misaligned_write(self):
+        fragmenter = Fragmenter()
+
+        writes = [
+            Write(offset=500, data=bytearray(1100))
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+
+        self.assertEqual(len(ret), 4)
+        self.assertEqual(ret[0].offset, 500)
+        self.assertEqual(len(ret[0].data), 12)
+        self.assertEqual(ret[1].offset, 512)
+        self.assertEqual(len(ret[1].data), 512)
+        self.assertEqual(ret[2].offset, 1024)
+        self.assertEqual(len(ret[2].data), 512)
+        self.assertEqual(ret[3].offset, 1536)
+        self.assertEqual(len(ret[3].data), 64)
+
+    def test_fragment_with_write_inside_sector(self):
+        fragmenter = Fragmenter()
+
+        writes = [
+            Write(offset=10, data=bytearray(20), disk_id=2)
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+
+        self.assertEqual([Write(offset=10, data=bytearray(20), disk_id=2)],
+                         ret)
+
+    def test_fragment_does_not_copy_data(self):
+        fragmenter = Fragmenter()
+
+        data = bytearray(1024)
+        writes = [
+            Write(offset=0, data=data)
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+        data[512] = 0xff
+
+        self.assertIsInstance(ret[1].data, memoryview)
+        self.assertEqual(ret[1].data[0:1].tobytes(), b'\xff')
+
+    def test_fragment_with_atomic_write(self):
+        fragmenter = Fragmenter(rules=AtomicityRules(unit_size=512,
+                                                     atomic_units=8))
+
+        writes = [
+            Write(offset=4096, data=bytearray(4096))
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+
+        self.assertEqual(len(ret), 1)
+        self.assertIs(ret[0], writes[0])
+
+    def test_fragment_with_write_crossing_atomic_boundary(self):
+        fragmenter = Fragmenter(rules=AtomicityRules(unit_size=4096,
+                                                     atomic_units=2))
+
+        writes = [
+            Write(offset=4096, data=bytearray(8192))
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+
+        self.assertEqual(len(ret), 2)
+        self.assertEqual(ret[0].offset, 4096)
+        self.assertEqual(len(ret[0].data), 4096)
+        self.assertEqual(ret[1].offset, 8192)
+        self.assertEqual(len(ret[1].data), 4096)
+
+    def test_fragment_with_per_disk_rules(self):
+        fragmenter = Fragmenter(rules={1: AtomicityRules(unit_size=4096)})
+
+        writes = [
+            Write(offset=0, data=bytearray(4096), disk_id=1),
+            Write(offset=0, data=bytearray(4096), disk_id=2)
+            ]
+
+        ret = [i for i in fragmenter.fragment(writes)]
+
+        self.assertEqual(len(ret), 9)
+        self.assertEqual(ret[0].disk_id, 1)
+        self.assertTrue(all(i.disk_id == 2 for i in ret[1:]))
+
+    def test_fragment_inherits_times(self):
+        fragmenter = Fragmenter()
+
+        write = Write(offset=0, data=bytearray(1024))
+        write.set_times(10, 20)
+
+        ret = fragmenter.fragment_write(write)
+
+        self.assertEqual(len(ret), 2)
+        self.assertEqual((ret[1].start_time, ret[1].end_time), (10, 20))
+
+    def test_fragment_without_inherited_times(self):
+        fragmenter = Fragmenter(rules=AtomicityRules(inherit_times=False))
+
+        write = Write(offset=0, data=bytearray(1024))
+        write.set_times(10, 20)
+
+        ret = fragmenter.fragment_write(write)
+
+        self.assertEqual((ret[1].start_time, ret[1].end_time), (None, None))
+
+
+class TestAtomicityRules(unittest.TestCase):
+    def test___init__(self):
+        rules = AtomicityRules()
+
+        self.assertEqual(rules.unit_size, 512)
+        self.assertEqual(rules.atomic_units, 1)
+        self.assertTrue(rules.inherit_times)
+
+    def test___init___with_invalid_values(self):
+        with self.assertRaises(ValueError):
+            AtomicityRules(unit_size=0)
+
+        with self.assertRaises(ValueError):
+            AtomicityRules(atomic_units=0)
+
+    def test_is_atomic(self):
+        rules = AtomicityRules(unit_size=512, atomic_units=2)
+
+        self.assertTrue(rules.is_atomic(Write(0, bytearray(1024))))
+        self.assertTrue(rules.is_atomic(Write(1030, bytearray(10))))
+        self.assertFalse(rules.is_atomic(Write(512, bytearray(1024))))
+        self.assertFalse(rules.is_atomic(Write(0, bytearray(1025))))
@@ -46,7 +46,7 @@ else:
 import os
 import tempfile
 import subprocess
-from fsresck.image import Image
+from fsresck.image import Image, ImageSet
 from fsresck.write import Write
 from fsresck.errors import FSCopyError
 
@@ -324,3 +324,59 @@ class TestImage(unittest.TestCase):
 
         self.assertEqual(mock_unlink.call_count, 1)
         self.assertEqual(mock_unlink.call_args, mock.call('/tmp/fsresck.yyyy'))
+
+class TestImageSet(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_names = {}
+        for disk_id in ('a', 'b'):
+            name = os.path.join(self.tmp_dir, disk_id)
+            with open(name, 'wb') as image:
+                image.write(b'\x00' * 16)
+            self.image_names[disk_id] = name
+
+    def tearDown(self):
+        for name in os.listdir(self.tmp_dir):
+            os.unlink(os.path.join(self.tmp_dir, name))
+        os.rmdir(self.tmp_dir)
+
+    def test___repr__(self):
+        image_set = ImageSet({'a': '/tmp/a'}, [])
+
+        self.assertEqual("ImageSet(image_names={'a': '/tmp/a'}, writes=[])",
+                         repr(image_set))
+
+    def test_member_images(self):
+        writes = [Write(0, b'a', 'a'), Write(1, b'b', 'b'),
+                  Write(2, b'c', 'a')]
+        image_set = ImageSet(self.image_names, writes)
+
+        images = image_set.member_images()
+
+        self.assertEqual(images['a'].writes, [writes[0], writes[2]])
+        self.assertEqual(images['b'].writes, [writes[1]])
+
+    def test_member_images_with_unknown_disk(self):
+        image_set = ImageSet(self.image_names, [Write(0, b'a', 'c')])
+
+        with self.assertRaises(ValueError):
+            image_set.member_images()
+
+    def test_create_images_and_cleanup(self):
+        writes = [Write(0, b'a', 'a'), Write(1, b'b', 'b')]
+        image_set = ImageSet(self.image_names, writes)
+
+        names = image_set.create_images(self.tmp_dir)
+
+        self.assertEqual(sorted(names), ['a', 'b'])
+        self.assertEqual(names, image_set.create_images(self.tmp_dir))
+        with open(names['a'], 'rb') as image:
+            self.assertEqual(image.read(), b'a' + b'\x00' * 15)
+        with open(names['b'], 'rb') as image:
+            self.assertEqual(image.read(), b'\x00b' + b'\x00' * 14)
+
+        image_set.cleanup()
+
+        self.assertIsNone(image_set.images)
+        self.assertFalse(os.path.exists(names['a']))
+        self.assertFalse(os.path.exists(names['b']))
@@ -45,8 +45,9 @@ else:
 
 import io
 from fsresck.imagegenerator import BaseImageGenerator, LogReader, LogHeader
-from fsresck.write import Write
+from fsresck.write import Write, LazyWrite
 from fsresck.errors import TruncatedFileError
+from fsresck.sharding import Shard
 
 class TestBaseImageGenerator(unittest.TestCase):
     def test___init__(self):
@@ -55,6 +56,7 @@ class TestBaseImageGenerator(unittest.TestCase):
         self.assertEqual(generator.image_name, "aaa")
         self.assertEqual(generator.log_name, "bbb")
         self.assertEqual(generator.ops_to_test, 5)
+        self.assertFalse(generator.lazy_payloads)
 
     def test_generate(self):
         writes = []
@@ -185,6 +187,68 @@ class TestBaseImageGenerator(unittest.TestCase):
                                         writes[3], writes[4]])
         self.assertEqual(test_writes, [])
 
+    def test_generate_with_lazy_payloads(self):
+        patcher = mock.patch.object(LogReader,
+                                    'reader',
+                                    mock.Mock(return_value=iter([])))
+        mock_reader = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        generator = BaseImageGenerator("aaa", "bbb")
+        generator.lazy_payloads = True
+
+        image_pairs = list(generator.generate())
+
+        self.assertEqual(len(image_pairs), 1)
+        self.assertEqual(mock_reader.call_args, call(lazy=True))
+
+    def test_generate_with_shards(self):
+        writes = [Write(offset=512*i, data=bytearray(10)) for i in range(10)]
+
+        patcher = mock.patch.object(LogReader,
+                                    'reader',
+                                    mock.Mock(side_effect=lambda lazy:
+                                              iter(writes)))
+        mock_reader = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        generator = BaseImageGenerator("aaa", "bbb")
+        generator.ops_to_test = 3
+
+        expected = [(list(i.writes), list(j))
+                    for i, j in generator.generate()]
+
+        pairs = []
+        for index in range(4):
+            pairs.extend((list(i.writes), list(j))
+                         for i, j in generator.generate(Shard(index, 4)))
+
+        self.assertEqual(len(expected), 11)
+        self.assertEqual(pairs, expected)
+
+    def test_generate_with_shard_and_window_cost(self):
+        writes = [Write(offset=512*i, data=bytearray(10)) for i in range(3)]
+
+        patcher = mock.patch.object(LogReader,
+                                    'reader',
+                                    mock.Mock(side_effect=lambda lazy:
+                                              iter(writes)))
+        mock_reader = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        generator = BaseImageGenerator("aaa", "bbb")
+        generator.ops_to_test = 1
+
+        # the first window is as expensive as all the rest
+        pairs = list(generator.generate(Shard(0, 2),
+                                        lambda x: 3 if len(x) == 1 and
+                                        x[0] == writes[0] else 1))
+
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(list(pairs[0][1]), [writes[0]])
+        self.assertEqual(mock_reader.call_args_list,
+                         [call(lazy=True), call(lazy=False)])
+
 class TestLogReader(unittest.TestCase):
     def test___init__(self):
         log_reader = LogReader('/tmp/log')
@@ -241,6 +305,61 @@ class TestLogReader(unittest.TestCase):
         with self.assertRaises(TruncatedFileError):
             next(log_reader.reader())
 
+    def test_reader_with_lazy_writes(self):
+        log_reader = LogReader('/tmp/log')
+
+        log = (\
+            b'\x00'*3 + b'\x01' +           # write operation
+            b'\x00'*8 +                     # start_time = 0
+            b'\x00'*7 + b'\x01' +           # end_time = 1
+            b'\x00'*6 + b'\x02\x00' +       # offset = 512
+            b'\x00'*3 + b'\x0a' +           # length = 10 bytes
+            b'\x01'*10 +                    # data
+            b'\x00'*3 + b'\x01' +           # write operation
+            b'\x00'*8 +                     # start_time = 0
+            b'\x00'*8 +                     # end_time = 0
+            b'\x00'*8 +                     # offset = 0
+            b'\x00'*3 + b'\x02' +           # length = 2 bytes
+            b'\x02'*2                       # data
+            )
+
+        open_mock = mock.MagicMock(return_value=io.BytesIO(log))
+        patcher = mock.patch.object(builtins,
+                                    'open',
+                                    open_mock)
+        mock_open = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        writes = list(log_reader.reader(lazy=True))
+
+        write = LazyWrite(512, '/tmp/log', 32, 10)
+        write.set_times(0, 1)
+        write2 = LazyWrite(0, '/tmp/log', 74, 2)
+        write2.set_times(0, 0)
+        self.assertEqual(writes, [write, write2])
+
+    def test_reader_with_lazy_writes_and_truncated_file(self):
+        log_reader = LogReader('/tmp/log')
+
+        log = (\
+            b'\x00'*3 + b'\x01' +           # write operation
+            b'\x00'*8 +                     # start_time = 0
+            b'\x00'*8 +                     # end_time = 0
+            b'\x00'*8 +                     # offset = 0
+            b'\x00'*3 + b'\x0a' +           # length = 10 bytes
+            b'\x01'*9                       # data
+            )
+
+        open_mock = mock.MagicMock(return_value=io.BytesIO(log))
+        patcher = mock.patch.object(builtins,
+                                    'open',
+                                    open_mock)
+        mock_open = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.assertRaises(TruncatedFileError):
+            next(log_reader.reader(lazy=True))
+
 class TestLogHeader(unittest.TestCase):
     def test___init__(self):
         header = LogHeader()
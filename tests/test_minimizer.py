@@ -0,0 +1,166 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+
+import os
+import shutil
+import tempfile
+
+from fsresck.checkers import CheckResult
+from fsresck.minimizer import Minimizer, _split
+from fsresck.statespec import StateSpec, StateSource
+
+from .helpers import write_log
+
+class ImageChecker(object):
+    name = 'image'
+
+    def __init__(self, fails):
+        self.fails = fails
+        self.checked = 0
+
+    def check(self, image_name):
+        self.checked += 1
+        with open(image_name, 'rb') as image:
+            data = image.read()
+        status = CheckResult.FAILED if self.fails(data) \
+            else CheckResult.PASSED
+        return CheckResult(status, checker=self.name)
+
+class TestSplit(unittest.TestCase):
+    def test__split(self):
+        self.assertEqual(_split([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4, 5]])
+        self.assertEqual(_split([1, 2, 3], 3), [[1], [2], [3]])
+
+class TestMinimizer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'\x00' * 16)
+        self.log_name = os.path.join(self.tmp_dir, 'log')
+        # one byte writes to offsets 0 to 7, then two overlapping writes
+        write_log(self.log_name, [(i, b'x') for i in range(8)] +
+                  [(8, b'aa'), (9, b'bb')])
+        self.source = StateSource(self.image_name, self.log_name)
+
+    def minimizer(self, fails):
+        return Minimizer(self.source, ImageChecker(fails), self.tmp_dir)
+
+    def test_result(self):
+        minimizer = self.minimizer(lambda data: data[3:4] == b'x')
+
+        result = minimizer.result(2, (3, ))
+        cached = minimizer.result(2, [3])
+
+        self.assertEqual(result.status, CheckResult.FAILED)
+        self.assertIs(cached, result)
+        self.assertEqual(minimizer.checks, 1)
+        self.assertEqual(minimizer.result(4, ()).status, CheckResult.FAILED)
+        self.assertEqual(minimizer.result(3, ()).status, CheckResult.PASSED)
+
+    def test_minimize(self):
+        # write 5 persisted without write 2
+        minimizer = self.minimizer(
+            lambda data: data[5:6] == b'x' and data[2:3] != b'x')
+
+        spec, result = minimizer.minimize(
+            StateSpec.from_draw_group(self.source.log_id, 2, (5, 4, 3)))
+
+        self.assertEqual(spec, StateSpec(self.source.log_id, 0, (5, ), 0))
+        self.assertEqual(result.status, CheckResult.FAILED)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['image', 'log'])
+
+    def test_minimize_with_writes_in_order(self):
+        minimizer = self.minimizer(
+            lambda data: data[5:6] == b'x' and data[6:7] == b'x' and
+            data[3:4] != b'x')
+
+        spec, _ = minimizer.minimize(
+            StateSpec.from_draw_group(self.source.log_id, 3, (6, 4, 5)))
+
+        self.assertEqual(spec.base_index, 0)
+        self.assertEqual(spec.draw_group, (5, 6))
+
+    def test_minimize_with_reordered_writes(self):
+        minimizer = self.minimizer(lambda data: data[8:11] == b'aab')
+
+        spec, _ = minimizer.minimize(
+            StateSpec.from_draw_group(self.source.log_id, 7, (9, 7, 8)))
+
+        self.assertEqual(spec.base_index, 0)
+        self.assertEqual(spec.draw_group, (9, 8))
+
+    def test_minimize_with_failing_base(self):
+        minimizer = self.minimizer(lambda data: data[1:2] == b'x')
+
+        spec, _ = minimizer.minimize(
+            StateSpec.from_draw_group(self.source.log_id, 4, (6, 4, 5)))
+
+        self.assertEqual(spec, StateSpec(self.source.log_id, 2, (), 0))
+
+    def test_minimize_with_passing_state(self):
+        minimizer = self.minimizer(lambda data: False)
+
+        with self.assertRaises(ValueError):
+            minimizer.minimize(StateSpec(self.source.log_id, 2, (3, ), 0))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['image', 'log'])
+
+    def test_minimize_with_timeout(self):
+        # the state passes without write 7, fails differently without 6
+        def check(image_name):
+            with open(image_name, 'rb') as image:
+                data = image.read()
+            if data[7:8] != b'x':
+                return CheckResult(CheckResult.PASSED)
+            if data[6:7] != b'x':
+                return CheckResult(CheckResult.FAILED)
+            return CheckResult(CheckResult.TIMEOUT)
+        checker = ImageChecker(None)
+        checker.check = check
+        minimizer = Minimizer(self.source, checker, self.tmp_dir)
+
+        spec, result = minimizer.minimize(
+            StateSpec.from_draw_group(self.source.log_id, 5, (7, 6, 5)))
+
+        self.assertEqual(result.status, CheckResult.TIMEOUT)
+        self.assertEqual(spec.draw_group, (6, 7))
+
+    def test_ddmin_number_of_checks(self):
+        minimizer = self.minimizer(lambda data: data[6:7] == b'x')
+
+        writes = minimizer.ddmin(0, range(8), CheckResult.FAILED)
+
+        self.assertEqual(writes, [6])
+        # empty group, two halves, two quarters and one eighth
+        self.assertEqual(minimizer.checks, 6)
@@ -0,0 +1,231 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from fsresck.multidisk import ConsistentCutGenerator, Cut
+from fsresck.write import Write
+
+def timed(write, start_time, end_time):
+    write.set_times(start_time, end_time)
+    return write
+
+class TestCut(unittest.TestCase):
+    def test___repr__(self):
+        cut = Cut(10, {'a': [0]}, {'a': [1]})
+
+        self.assertEqual(repr(cut), "Cut(time=10, persisted={'a': [0]}, "
+                                    "in_flight={'a': [1]})")
+
+    def test_prefixes(self):
+        cut = Cut(10, {'a': [0, 2], 'b': []}, {'a': [3], 'b': [1]})
+
+        self.assertEqual(cut.prefixes, {'a': (2, 3), 'b': (0, 1)})
+
+class TestConsistentCutGenerator(unittest.TestCase):
+    def setUp(self):
+        self.image_names = {'a': '/tmp/a', 'b': '/tmp/b'}
+
+    def test___init___with_writes_without_times(self):
+        with self.assertRaises(ValueError):
+            ConsistentCutGenerator(self.image_names, [Write(0, b'a', 'a')])
+
+    def test___init___with_unknown_disk(self):
+        with self.assertRaises(ValueError):
+            ConsistentCutGenerator(self.image_names,
+                                   [timed(Write(0, b'a', 'c'), 0, 1)])
+
+    def test_cuts(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 2),
+                  timed(Write(0, b'b', 'b'), 1, 3),
+                  timed(Write(1, b'c', 'a'), 2, 4)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+
+        cuts = list(gen.cuts())
+
+        self.assertEqual([cut.time for cut in cuts], [0, 1, 2, 4])
+        self.assertEqual(cuts[0].persisted, {'a': [], 'b': []})
+        self.assertEqual(cuts[0].in_flight, {'a': [0], 'b': []})
+        self.assertEqual(cuts[1].in_flight, {'a': [0], 'b': [1]})
+        self.assertEqual(cuts[2].persisted, {'a': [0], 'b': []})
+        self.assertEqual(cuts[2].in_flight, {'a': [2], 'b': [1]})
+        self.assertEqual(cuts[3].persisted, {'a': [0, 2], 'b': [1]})
+        self.assertEqual(cuts[3].in_flight, {'a': [], 'b': []})
+
+    def test_device_groups(self):
+        writes = [timed(Write(0, b'aa', 'a'), 0, 5),
+                  timed(Write(1, b'b', 'a'), 0, 5),
+                  timed(Write(4, b'c', 'a'), 0, 5)]
+        gen = ConsistentCutGenerator(self.image_names, writes, group_size=2)
+
+        groups = list(gen.device_groups([0, 1, 2]))
+
+        self.assertEqual(groups, [(), (0,), (1,), (2,), (0, 1), (1, 0),
+                                  (0, 2), (1, 2)])
+
+    def test_states(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 2),
+                  timed(Write(0, b'b', 'b'), 1, 3)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+        cut = Cut(1, {'a': [], 'b': []}, {'a': [0], 'b': [1]})
+
+        states = list(gen.states(cut))
+
+        self.assertEqual(states, [(('a', ()), ('b', ())),
+                                  (('a', ()), ('b', (1,))),
+                                  (('a', (0,)), ('b', ())),
+                                  (('a', (0,)), ('b', (1,)))])
+
+    def test_states_with_previous_cut(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 2),
+                  timed(Write(0, b'b', 'b'), 1, 3),
+                  timed(Write(0, b'c', 'a'), 2, 4)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+        previous = Cut(1, {'a': [], 'b': []}, {'a': [0], 'b': [1]})
+        cut = Cut(2, {'a': [0], 'b': []}, {'a': [2], 'b': [1]})
+
+        states = list(gen.states(cut, previous))
+
+        # write 0 persisted on its own was a state of device "a" before
+        self.assertEqual(states, [(('a', (0, 2)), ('b', ())),
+                                  (('a', (0, 2)), ('b', (1,)))])
+
+    def test_states_with_same_previous_cut(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 2)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+        cut = Cut(1, {'a': [], 'b': []}, {'a': [0], 'b': []})
+
+        self.assertEqual(list(gen.states(cut, cut)), [])
+
+    def test_is_device_state(self):
+        writes = [timed(Write(0, b'aa', 'a'), 0, 10),
+                  timed(Write(1, b'b', 'a'), 1, 2),
+                  timed(Write(4, b'c', 'a'), 1, 10),
+                  timed(Write(6, b'd', 'a'), 1, 10)]
+        gen = ConsistentCutGenerator(self.image_names, writes, group_size=2)
+
+        self.assertTrue(gen.is_device_state((1, 0), [1], set([0, 2, 3])))
+        self.assertTrue(gen.is_device_state((0, 1), [1], set([0, 2, 3])))
+        self.assertTrue(gen.is_device_state((1, 2, 3), [1], set([0, 2, 3])))
+        # persisted write missing
+        self.assertFalse(gen.is_device_state((0,), [1], set([0, 2, 3])))
+        # write not started yet
+        self.assertFalse(gen.is_device_state((1, 4), [1], set([0, 2, 3])))
+        # more writes in flight than group_size
+        self.assertFalse(gen.is_device_state((1, 0, 2, 3), [1],
+                                             set([0, 2, 3])))
+        # writes that don't overlap are applied in log order
+        self.assertFalse(gen.is_device_state((1, 3, 2), [1], set([0, 2, 3])))
+        # write 2 doesn't overlap write 1, positions before it are skipped
+        self.assertFalse(gen.is_device_state((2, 1), [1], set([0, 2, 3])))
+
+    def test_cuts_with_writes_out_of_start_order(self):
+        writes = [timed(Write(0, b'a', 'a'), 2, 3),
+                  timed(Write(1, b'b', 'a'), 0, 1)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+
+        cuts = list(gen.cuts())
+
+        self.assertEqual([cut.time for cut in cuts], [0, 2, 3])
+        self.assertEqual(cuts[1].persisted, {'a': [1], 'b': []})
+        self.assertEqual(cuts[1].in_flight, {'a': [0], 'b': []})
+        self.assertEqual(cuts[2].persisted, {'a': [0, 1], 'b': []})
+
+    def test_states_with_overlapping_persisted_write(self):
+        # write 0 was issued first, write 1 overwrote part of it and
+        # completed while write 0 was still in flight
+        writes = [timed(Write(0, b'aa', 'a'), 0, 10),
+                  timed(Write(1, b'b', 'a'), 1, 2)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+        cut = Cut(2, {'a': [1], 'b': []}, {'a': [0], 'b': []})
+
+        states = list(gen.states(cut))
+
+        self.assertEqual(states, [(('a', (1,)), ('b', ())),
+                                  (('a', (1, 0)), ('b', ())),
+                                  (('a', (0, 1)), ('b', ()))])
+
+    def test_states_with_write_persisted_before_issue(self):
+        writes = [timed(Write(0, b'aa', 'a'), 2, 10),
+                  timed(Write(1, b'b', 'a'), 0, 1)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+        cut = Cut(2, {'a': [1], 'b': []}, {'a': [0], 'b': []})
+
+        states = list(gen.states(cut))
+
+        self.assertEqual(states, [(('a', (1,)), ('b', ())),
+                                  (('a', (1, 0)), ('b', ()))])
+
+    def test_positions(self):
+        writes = [timed(Write(0, b'b', 'a'), 0, 1),
+                  timed(Write(0, b'aaa', 'a'), 2, 10),
+                  timed(Write(1, b'c', 'a'), 3, 4),
+                  timed(Write(5, b'd', 'a'), 3, 4),
+                  timed(Write(2, b'e', 'a'), 4, 5)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+
+        self.assertEqual(gen.positions([0, 2, 3, 4], 1), [4, 3, 1])
+
+    def test_generate(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 2),
+                  timed(Write(0, b'b', 'b'), 1, 3),
+                  timed(Write(0, b'c', 'a'), 2, 4)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+
+        states = [(time, image_set.writes) for time, image_set in
+                  gen.generate()]
+
+        self.assertEqual(states,
+                         [(0, []),
+                          (0, [writes[0]]),
+                          (1, [writes[1]]),
+                          (1, [writes[0], writes[1]]),
+                          (2, [writes[0], writes[2]]),
+                          (2, [writes[0], writes[2], writes[1]])])
+
+    def test_generate_without_writes(self):
+        gen = ConsistentCutGenerator(self.image_names, [])
+
+        self.assertEqual(list(gen.generate()), [])
+
+    def test_generate_with_independent_devices(self):
+        writes = [timed(Write(0, b'a', 'a'), 0, 10),
+                  timed(Write(0, b'b', 'a'), 0, 10),
+                  timed(Write(0, b'c', 'b'), 0, 10),
+                  timed(Write(0, b'd', 'b'), 0, 10)]
+        gen = ConsistentCutGenerator(self.image_names, writes)
+
+        states = list(gen.generate())
+
+        # 5 states of writes to every device (none, one of two, both in
+        # two orders), not permutations of all four writes
+        self.assertEqual(len(states), 25)
+        self.assertEqual(states[-1][1].writes, [writes[1], writes[0],
+                                                writes[3], writes[2]])
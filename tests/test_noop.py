@@ -0,0 +1,141 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import tempfile
+
+from fsresck.noop import NoopFilter
+from fsresck.write import Write
+
+class TestNoopFilter(unittest.TestCase):
+    def setUp(self):
+        handle, self.image_name = tempfile.mkstemp()
+        os.write(handle, b'\x00' * 2048)
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.image_name)
+
+    def test___init__(self):
+        noop = NoopFilter(self.image_name)
+
+        self.assertEqual(noop.removed, 0)
+        self.assertEqual(noop.removed_bytes, 0)
+        self.assertEqual(noop.horizon, 5)
+
+    def test_filter_with_changing_write(self):
+        noop = NoopFilter(self.image_name)
+        writes = [Write(0, b'\x01' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), writes)
+        self.assertEqual(noop.removed, 0)
+
+    def test_filter_with_noop_write(self):
+        noop = NoopFilter(self.image_name)
+        writes = [Write(0, b'\x00' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), [])
+        self.assertEqual(noop.removed, 1)
+        self.assertEqual(noop.removed_bytes, 512)
+
+    def test_filter_with_unaligned_noop_write(self):
+        noop = NoopFilter(self.image_name)
+        writes = [Write(100, b'\x00' * 1000)]
+
+        self.assertEqual(list(noop.filter(writes)), [])
+
+    def test_filter_with_write_past_end_of_image(self):
+        noop = NoopFilter(self.image_name)
+        writes = [Write(2000, b'\x00' * 100)]
+
+        self.assertEqual(list(noop.filter(writes)), writes)
+
+    def test_filter_with_overlapping_write_in_horizon(self):
+        noop = NoopFilter(self.image_name, horizon=2)
+        writes = [Write(0, b'\x01' * 512),
+                  Write(1024, b'\x01' * 512),
+                  Write(0, b'\x00' * 512)]
+
+        # the last write doesn't change the base image, but it does change
+        # the image when it is reordered with the first one
+        self.assertEqual(list(noop.filter(writes)), writes)
+        self.assertEqual(noop.removed, 0)
+
+    def test_filter_with_overlapping_write_past_horizon(self):
+        noop = NoopFilter(self.image_name, horizon=1)
+        writes = [Write(0, b'\x01' * 512),
+                  Write(1024, b'\x01' * 512),
+                  Write(0, b'\x01' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), writes[:2])
+        self.assertEqual(noop.removed, 1)
+
+    def test_filter_with_overlapping_later_write(self):
+        noop = NoopFilter(self.image_name, horizon=1)
+        writes = [Write(0, b'\x00' * 512),
+                  Write(0, b'\x01' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), writes)
+
+    def test_filter_with_modified_block(self):
+        noop = NoopFilter(self.image_name, horizon=0)
+        writes = [Write(512, b'\x01' * 512),
+                  Write(512, b'\x01' * 512),
+                  Write(512, b'\x02' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), [writes[0], writes[2]])
+
+    def test_filter_with_partially_modified_block(self):
+        noop = NoopFilter(self.image_name, horizon=0)
+        writes = [Write(512, b'\x01' * 10),
+                  Write(512, b'\x01' * 10 + b'\x00' * 502),
+                  Write(512, b'\x01' * 10)]
+
+        # whole block after partial write has known contents, but partial
+        # writes to modified blocks can't be compared
+        self.assertEqual(list(noop.filter(writes)), [writes[0], writes[2]])
+
+    def test_filter_with_memoryview_fragments(self):
+        noop = NoopFilter(self.image_name, horizon=0)
+        write = Write(0, bytearray(b'\x00' * 512 + b'\x01' * 512))
+        writes = [write.slice(0, 512), write.slice(512, 1024)]
+
+        self.assertEqual(list(noop.filter(writes)), [writes[1]])
+        self.assertEqual(noop.removed_bytes, 512)
+
+    def test_filter_with_empty_image(self):
+        with open(self.image_name, 'wb'):
+            pass
+        noop = NoopFilter(self.image_name)
+        writes = [Write(0, b'\x00' * 512)]
+
+        self.assertEqual(list(noop.filter(writes)), writes)
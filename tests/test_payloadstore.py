@@ -0,0 +1,137 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+
+from fsresck.payloadstore import PayloadStore
+from fsresck.write import LazyWrite, Write
+
+def read_payload(args):
+    store, record_id = args
+    return store.payload(record_id).tobytes()
+
+class TestPayloadStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.file_name = os.path.join(self.tmp_dir, 'log')
+        with open(self.file_name, 'wb') as log:
+            log.write(b'headerAAAAheaderBB')
+
+    def test_payload(self):
+        store = PayloadStore(self.file_name)
+
+        self.assertEqual(store.add(6, 4), 0)
+        self.assertEqual(store.add(16, 2), 1)
+
+        payload = store.payload(1)
+        self.assertIsInstance(payload, memoryview)
+        self.assertEqual(payload.tobytes(), b'BB')
+        self.assertEqual(store.payload(0).tobytes(), b'AAAA')
+        self.assertEqual(len(store), 2)
+
+    def test_payload_past_end_of_file(self):
+        store = PayloadStore(self.file_name)
+        store.add(16, 4)
+
+        with self.assertRaises(IndexError):
+            store.payload(0)
+
+    def test_from_writes(self):
+        writes = [LazyWrite(0, self.file_name, 6, 4),
+                  LazyWrite(512, self.file_name, 16, 2)]
+
+        store = PayloadStore.from_writes(self.file_name, writes)
+
+        self.assertEqual([store.payload(i).tobytes() for i in range(2)],
+                         [write.data for write in writes])
+
+    def test_from_writes_with_data_in_memory(self):
+        with self.assertRaises(ValueError):
+            PayloadStore.from_writes(self.file_name, [Write(0, b'a')])
+
+    def test_write(self):
+        store = PayloadStore(self.file_name)
+        store.add(6, 4)
+        write = LazyWrite(512, self.file_name, 6, 4, disk_id='a')
+        write.set_times(1, 2)
+
+        ret = store.write(0, write)
+
+        self.assertEqual(ret.offset, 512)
+        self.assertEqual(ret.disk_id, 'a')
+        self.assertEqual((ret.start_time, ret.end_time), (1, 2))
+        self.assertEqual(ret.data.tobytes(), b'AAAA')
+
+    def test_pickle(self):
+        store = PayloadStore(self.file_name)
+        store.add(6, 4)
+        store.payload(0)
+
+        copy = pickle.loads(pickle.dumps(store))
+
+        self.assertIsNone(copy._mapping)
+        self.assertEqual(copy.payload(0).tobytes(), b'AAAA')
+
+    def test_payload_in_worker_process(self):
+        store = PayloadStore(self.file_name)
+        store.add(6, 4)
+        store.add(16, 2)
+        pool = multiprocessing.Pool(2)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.close)
+
+        self.assertEqual(pool.map(read_payload, [(store, 0), (store, 1)]),
+                         [b'AAAA', b'BB'])
+
+    def test_close(self):
+        store = PayloadStore(self.file_name)
+        store.add(6, 4)
+        self.assertEqual(store.payload(0).tobytes(), b'AAAA')
+
+        store.close()
+
+        self.assertIsNone(store._mapping)
+        # mapped again when needed
+        self.assertEqual(store.payload(0).tobytes(), b'AAAA')
+
+    def test_with_empty_file(self):
+        with open(self.file_name, 'wb'):
+            pass
+        store = PayloadStore(self.file_name)
+        store.add(0, 0)
+
+        self.assertEqual(store.payload(0).tobytes(), b'')
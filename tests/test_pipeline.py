@@ -0,0 +1,232 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from fsresck.checkers import CheckerChain, CheckResult, CommandChecker, \
+    Tier
+from fsresck.image import Image
+from fsresck.write import Write
+from fsresck.writesshuffler import WritesShuffler
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from fsresck.pipeline import Stage, Pipeline, CheckPipeline, run_checker
+
+needs_asyncio = unittest.skipIf(sys.version_info < (3, 5),
+                                "requires asyncio with async/await")
+
+@needs_asyncio
+class TestStage(unittest.TestCase):
+    def test___init__(self):
+        def double(item):
+            return item * 2
+        stage = Stage(double, blocking=True)
+
+        self.assertEqual(stage.name, 'double')
+        self.assertEqual(stage.workers, 1)
+        self.assertEqual(repr(stage),
+                         "Stage(name='double', workers=1, blocking=True)")
+
+    def test___init___with_no_workers(self):
+        with self.assertRaises(ValueError):
+            Stage(len, 0)
+
+@needs_asyncio
+class TestPipeline(unittest.TestCase):
+    def test_run_sync(self):
+        pipeline = Pipeline([Stage(lambda x: x + 1, blocking=True,
+                                   name='inc'),
+                             Stage(lambda x: asyncio.sleep(0, result=x * 2),
+                                   workers=3, name='double')])
+        results = []
+
+        pipeline.run_sync(range(10), results.append)
+
+        self.assertEqual(sorted(results), [i * 2 for i in range(1, 11)])
+        self.assertEqual(pipeline.processed, {'inc': 10, 'double': 10})
+
+    def test_run_sync_with_empty_source(self):
+        pipeline = Pipeline([Stage(len, blocking=True)])
+        results = []
+
+        pipeline.run_sync([], results.append)
+
+        self.assertEqual(results, [])
+
+    def test_run_sync_with_bounded_buffering(self):
+        lock = threading.Lock()
+        read = []
+        done = []
+
+        def source():
+            for i in range(50):
+                with lock:
+                    read.append(i)
+                yield i
+
+        def slow(item):
+            time.sleep(0.001)
+            with lock:
+                done.append(item)
+                # items read but not processed by the slow stage are
+                # only the ones in queues and in workers
+                self.assertLessEqual(len(read) - len(done), 2 * 2 + 2 + 1)
+            return item
+
+        pipeline = Pipeline([Stage(slow, workers=2, blocking=True)],
+                            queue_size=2)
+        results = []
+
+        pipeline.run_sync(source(), results.append)
+
+        self.assertEqual(sorted(results), list(range(50)))
+
+    def test_run_sync_with_failing_stage(self):
+        def fail(item):
+            raise KeyError(item)
+        pipeline = Pipeline([Stage(fail, workers=2, blocking=True)])
+
+        with self.assertRaises(KeyError):
+            pipeline.run_sync(range(100))
+
+@needs_asyncio
+class TestRunChecker(unittest.TestCase):
+    def run_checker(self, checker):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        return loop.run_until_complete(run_checker(checker, '/tmp/img'))
+
+    def test_run_checker(self):
+        result = self.run_checker(CommandChecker(
+            [sys.executable, '-c', 'import sys; print(sys.argv[1])']))
+
+        self.assertTrue(result.passed)
+        self.assertEqual(result.output.strip(), b'/tmp/img')
+
+    def test_run_checker_with_failure(self):
+        result = self.run_checker(CommandChecker(
+            [sys.executable, '-c', 'import sys; sys.exit(3)']))
+
+        self.assertEqual(result.status, 'failed')
+        self.assertEqual(result.returncode, 3)
+
+    def test_run_checker_with_timeout(self):
+        result = self.run_checker(CommandChecker(
+            [sys.executable, '-c', 'import time; time.sleep(10)'],
+            timeout=0.1))
+
+        self.assertEqual(result.status, 'timeout')
+
+    def test_run_checker_with_timeout_and_background_child(self):
+        start = time.time()
+        result = self.run_checker(CommandChecker(
+            ['sh', '-c', 'sleep 10 & sleep 10'], timeout=0.1))
+
+        self.assertEqual(result.status, 'timeout')
+        self.assertLess(time.time() - start, 5)
+
+    def test_run_checker_with_missing_command(self):
+        result = self.run_checker(CommandChecker(['/nonexistent/fsck']))
+
+        self.assertEqual(result.status, 'error')
+
+    def test_run_checker_with_python_checker(self):
+        with self.assertRaises(TypeError):
+            self.run_checker(CheckerChain([Tier(CommandChecker(['true']))]))
+
+@needs_asyncio
+class TestCheckPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'....')
+
+    def test_run_sync(self):
+        writes = [Write(0, b'a'), Write(0, b'b'), Write(1, b'c')]
+        shuffler = WritesShuffler(Image(self.image_name, []), writes)
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        checker = CommandChecker(
+            [sys.executable, '-c',
+             'import sys; sys.exit(open(sys.argv[1], "rb").read(1) == b"b")'])
+        pipeline = CheckPipeline(checker, self.tmp_dir, materializers=2,
+                                 checkers=3)
+        results = []
+
+        pipeline.run_sync(shuffler.ranked_generator(group_size=2),
+                          results.append)
+
+        self.assertEqual(sorted((i.window_number, i.rank, i.result.status)
+                                for i in results),
+                         [(0, 0, 'passed'), (0, 1, 'failed'),
+                          (0, 2, 'passed'), (1, 0, 'passed'),
+                          (1, 1, 'passed'), (2, 0, 'failed'),
+                          (3, 0, 'failed')])
+        self.assertEqual(len(pipeline.images), 0)
+        # only the base image copy of the shuffler is left
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    def test_run_sync_with_checker_chain(self):
+        writes = [Write(0, b'a'), Write(0, b'b')]
+        shuffler = WritesShuffler(Image(self.image_name, []), writes)
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        first = CommandChecker(
+            [sys.executable, '-c',
+             'import sys; sys.exit(open(sys.argv[1], "rb").read(1) == b"b")'],
+            name='first')
+        second = CommandChecker(['false'], name='second')
+        checker = CheckerChain([Tier(first, (CheckResult.FAILED, )),
+                                Tier(second)])
+        pipeline = CheckPipeline(checker, self.tmp_dir)
+        results = []
+
+        pipeline.run_sync(shuffler.ranked_generator(group_size=2),
+                          results.append)
+
+        self.assertEqual(sorted((i.window_number, i.rank, i.result.status,
+                                 [j[0] for j in i.result.tiers])
+                                for i in results),
+                         [(0, 0, 'passed', ['first']),
+                          (0, 1, 'failed', ['first', 'second']),
+                          (0, 2, 'passed', ['first']),
+                          (1, 0, 'passed', ['first']),
+                          (2, 0, 'failed', ['first', 'second'])])
+        self.assertEqual(len(pipeline.images), 0)
@@ -0,0 +1,162 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import shutil
+import struct
+import tempfile
+
+from fsresck.planner import Planner, Plan, WindowPlan
+from fsresck.fragmenter import Fragmenter
+from fsresck.writesshuffler import WritesShuffler
+from fsresck.image import Image
+from fsresck.write import Write
+
+from .helpers import write_log
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.image_name = os.path.join(self.directory, 'image')
+        self.log_name = os.path.join(self.directory, 'log')
+        with open(self.image_name, 'wb') as image:
+            image.write(bytearray(8192))
+        self.writes = [Write(i * 256, bytearray([i]) * 512)
+                       for i in range(6)]
+        write_log(self.log_name, [(i.offset, i.data) for i in self.writes])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def count_states(self, writes, group_size):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        shuffler = WritesShuffler(image, writes)
+        states = list(shuffler.generator(group_size))
+        written = sum(len(j.data) for _, i in states for j in i)
+        return len(states), written
+
+    def test_plan(self):
+        planner = Planner(self.image_name, self.log_name, group_size=3)
+
+        plan = planner.plan()
+
+        states, written = self.count_states(self.writes, 3)
+        self.assertEqual(plan.states, states)
+        self.assertEqual(plan.window_count, 7)
+        self.assertEqual(len(plan.windows), 7)
+        self.assertEqual(plan.image_size, 8192)
+        self.assertEqual(sum(i.written_bytes for i in plan.windows),
+                         written)
+        self.assertEqual(plan.windows[2].base_bytes, 1024)
+
+    def test_plan_with_fragmenter(self):
+        planner = Planner(self.image_name, self.log_name, group_size=2,
+                          fragmenter=Fragmenter())
+
+        plan = planner.plan(keep_windows=False)
+
+        fragments = list(Fragmenter().fragment(self.writes))
+        states, _ = self.count_states(fragments, 2)
+        self.assertEqual(plan.states, states)
+        self.assertEqual(plan.windows, [])
+
+    def test_plan_with_ops_to_test(self):
+        planner = Planner(self.image_name, self.log_name, group_size=2,
+                          ops_to_test=3)
+
+        plan = planner.plan()
+
+        states = sum(self.count_states(self.writes[i:i+3], 2)[0]
+                     for i in range(7))
+        self.assertEqual(plan.states, states)
+
+    def test_plan_with_noop_horizon(self):
+        write_log(self.log_name, [(i.offset, i.data) for i in self.writes] +
+                  [(4096, b'\x00' * 512)])
+        planner = Planner(self.image_name, self.log_name, group_size=3,
+                          noop_horizon=3)
+
+        plan = planner.plan()
+
+        # the first write of zeros overlaps the second one and is kept
+        states, _ = self.count_states(self.writes, 3)
+        self.assertEqual(plan.states, states)
+
+    def test_plan_with_noop_horizon_and_ops_to_test(self):
+        with self.assertRaises(ValueError):
+            Planner(self.image_name, self.log_name, ops_to_test=3,
+                    noop_horizon=3)
+
+    def test_plan_with_missing_image(self):
+        planner = Planner(os.path.join(self.directory, 'missing'),
+                          self.log_name)
+
+        self.assertEqual(planner.plan().image_size, 0)
+
+class TestPlan(unittest.TestCase):
+    def test_add(self):
+        plan = Plan(image_size=100)
+
+        plan.add(WindowPlan(0, 10, 5, 20))
+        plan.add(WindowPlan(1, 3, 6, 2), keep=False)
+
+        self.assertEqual(plan.states, 13)
+        self.assertEqual(plan.window_count, 2)
+        self.assertEqual(plan.max_window_states, 10)
+        self.assertEqual(len(plan.windows), 1)
+        self.assertEqual(plan.write_bytes, 50 + 20 + 18 + 2)
+        self.assertEqual(plan.io_bytes, 1300 + 90)
+
+    def test_projected_seconds(self):
+        plan = Plan(image_size=100)
+        plan.add(WindowPlan(0, 10, 0, 0))
+
+        self.assertEqual(plan.projected_seconds(2), 20)
+        self.assertEqual(plan.projected_seconds(2, 5), 25)
+        self.assertEqual(plan.projected_seconds(2, 5, 100), 35)
+
+    def test_fits(self):
+        plan = Plan()
+        plan.add(WindowPlan(0, 10, 0, 0))
+
+        self.assertTrue(plan.fits(10, 1))
+        self.assertFalse(plan.fits(9, 1))
+        self.assertTrue(plan.fits(5, 1, workers=2))
+
+    def test_cost_model(self):
+        plan = Plan()
+
+        model = plan.cost_model(2, 30)
+
+        self.assertEqual(model.state_cost, 2)
+        self.assertEqual(model.image_cost, 30)
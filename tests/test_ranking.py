@@ -0,0 +1,136 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from itertools import permutations
+
+from fsresck.ranking import WindowSpace, rank_permutation, \
+        unrank_permutation
+from fsresck.writesshuffler import draw_groups
+from fsresck.write import Write
+
+class TestPermutationRanking(unittest.TestCase):
+    def test_rank_permutation(self):
+        for rank, perm in enumerate(permutations([1, 4, 6, 9])):
+            self.assertEqual(rank_permutation(perm), rank)
+
+    def test_unrank_permutation(self):
+        for rank, perm in enumerate(permutations([1, 4, 6, 9])):
+            self.assertEqual(unrank_permutation([1, 4, 6, 9], rank), perm)
+
+    def test_unrank_permutation_out_of_range(self):
+        with self.assertRaises(IndexError):
+            unrank_permutation([1, 2, 3], 6)
+
+class TestWindowSpace(unittest.TestCase):
+    def check_window(self, window, group_size):
+        space = WindowSpace(window, group_size)
+
+        expected = set(draw_groups(window, group_size))
+        expected.add(tuple())
+        states = [space.unrank(i) for i in range(len(space))]
+
+        self.assertEqual(len(states), len(expected))
+        self.assertEqual(set(states), expected)
+        for rank, state in enumerate(states):
+            self.assertEqual(space.rank(state), rank)
+
+    def test_with_overlapping_writes(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(4))
+
+        self.check_window(window, 4)
+
+    def test_with_non_overlapping_writes(self):
+        window = tuple(Write(512*i, bytearray(512)) for i in range(5))
+
+        self.check_window(window, 5)
+
+    def test_with_mixed_writes(self):
+        window = (Write(0, bytearray(512)),
+                  Write(1024, bytearray(512)),
+                  Write(256, bytearray(512)),
+                  Write(4096, bytearray(512)),
+                  Write(1200, bytearray(10)))
+
+        self.check_window(window, 5)
+
+    def test_with_smaller_group_size(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(5))
+
+        self.check_window(window, 3)
+
+    def test_with_empty_window(self):
+        space = WindowSpace(tuple(), 3)
+
+        self.assertEqual(len(space), 1)
+        self.assertEqual(space.unrank(0), tuple())
+        self.assertEqual(space.rank(tuple()), 0)
+
+    def test_size(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(3))
+
+        space = WindowSpace(window)
+
+        # 10 out of order draw groups and the base image
+        self.assertEqual(space.size, 11)
+
+    def test_written_bytes(self):
+        window = (Write(0, bytearray(512)),
+                  Write(1024, bytearray(100)),
+                  Write(256, bytearray(10)))
+        space = WindowSpace(window)
+
+        written = sum(sum(len(j.data) for j in space.unrank(i))
+                      for i in range(len(space)))
+        self.assertEqual(space.written_bytes(), written)
+
+    def test_unrank_out_of_range(self):
+        space = WindowSpace((Write(0, bytearray(1)), ), 3)
+
+        with self.assertRaises(IndexError):
+            space.unrank(1)
+
+    def test_rank_with_in_order_writes(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(3))
+        space = WindowSpace(window)
+
+        with self.assertRaises(ValueError):
+            space.rank((window[0], window[1]))
+
+        with self.assertRaises(ValueError):
+            space.rank((Write(10, bytearray(1)), ))
+
+    def test_rank_of_non_overlapping_writes_ignores_order(self):
+        window = tuple(Write(512*i, bytearray(512)) for i in range(3))
+        space = WindowSpace(window)
+
+        self.assertEqual(space.rank((window[2], window[1])),
+                         space.rank((window[1], window[2])))
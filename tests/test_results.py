@@ -0,0 +1,121 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import shutil
+import tempfile
+
+from fsresck.checkers import CheckResult
+from fsresck.driver import StateResult
+from fsresck.results import ResultStore
+
+def state_result(window, rank, status, output=b''):
+    return StateResult(window, rank, ((0, 512, None), ),
+                       CheckResult(status, 0, output, 0.25, 'fsck'))
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'results.db')
+
+    def test_lookup_with_empty_store(self):
+        with ResultStore(self.path) as store:
+            self.assertIsNone(store.lookup('b', 'l', 0, 'sig', 'fsck'))
+            self.assertEqual(len(store), 0)
+
+    def test_store_and_lookup(self):
+        with ResultStore(self.path) as store:
+            store.store('b', 'l', 'sig', state_result(3, 4, 'failed',
+                                                      b'errors'))
+
+            result = store.lookup('b', 'l', 3, 'sig', 'fsck')
+
+        self.assertTrue(result.cached)
+        self.assertEqual(result.window_number, 3)
+        self.assertEqual(result.rank, 4)
+        self.assertEqual(result.draw_group, ((0, 512, None), ))
+        self.assertEqual(result.result.status, 'failed')
+        self.assertEqual(result.result.output, b'errors')
+        self.assertEqual(result.result.duration, 0.25)
+        self.assertEqual(result.result.checker, 'fsck')
+
+    def test_lookup_with_different_key(self):
+        with ResultStore(self.path) as store:
+            store.store('b', 'l', 'sig', state_result(3, 4, 'passed'))
+
+            self.assertIsNone(store.lookup('x', 'l', 3, 'sig', 'fsck'))
+            self.assertIsNone(store.lookup('b', 'x', 3, 'sig', 'fsck'))
+            self.assertIsNone(store.lookup('b', 'l', 2, 'sig', 'fsck'))
+            self.assertIsNone(store.lookup('b', 'l', 3, 'x', 'fsck'))
+            self.assertIsNone(store.lookup('b', 'l', 3, 'sig', 'x'))
+
+    def test_store_with_existing_result(self):
+        with ResultStore(self.path) as store:
+            store.store('b', 'l', 'sig', state_result(3, 4, 'failed'))
+            store.store('b', 'l', 'sig', state_result(3, 4, 'passed'))
+
+            self.assertEqual(len(store), 1)
+            self.assertTrue(store.lookup('b', 'l', 3, 'sig',
+                                         'fsck').result.passed)
+
+    def test_close_persists_results(self):
+        with ResultStore(self.path, commit_every=1000) as store:
+            store.store('b', 'l', 'sig', state_result(3, 4, 'failed'))
+
+        with ResultStore(self.path) as store:
+            self.assertIsNotNone(store.lookup('b', 'l', 3, 'sig', 'fsck'))
+
+    def test_failing(self):
+        with ResultStore(self.path) as store:
+            for window in range(5):
+                store.store('b', 'l', 'p{0}'.format(window),
+                            state_result(window, 0, 'passed'))
+                store.store('b', 'l', 'f{0}'.format(window),
+                            state_result(window, 1, 'failed'))
+            store.store('b', 'l', 't', state_result(2, 2, 'timeout'))
+            store.store('b', 'other', 'f', state_result(2, 3, 'failed'))
+
+            results = store.failing('b', 'l', first_window=1,
+                                    last_window=2)
+
+        self.assertEqual([(i.window_number, i.rank, i.result.status)
+                          for i in results],
+                         [(1, 1, 'failed'), (2, 1, 'failed'),
+                          (2, 2, 'timeout')])
+
+    def test_failing_with_checker(self):
+        with ResultStore(self.path) as store:
+            store.store('b', 'l', 'f', state_result(1, 1, 'failed'))
+
+            self.assertEqual(len(store.failing('b', 'l', checker='fsck')), 1)
+            self.assertEqual(store.failing('b', 'l', checker='mount'), [])
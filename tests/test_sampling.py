@@ -0,0 +1,102 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import random
+
+from fsresck.sampling import sample_ranks, SamplingReport, Budget
+
+class TestSampleRanks(unittest.TestCase):
+    def test_small_space(self):
+        ranks = list(sample_ranks(random.Random(1), 100))
+
+        self.assertEqual(sorted(ranks), list(range(100)))
+        self.assertNotEqual(ranks, list(range(100)))
+
+    def test_large_space(self):
+        ranks = list(sample_ranks(random.Random(1), 1000, small_space=10))
+
+        self.assertEqual(sorted(ranks), list(range(1000)))
+
+    def test_large_space_is_shuffled(self):
+        ranks = list(sample_ranks(random.Random(2), 5000, small_space=10))
+
+        self.assertEqual(sorted(ranks), list(range(5000)))
+        self.assertNotEqual(ranks[:100], sorted(ranks[:100]))
+        # the start of the sample is spread over the space
+        self.assertEqual(len(set(i // 500 for i in ranks[:100])), 10)
+
+    def test_large_space_is_not_stored(self):
+        ranks = sample_ranks(random.Random(1), 2**62)
+
+        first = [next(ranks) for _ in range(1000)]
+
+        self.assertEqual(len(set(first)), 1000)
+        self.assertTrue(all(0 <= i < 2**62 for i in first))
+
+    def test_single_state(self):
+        self.assertEqual(list(sample_ranks(random.Random(1), 1,
+                                           small_space=0)), [0])
+
+    def test_deterministic(self):
+        first = list(sample_ranks(random.Random(5), 50, small_space=10))
+        second = list(sample_ranks(random.Random(5), 50, small_space=10))
+
+        self.assertEqual(first, second)
+
+    def test_empty_space(self):
+        self.assertEqual(list(sample_ranks(random.Random(), 0)), [])
+
+class TestSamplingReport(unittest.TestCase):
+    def test_coverage(self):
+        report = SamplingReport(total=8)
+        report.sampled = 2
+
+        self.assertEqual(report.coverage, 0.25)
+        self.assertEqual(repr(report),
+                         "SamplingReport(sampled=2, total=8, "
+                         "coverage=25.00%)")
+
+    def test_coverage_of_empty_space(self):
+        self.assertEqual(SamplingReport().coverage, 1.0)
+
+class TestBudget(unittest.TestCase):
+    def test_unlimited(self):
+        self.assertFalse(Budget().exhausted(10**9))
+
+    def test_max_states(self):
+        budget = Budget(max_states=3)
+
+        self.assertFalse(budget.exhausted(2))
+        self.assertTrue(budget.exhausted(3))
+
+    def test_max_seconds(self):
+        self.assertTrue(Budget(max_seconds=0).exhausted(0))
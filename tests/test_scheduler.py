@@ -0,0 +1,206 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+
+from fsresck.checkers import CheckResult
+from fsresck.driver import StateResult
+from fsresck.scheduler import _inversions, HeuristicScorer, \
+        PriorityScheduler
+from fsresck.statespec import StateSpec
+from fsresck.write import Write
+
+def timed_write(offset, data, start_time, end_time):
+    write = Write(offset, data)
+    write.set_times(start_time, end_time)
+    return write
+
+class TestInversions(unittest.TestCase):
+    def test__inversions(self):
+        self.assertEqual(_inversions((1, 2, 3)), 0)
+        self.assertEqual(_inversions((3, 1, 2)), 2)
+        self.assertEqual(_inversions((3, 2, 1)), 3)
+
+class TestHeuristicScorer(unittest.TestCase):
+    def setUp(self):
+        self.writes = [timed_write(0, b'a' * 8192, 0, 10),
+                       timed_write(0, b'b', 5, 15),
+                       # issued after all previous writes completed
+                       timed_write(8192, b'c', 20, 30),
+                       timed_write(0, b'd', 25, 35)]
+
+    def test_features(self):
+        scorer = HeuristicScorer(self.writes)
+
+        features = scorer.features(
+            StateSpec.from_draw_group('log', 1, (3, 2)))
+
+        self.assertEqual(features, {'rewrite': 1.0, 'metadata': 1.0,
+                                    'reorder': 2 / 3.0, 'barrier': 0.5,
+                                    'similarity': 0.0})
+
+    def test_features_with_metadata_regions(self):
+        scorer = HeuristicScorer(self.writes,
+                                 metadata_regions=[(8192, 12288)])
+
+        self.assertEqual(scorer.features(
+            StateSpec('log', 2, (2, )))['metadata'], 1.0)
+        self.assertEqual(scorer.features(
+            StateSpec('log', 1, (1, )))['metadata'], 0.0)
+
+    def test_features_with_rarely_written_block(self):
+        scorer = HeuristicScorer(self.writes)
+
+        features = scorer.features(StateSpec('log', 2, (2, )))
+
+        self.assertEqual(features['rewrite'], 1 / 3.0)
+        self.assertEqual(features['reorder'], 0.0)
+
+    def test_features_with_empty_draw_group(self):
+        scorer = HeuristicScorer(self.writes)
+
+        features = scorer.features(StateSpec('log', 2, ()))
+
+        self.assertEqual(set(features.values()), set([0.0]))
+
+    def test_learn(self):
+        scorer = HeuristicScorer(self.writes)
+        spec = StateSpec('log', 2, (2, ))
+        before = scorer.score(spec)
+
+        scorer.learn(StateSpec('log', 1, (1, 2)))
+
+        self.assertEqual(scorer.generation, 1)
+        self.assertEqual(scorer.features(spec)['similarity'], 0.5)
+        self.assertEqual(scorer.score(spec), before + 1.0)
+
+    def test_score(self):
+        scorer = HeuristicScorer(self.writes,
+                                 weights={'rewrite': 0.0, 'metadata': 0.0,
+                                          'reorder': 3.0})
+
+        score = scorer.score(StateSpec.from_draw_group('log', 1, (3, 2)))
+
+        self.assertAlmostEqual(score, 2.5)
+
+class TableScorer(object):
+    def __init__(self, scores):
+        self.scores = scores
+        self.generation = 0
+        self.learned = []
+
+    def score(self, spec):
+        return self.scores[spec.indexes[0]]
+
+    def learn(self, spec):
+        self.learned.append(spec)
+        self.scores[spec.indexes[0] + 1] = 10
+        self.generation += 1
+
+def states(count):
+    return [(0, i, StateSpec('log', 0, (i, ))) for i in range(count)]
+
+class TestPriorityScheduler(unittest.TestCase):
+    def test___iter__(self):
+        scheduler = PriorityScheduler(states(5),
+                                      TableScorer([1, 3, 2, 3, 0]))
+
+        self.assertEqual([i[1] for i in scheduler], [1, 3, 2, 0, 4])
+
+    def test___iter___with_small_lookahead(self):
+        scheduler = PriorityScheduler(states(5),
+                                      TableScorer([1, 3, 2, 3, 0]),
+                                      max_pending=2)
+
+        self.assertEqual([i[1] for i in scheduler], [1, 2, 3, 0, 4])
+
+    def test___iter___with_windows(self):
+        windows = [(i // 2, i % 2, StateSpec('log', i // 2, (i, )))
+                   for i in range(6)]
+        scheduler = PriorityScheduler(windows,
+                                      TableScorer([0, 1, 5, 4, 2, 3]))
+
+        # the state of window 1 with the highest score goes before the low
+        # scoring states of window 0
+        self.assertEqual([i[:2] for i in scheduler],
+                         [(1, 0), (1, 1), (2, 1), (2, 0), (0, 1), (0, 0)])
+
+    def test___iter___with_window_limit(self):
+        windows = [(i // 2, i % 2, StateSpec('log', i // 2, (i, )))
+                   for i in range(6)]
+        scheduler = PriorityScheduler(windows,
+                                      TableScorer([0, 1, 5, 4, 2, 3]),
+                                      max_windows=1)
+
+        # states of the next window are read only after all states of the
+        # previous window were returned
+        self.assertEqual([i[:2] for i in scheduler],
+                         [(0, 1), (0, 0), (1, 0), (1, 1), (2, 1), (2, 0)])
+
+    def test_ahead(self):
+        windows = [(i // 2, i % 2, StateSpec('log', i // 2, (i, )))
+                   for i in range(4)]
+        scheduler = PriorityScheduler(windows, TableScorer([0, 1, 3, 2]))
+        ahead = []
+
+        for _ in scheduler:
+            ahead.append(dict(scheduler.ahead))
+
+        self.assertEqual(ahead, [{0: 2, 1: 1}, {0: 2}, {0: 1}, {}])
+
+    def test_report(self):
+        scorer = TableScorer([5, 4, 3, 2, 1])
+        scheduler = PriorityScheduler(states(5), scorer)
+        order = []
+
+        for window, rank, _ in scheduler:
+            order.append(rank)
+            status = CheckResult.FAILED if rank == 2 else CheckResult.PASSED
+            scheduler.report(StateResult(window, rank, (),
+                                         CheckResult(status)))
+
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+        self.assertEqual(scorer.learned, [StateSpec('log', 0, (2, ))])
+        self.assertEqual(scheduler._returned, {})
+
+    def test_report_with_rescoring(self):
+        scorer = TableScorer([5, 0, 4, 1, 3])
+        scheduler = PriorityScheduler(states(5), scorer)
+        order = []
+
+        for window, rank, _ in scheduler:
+            order.append(rank)
+            status = CheckResult.FAILED if rank == 0 else CheckResult.PASSED
+            scheduler.report(StateResult(window, rank, (),
+                                         CheckResult(status)))
+
+        # state 1 is moved ahead after state 0 failed
+        self.assertEqual(order, [0, 1, 2, 4, 3])
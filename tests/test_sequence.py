@@ -0,0 +1,105 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from fsresck.sequence import AppendLog, LogView
+
+class TestAppendLog(unittest.TestCase):
+    def test___init__(self):
+        log = AppendLog()
+
+        self.assertEqual(len(log), 0)
+        self.assertEqual(list(log), [])
+
+    def test___init___with_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            AppendLog(chunk_size=0)
+
+    def test_append(self):
+        log = AppendLog(chunk_size=3)
+
+        for i in range(10):
+            log.append(i)
+
+        self.assertEqual(len(log), 10)
+        self.assertEqual(list(log), list(range(10)))
+        self.assertEqual(log[4], 4)
+        self.assertEqual(log[-1], 9)
+
+    def test_view(self):
+        log = AppendLog(range(5), chunk_size=2)
+
+        view = log.view(1, 4)
+        log.extend(range(5, 10))
+
+        self.assertIsInstance(view, LogView)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(list(view), [1, 2, 3])
+        self.assertEqual(list(log.view(3)), list(range(3, 10)))
+
+    def test_view_out_of_range(self):
+        log = AppendLog(range(5))
+
+        with self.assertRaises(IndexError):
+            log.view(2, 6)
+
+class TestLogView(unittest.TestCase):
+    def test___getitem__(self):
+        log = AppendLog(range(10), chunk_size=4)
+        view = log.view(2, 8)
+
+        self.assertEqual(view[0], 2)
+        self.assertEqual(view[-1], 7)
+        with self.assertRaises(IndexError):
+            view[6]
+
+    def test___getitem___with_slice(self):
+        log = AppendLog(range(10), chunk_size=4)
+        view = log.view(2, 8)
+
+        part = view[1:3]
+
+        self.assertIsInstance(part, LogView)
+        self.assertEqual(list(part), [3, 4])
+        self.assertEqual(view[::2], [2, 4, 6])
+
+    def test___eq__(self):
+        log = AppendLog(range(4))
+
+        self.assertEqual(log.view(0, 2), [0, 1])
+        self.assertEqual([0, 1], log.view(0, 2))
+        self.assertNotEqual(log.view(0, 2), [0, 2])
+        self.assertNotEqual(log.view(0, 2), [0])
+        self.assertEqual(log.view(1, 3), AppendLog([1, 2]).view())
+
+    def test___repr__(self):
+        log = AppendLog(range(4))
+
+        self.assertEqual(repr(log.view(1, 3)), "[1, 2]")
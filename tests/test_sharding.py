@@ -0,0 +1,101 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from fsresck.sharding import Shard, CostModel
+
+class TestShard(unittest.TestCase):
+    def test___init__(self):
+        shard = Shard(1, 4)
+
+        self.assertEqual(shard.index, 1)
+        self.assertEqual(shard.count, 4)
+
+    def test___init___with_invalid_values(self):
+        with self.assertRaises(ValueError):
+            Shard(0, 0)
+
+        with self.assertRaises(ValueError):
+            Shard(4, 4)
+
+        with self.assertRaises(ValueError):
+            Shard(-1, 4)
+
+    def test_parse(self):
+        self.assertEqual(Shard.parse("2/5"), Shard(2, 5))
+
+    def test_parse_with_invalid_string(self):
+        with self.assertRaises(ValueError):
+            Shard.parse("2")
+
+        with self.assertRaises(ValueError):
+            Shard.parse("a/b")
+
+        with self.assertRaises(ValueError):
+            Shard.parse("5/5")
+
+    def test___repr__(self):
+        self.assertEqual(repr(Shard(0, 2)), "Shard(0/2)")
+
+    def test_owner(self):
+        shard = Shard(0, 4)
+
+        self.assertEqual(shard.owner(0, 100), 0)
+        self.assertEqual(shard.owner(24.9, 100), 0)
+        self.assertEqual(shard.owner(25, 100), 1)
+        self.assertEqual(shard.owner(100, 100), 3)
+
+    def test_select(self):
+        costs = [10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+
+        first = list(Shard(0, 2).select(costs))
+        second = list(Shard(1, 2).select(costs))
+
+        self.assertEqual(first, [0])
+        self.assertEqual(second, list(range(1, 11)))
+
+    def test_rank_range(self):
+        shards = [Shard(i, 3) for i in range(3)]
+
+        ranges = [i.rank_range(0, 0, 1, 30, 30.0) for i in shards]
+
+        self.assertEqual(ranges, [(0, 10), (10, 20), (20, 30)])
+
+    def test_rank_range_with_window_outside_shard(self):
+        shard = Shard(0, 2)
+
+        self.assertEqual(shard.rank_range(60, 1, 1, 10, 100.0), (0, 0))
+
+class TestCostModel(unittest.TestCase):
+    def test_window_cost(self):
+        model = CostModel(image_cost=5, state_cost=2)
+
+        self.assertEqual(model.window_cost(10), 25)
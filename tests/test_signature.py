@@ -0,0 +1,143 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from fsresck.signature import SignatureTracker, SignatureCache, \
+        state_signature
+from fsresck.write import Write
+
+class TestStateSignature(unittest.TestCase):
+    def test_state_signature(self):
+        signature = state_signature(4, (Write(0, b'a'), Write(1, b'b')))
+
+        self.assertEqual(signature,
+                         state_signature(4, (Write(0, bytearray(b'a')),
+                                             Write(1, b'b'))))
+        self.assertNotEqual(signature,
+                            state_signature(3, (Write(0, b'a'),
+                                                Write(1, b'b'))))
+        self.assertNotEqual(signature,
+                            state_signature(4, (Write(1, b'b'),
+                                                Write(0, b'a'))))
+        self.assertNotEqual(signature,
+                            state_signature(4, (Write(0, b'a'),
+                                                Write(1, b'c'))))
+
+class TestSignatureTracker(unittest.TestCase):
+    def test___init__(self):
+        tracker = SignatureTracker()
+
+        self.assertEqual(tracker.digest, 0)
+        self.assertEqual(len(tracker), 0)
+
+    def test_apply(self):
+        tracker = SignatureTracker()
+
+        tracker.apply(Write(0, bytearray(1024)), 0)
+
+        self.assertEqual(len(tracker), 2)
+        self.assertNotEqual(tracker.digest, 0)
+
+    def test_signature_matches_applied_writes(self):
+        writes = [Write(0, bytearray(1024)), Write(512, bytearray(1024)),
+                  Write(100, bytearray(10))]
+        tracker = SignatureTracker()
+
+        signature = tracker.signature(zip(writes, range(3)))
+        for record_id, write in enumerate(writes):
+            tracker.apply(write, record_id)
+
+        self.assertEqual(signature, tracker.digest)
+
+    def test_signature_of_non_overlapping_writes(self):
+        writes = [Write(0, bytearray(512)), Write(512, bytearray(512))]
+        tracker = SignatureTracker()
+
+        self.assertEqual(tracker.signature([(writes[0], 0), (writes[1], 1)]),
+                         tracker.signature([(writes[1], 1), (writes[0], 0)]))
+
+    def test_signature_of_overlapping_writes(self):
+        writes = [Write(0, bytearray(1024)), Write(512, bytearray(1024))]
+        tracker = SignatureTracker()
+
+        self.assertNotEqual(
+            tracker.signature([(writes[0], 0), (writes[1], 1)]),
+            tracker.signature([(writes[1], 1), (writes[0], 0)]))
+
+    def test_signature_of_overwritten_write(self):
+        writes = [Write(0, bytearray(512)), Write(0, bytearray(512))]
+        tracker = SignatureTracker()
+        tracker.apply(writes[0], 0)
+
+        self.assertEqual(tracker.signature([(writes[1], 1)]),
+                         tracker.signature([(writes[0], 0), (writes[1], 1)]))
+
+    def test_signature_of_partial_writes(self):
+        tracker = SignatureTracker()
+        first = tracker.signature([(Write(0, bytearray(10)), 0),
+                                   (Write(10, bytearray(10)), 1)])
+        second = tracker.signature([(Write(10, bytearray(10)), 1),
+                                    (Write(0, bytearray(10)), 0)])
+        third = tracker.signature([(Write(0, bytearray(10)), 0)])
+
+        self.assertNotEqual(first, third)
+        # order of partial writes to the same sector is not recognised
+        # as irrelevant, that only causes a duplicate test
+        self.assertNotEqual(first, 0)
+        self.assertNotEqual(second, 0)
+
+    def test_signature_on_different_disks(self):
+        tracker = SignatureTracker()
+
+        self.assertNotEqual(
+            tracker.signature([(Write(0, bytearray(512), 1), 0)]),
+            tracker.signature([(Write(0, bytearray(512), 2), 0)]))
+
+class TestSignatureCache(unittest.TestCase):
+    def test_seen(self):
+        cache = SignatureCache()
+
+        self.assertFalse(cache.seen(1))
+        self.assertTrue(cache.seen(1))
+        self.assertEqual(cache.hits, 1)
+        self.assertIn(1, cache)
+
+    def test_max_entries(self):
+        cache = SignatureCache(max_entries=2)
+
+        cache.seen(1)
+        cache.seen(2)
+        cache.seen(1)
+        cache.seen(3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
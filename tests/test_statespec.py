@@ -0,0 +1,191 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import pickle
+import shutil
+import tempfile
+
+from fsresck.statespec import StateSpec, StateSource
+from fsresck.utils import file_digest
+
+from .helpers import write_log
+
+class TestStateSpec(unittest.TestCase):
+    def test_from_draw_group(self):
+        spec = StateSpec.from_draw_group('log', 10, (12, 10, 11))
+
+        self.assertEqual(spec.indexes, (10, 11, 12))
+        self.assertEqual(spec.rank, 4)
+        self.assertEqual(spec.draw_group, (12, 10, 11))
+
+    def test_pickle(self):
+        spec = StateSpec('log', 100000, (100001, 100002), 1)
+
+        data = pickle.dumps(spec, 2)
+
+        self.assertLess(len(data), 100)
+        self.assertEqual(pickle.loads(data), spec)
+
+    def test___eq__(self):
+        self.assertEqual(StateSpec('log', 1, (1, 2), 1),
+                         StateSpec('log', 1, [1, 2], 1))
+        self.assertNotEqual(StateSpec('log', 1, (1, 2), 1),
+                            StateSpec('log', 1, (1, 2), 0))
+        self.assertNotEqual(StateSpec('log', 1, (1, 2), 1),
+                            StateSpec('other', 1, (1, 2), 1))
+        self.assertEqual(len(set([StateSpec('log', 1, (1, ), 0),
+                                  StateSpec('log', 1, (1, ), 0)])), 1)
+
+    def test___repr__(self):
+        self.assertEqual(repr(StateSpec('log', 1, (1, 2), 1)),
+                         "StateSpec(log_id='log', base_index=1, "
+                         "indexes=(1, 2), rank=1)")
+
+class TestStateSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'\x00' * 2048)
+        self.log_name = os.path.join(self.tmp_dir, 'log')
+        write_log(self.log_name, [(0, b'a' * 1024), (512, b'b'),
+                                  (1024, b'\x00' * 512), (0, b'c')])
+
+    def test_writes(self):
+        source = StateSource(self.image_name, self.log_name)
+
+        self.assertEqual([(i.offset, i.data) for i in source.writes],
+                         [(0, b'a' * 1024), (512, b'b'),
+                          (1024, b'\x00' * 512), (0, b'c')])
+
+    def test_writes_with_fragments_and_noop_filter(self):
+        source = StateSource(self.image_name, self.log_name, sector_size=512,
+                             noop_horizon=1)
+
+        self.assertEqual([(i.offset, i.length) for i in source.writes],
+                         [(0, 512), (512, 512), (512, 1), (0, 1)])
+
+    def test_pickle(self):
+        source = StateSource(self.image_name, self.log_name, log_id='l')
+        self.assertEqual(len(source.writes), 4)
+
+        copy = pickle.loads(pickle.dumps(source))
+
+        self.assertIsNone(copy._writes)
+        self.assertEqual(copy.log_id, 'l')
+        self.assertEqual(list(copy.writes), list(source.writes))
+
+    def test_log_id(self):
+        source = StateSource(self.image_name, self.log_name)
+
+        self.assertEqual(source.log_id, file_digest(self.log_name)[:12])
+
+    def test_specs_pickle(self):
+        source = StateSource(self.image_name, self.log_name)
+        spec = next(iter(source.specs(3)))[2]
+
+        data = pickle.dumps(spec, 2)
+
+        self.assertLess(len(data), 100)
+        self.assertEqual(pickle.loads(data), spec)
+
+    def test_log_id_with_reading_options(self):
+        plain = StateSource(self.image_name, self.log_name)
+        fragmented = StateSource(self.image_name, self.log_name,
+                                 sector_size=512)
+        filtered = StateSource(self.image_name, self.log_name,
+                               sector_size=512, noop_horizon=1)
+
+        self.assertEqual(len(set([plain.log_id, fragmented.log_id,
+                                  filtered.log_id])), 3)
+        self.assertEqual(fragmented.log_id,
+                         StateSource(self.image_name, self.log_name,
+                                     sector_size=512).log_id)
+
+    def test_load_with_log_id(self):
+        source = StateSource(self.image_name, self.log_name)
+        source.load()
+
+        copy = pickle.loads(pickle.dumps(source))
+
+        self.assertEqual(copy._log_id, file_digest(self.log_name)[:12])
+
+    def test_specs(self):
+        source = StateSource(self.image_name, self.log_name)
+        shuffler = source.shuffler()
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        expected = list(shuffler.ranked_generator(3))
+
+        specs = list(source.specs(3))
+
+        self.assertEqual(len(specs), len(expected))
+        for (window, rank, spec), (e_window, e_rank, image, group) in \
+                zip(specs, expected):
+            self.assertEqual((window, rank), (e_window, e_rank))
+            self.assertEqual(spec.log_id, source.log_id)
+            self.assertEqual(list(source.image(spec).writes),
+                             list(image.writes))
+            self.assertEqual(source.draw_group(spec), group)
+
+    def test_spec(self):
+        source = StateSource(self.image_name, self.log_name)
+        specs = list(source.specs(3))
+
+        for window, rank, spec in specs:
+            self.assertEqual(source.spec(window, rank, 3), spec)
+
+    def test_spec_with_missing_state(self):
+        source = StateSource(self.image_name, self.log_name)
+
+        with self.assertRaises(ValueError):
+            source.spec(0, 100, 3)
+
+    def test_draw_group_with_other_log(self):
+        source = StateSource(self.image_name, self.log_name)
+
+        with self.assertRaises(ValueError):
+            source.draw_group(StateSpec('other', 0, (0, ), 0))
+
+    def test_draw_group_with_shared_payloads(self):
+        source = StateSource(self.image_name, self.log_name,
+                             shared_payloads=True)
+        source.load()
+
+        group = source.draw_group(StateSpec(source.log_id, 1, (1, 3), 1))
+
+        self.assertEqual([(i.offset, i.data.tobytes()) for i in group],
+                         [(0, b'c'), (512, b'b')])
+        self.assertIsInstance(group[0].data, memoryview)
+        self.assertEqual(len(source.payloads), 4)
@@ -0,0 +1,150 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+
+import random
+
+from fsresck.stratified import Stratum, StratifiedSampler
+
+class TestStratum(unittest.TestCase):
+    def test_coverage(self):
+        stratum = Stratum(2, 4, 10, 20)
+        stratum.sampled = 5
+
+        self.assertEqual(stratum.total, 10)
+        self.assertEqual(stratum.coverage, 0.5)
+
+    def test_coverage_with_empty_stratum(self):
+        self.assertEqual(Stratum(2, 4, 10, 10).coverage, 1.0)
+
+    def test___repr__(self):
+        self.assertEqual(repr(Stratum(2, 4, 10, 20)),
+                         "Stratum(windows=2-3, sampled=0, total=10, "
+                         "failed=0)")
+
+    def test_to_dict(self):
+        self.assertEqual(Stratum(2, 4, 10, 20).to_dict(),
+                         {'first_window': 2, 'last_window': 3, 'total': 10,
+                          'sampled': 0, 'failed': 0, 'coverage': 0.0})
+
+class TestStratifiedSampler(unittest.TestCase):
+    def sampler(self, sizes, strata):
+        return StratifiedSampler(sizes, strata, random.Random(1))
+
+    def test___init__(self):
+        sampler = self.sampler([2] * 10, 4)
+
+        self.assertEqual(sampler.total, 20)
+        self.assertEqual([(i.first, i.last, i.start, i.end)
+                          for i in sampler.strata],
+                         [(0, 2, 0, 4), (2, 5, 4, 10), (5, 7, 10, 14),
+                          (7, 10, 14, 20)])
+
+    def test___init___with_more_strata_than_windows(self):
+        sampler = self.sampler([2, 3], 10)
+
+        self.assertEqual([(i.first, i.last) for i in sampler.strata],
+                         [(0, 1), (1, 2)])
+
+    def test_window(self):
+        sampler = self.sampler([2, 0, 3], 1)
+
+        self.assertEqual(sampler.window(0), (0, 0))
+        self.assertEqual(sampler.window(2), (2, 0))
+        self.assertEqual(sampler.window(4), (2, 2))
+
+    def test_generate(self):
+        sampler = self.sampler([2, 0, 3, 6, 1], 3)
+
+        states = list(sampler.generate())
+
+        self.assertEqual(len(states), 12)
+        self.assertEqual(set(states),
+                         set([(0, 0), (0, 1), (2, 0), (2, 1), (2, 2),
+                              (4, 0)] + [(3, i) for i in range(6)]))
+        self.assertEqual([i.coverage for i in sampler.coverage()],
+                         [1.0, 1.0, 1.0])
+
+    def test_generate_with_max_states(self):
+        sampler = self.sampler([10] * 20, 5)
+
+        states = list(sampler.generate(max_states=5))
+
+        # one state from every stratum
+        self.assertEqual(sorted(i[0] // 4 for i in states),
+                         [0, 1, 2, 3, 4])
+        self.assertEqual([i.sampled for i in sampler.coverage()],
+                         [1] * 5)
+
+    def test_generate_with_max_seconds(self):
+        sampler = self.sampler([10] * 20, 5)
+
+        self.assertEqual(list(sampler.generate(max_seconds=0)), [])
+
+    def test_report(self):
+        sampler = self.sampler([10] * 8, 2)
+        list(sampler.generate(max_states=4))
+
+        sampler.report(1, True)
+
+        self.assertEqual([(i.first, i.last, i.failed)
+                          for i in sampler.coverage()],
+                         [(0, 2, 1), (2, 4, 0), (4, 8, 0)])
+        self.assertEqual(sum(i.sampled for i in sampler.coverage()), 4)
+
+    def test_report_with_passed_state(self):
+        sampler = self.sampler([10] * 8, 2)
+
+        sampler.report(1, False)
+
+        self.assertEqual(len(sampler.coverage()), 2)
+
+    def test_report_with_single_window(self):
+        sampler = self.sampler([10] * 2, 2)
+
+        sampler.report(1, True)
+        sampler.report(1, True)
+
+        self.assertEqual([i.failed for i in sampler.coverage()], [0, 2])
+
+    def test_generate_after_failure(self):
+        sampler = self.sampler([10] * 8, 4)
+        list(sampler.generate(max_states=8))
+        sampler.report(6, True)
+
+        states = list(sampler.generate(max_states=12))
+
+        # the window with the failure gets 5 times the share of others
+        counts = [sum(1 for i in states if i[0] == j) for j in range(8)]
+        self.assertEqual(counts.index(max(counts)), 6)
+        self.assertGreaterEqual(counts[6], 5)
+        self.assertEqual(sum(i.sampled for i in sampler.coverage()), 20)
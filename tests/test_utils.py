@@ -37,10 +37,11 @@ except ImportError:
     import unittest.mock as mock
     from unittest.mock import call
 
+import hashlib
 import subprocess
 import tempfile
 import os
-from fsresck.utils import copy, get_temp_file_name
+from fsresck.utils import copy, file_digest, get_temp_file_name
 from fsresck.errors import FSCopyError
 
 class TestCopy(unittest.TestCase):
@@ -87,3 +88,13 @@ class TestCopy(unittest.TestCase):
 
         mock_mkstemp.assert_called_once_with(prefix='fsresck.', dir='/dir-name')
         mock_close.assert_called_once_with(-33)
+
+class TestFileDigest(unittest.TestCase):
+    def test_file_digest(self):
+        handle, name = tempfile.mkstemp()
+        os.write(handle, b'test data')
+        os.close(handle)
+        self.addCleanup(os.unlink, name)
+
+        self.assertEqual(file_digest(name, chunk_size=4),
+                         hashlib.sha256(b'test data').hexdigest())
@@ -0,0 +1,286 @@
+#
+#   Description: File system resilience testing application
+#   Author: Hubert Kario <hubert@kario.pl>
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#
+#   Copyright (c) 2015 Hubert Kario. All rights reserved.
+#
+#   This copyrighted material is made available to anyone wishing
+#   to use, modify, copy, or redistribute it subject to the terms
+#   and conditions of the GNU General Public License version 2.
+#
+#   This program is distributed in the hope that it will be
+#   useful, but WITHOUT ANY WARRANTY; without even the implied
+#   warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+#   PURPOSE. See the GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public
+#   License along with this program; if not, write to the Free
+#   Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+#   Boston, MA 02110-1301, USA.
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+
+from fsresck.checkers import CheckResult, CommandChecker
+from fsresck.driver import StateResult
+from fsresck.image import Image
+from fsresck.workqueue import Coordinator, WorkUnit, Worker, parse_address
+from fsresck.write import Write
+from fsresck.writesshuffler import WritesShuffler
+
+def passed(window, rank=0):
+    return StateResult(window, rank, (), CheckResult(CheckResult.PASSED, 0))
+
+class TestParseAddress(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address('localhost:4000'),
+                         ('localhost', 4000))
+        self.assertEqual(parse_address('/tmp/fsresck.sock'),
+                         '/tmp/fsresck.sock')
+        self.assertEqual(parse_address('fsresck.sock'), 'fsresck.sock')
+
+    def test_parse_address_with_invalid_port(self):
+        with self.assertRaises(ValueError):
+            parse_address('localhost:http')
+
+class TestWorkUnit(unittest.TestCase):
+    def test___repr__(self):
+        self.assertEqual(repr(WorkUnit(1, 2, 5)),
+                         "WorkUnit(unit_id=1, first=2, last=5, next=2, "
+                         "worker=None)")
+
+class TestCoordinator(unittest.TestCase):
+    def test___init__(self):
+        coordinator = Coordinator([1, 1, 1, 5, 1, 1], unit_cost=3)
+
+        units = [coordinator.assign('w') for _ in range(3)]
+
+        self.assertEqual([(i['first'], i['last']) for i in units],
+                         [(0, 3), (3, 4), (4, 6)])
+        self.assertEqual(coordinator.progress()['units_queued'], 0)
+
+    def test_assign_with_no_windows(self):
+        coordinator = Coordinator([])
+
+        self.assertEqual(coordinator.assign('w'), {'type': 'done'})
+        self.assertTrue(coordinator.finished)
+
+    def test_assign_and_finish(self):
+        coordinator = Coordinator([1, 1], unit_cost=2)
+
+        reply = coordinator.assign('w')
+
+        self.assertEqual(reply, {'type': 'unit', 'unit': 0, 'first': 0,
+                                 'last': 2})
+        self.assertFalse(coordinator.finished)
+        # single window can't be split
+        self.assertEqual(coordinator.window_done('w', 0, 0, [passed(0)]),
+                         {'type': 'ack', 'last': 2})
+        self.assertEqual(coordinator.assign('x'),
+                         {'type': 'wait', 'seconds': 0.5})
+
+        self.assertEqual(coordinator.assign('w', finished=0),
+                         {'type': 'done'})
+        self.assertTrue(coordinator.finished)
+        self.assertEqual(coordinator.progress()['windows_done'], 2)
+
+    def test_window_done(self):
+        results = []
+        coordinator = Coordinator([1, 1, 1], unit_cost=10,
+                                  on_result=results.append)
+        coordinator.assign('w')
+        failed = StateResult(1, 1, (), CheckResult(CheckResult.FAILED, 1))
+
+        coordinator.window_done('w', 0, 0, [passed(0)])
+        coordinator.window_done('w', 0, 1, [passed(1), failed])
+
+        self.assertEqual(len(results), 3)
+        progress = coordinator.progress()
+        self.assertEqual(progress['states'], 3)
+        self.assertEqual(progress['failed'], 1)
+        self.assertEqual(progress['windows_done'], 2)
+
+    def test_window_done_with_repeated_window(self):
+        results = []
+        coordinator = Coordinator([1, 1, 1], unit_cost=10,
+                                  on_result=results.append)
+        coordinator.assign('w')
+        coordinator.window_done('w', 0, 0, [passed(0)])
+
+        reply = coordinator.window_done('w', 0, 0, [passed(0)])
+
+        self.assertEqual(reply, {'type': 'ack', 'last': 3})
+        self.assertEqual(len(results), 1)
+
+    def test_window_done_from_other_worker(self):
+        coordinator = Coordinator([1, 1, 1], unit_cost=10)
+        coordinator.assign('w')
+
+        self.assertEqual(coordinator.window_done('x', 0, 0, [passed(0)]),
+                         {'type': 'abort'})
+
+    def test_assign_with_stealing(self):
+        coordinator = Coordinator([1] * 9, unit_cost=100)
+        coordinator.assign('w')
+        coordinator.window_done('w', 0, 0, [passed(0)])
+
+        reply = coordinator.assign('x')
+
+        # owner checks window 1, windows 2 to 8 are split
+        self.assertEqual(reply, {'type': 'unit', 'unit': 1, 'first': 5,
+                                 'last': 9})
+        self.assertEqual(coordinator.window_done('w', 0, 1, [passed(1)]),
+                         {'type': 'ack', 'last': 5})
+        self.assertEqual(coordinator.progress()['stolen'], 1)
+
+    def test_assign_with_stealing_expensive_window(self):
+        coordinator = Coordinator([1, 1, 10, 1], unit_cost=100)
+        coordinator.assign('w')
+
+        reply = coordinator.assign('x')
+
+        self.assertEqual((reply['first'], reply['last']), (2, 4))
+
+    def test_worker_lost(self):
+        coordinator = Coordinator([1, 1, 1], unit_cost=10)
+        coordinator.assign('w')
+        coordinator.window_done('w', 0, 0, [passed(0)])
+
+        coordinator.worker_lost('w')
+
+        self.assertEqual(coordinator.assign('x'),
+                         {'type': 'unit', 'unit': 1, 'first': 1, 'last': 3})
+        self.assertEqual(coordinator.window_done('w', 0, 1, [passed(1)]),
+                         {'type': 'abort'})
+        self.assertEqual(coordinator.progress()['requeued'], 1)
+
+    def test_expire(self):
+        coordinator = Coordinator([1, 1], unit_cost=10, lease_seconds=10)
+        coordinator.assign('w', now=100)
+
+        coordinator.expire(now=105)
+        self.assertEqual(coordinator.progress()['units_leased'], 1)
+        coordinator.window_done('w', 0, 0, [passed(0)], now=108)
+        coordinator.expire(now=115)
+        self.assertEqual(coordinator.progress()['units_leased'], 1)
+        coordinator.expire(now=119)
+
+        self.assertEqual(coordinator.progress()['units_leased'], 0)
+        self.assertEqual(coordinator.assign('x'),
+                         {'type': 'unit', 'unit': 1, 'first': 1, 'last': 2})
+
+    def test_handle_with_unknown_message(self):
+        coordinator = Coordinator([1])
+
+        self.assertEqual(coordinator.handle('w', {'type': 'hello'})['type'],
+                         'error')
+
+class TestCoordinatorAndWorkers(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_name = os.path.join(self.tmp_dir, 'image')
+        with open(self.image_name, 'wb') as image:
+            image.write(b'.' * 8)
+        self.writes = [Write(i % 3, b'abcdefgh'[i:i + 1]) for i in range(8)]
+        self.checker = CommandChecker(
+            [sys.executable, '-c',
+             'import sys; sys.exit(open(sys.argv[1], "rb").read(1) == b"b")'])
+
+    def shuffler(self):
+        return WritesShuffler(Image(self.image_name, []), self.writes)
+
+    def expected(self):
+        shuffler = self.shuffler()
+        shuffler.image_dir = self.tmp_dir
+        self.addCleanup(shuffler.cleanup)
+        return sorted((i[0], i[1]) for i in shuffler.ranked_generator(3))
+
+    def run_workers(self, address, count):
+        results = []
+        costs = [len(space) for _, space in
+                 self.shuffler().window_spaces(3)]
+        coordinator = Coordinator(costs, unit_cost=5,
+                                  on_result=results.append,
+                                  wait_seconds=0.01)
+        server = coordinator.listen(address)
+        address = server.server_address
+        thread = threading.Thread(target=coordinator.serve,
+                                  args=(server, 0.01))
+        thread.start()
+        workers = [Worker(address, self.shuffler, self.checker,
+                          image_dir=self.tmp_dir, name='w{0}'.format(i))
+                   for i in range(count)]
+        threads = [threading.Thread(target=i.run) for i in workers]
+        for i in threads:
+            i.start()
+        for i in threads:
+            i.join()
+        thread.join()
+        return coordinator, workers, results
+
+    def test_tcp(self):
+        coordinator, workers, results = self.run_workers(('127.0.0.1', 0),
+                                                         3)
+
+        # workers removed all their temporary images
+        self.assertEqual(os.listdir(self.tmp_dir), ['image'])
+        self.assertEqual(sorted((i.window_number, i.rank) for i in results),
+                         self.expected())
+        self.assertTrue(coordinator.finished)
+        self.assertEqual(sum(i.states for i in workers), len(results))
+        self.assertEqual(coordinator.progress()['windows_done'],
+                         len(self.writes) + 1)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "needs Unix sockets")
+    def test_unix_socket(self):
+        address = os.path.join(self.tmp_dir, 'socket')
+
+        coordinator, _, results = self.run_workers(address, 2)
+
+        self.assertEqual(sorted((i.window_number, i.rank) for i in results),
+                         self.expected())
+
+    def test_lost_worker(self):
+        results = []
+        costs = [len(space) for _, space in
+                 self.shuffler().window_spaces(3)]
+        coordinator = Coordinator(costs, unit_cost=1000,
+                                  on_result=results.append,
+                                  wait_seconds=0.01)
+        server = coordinator.listen(('127.0.0.1', 0))
+        thread = threading.Thread(target=coordinator.serve,
+                                  args=(server, 0.01))
+        thread.start()
+
+        # worker that takes the only unit and disconnects
+        sock = socket.create_connection(server.server_address)
+        sock.sendall(b'{"type": "request", "worker": "lost"}\n')
+        reply = sock.makefile('rb').readline()
+        self.assertIn(b'"unit"', reply)
+        sock.close()
+
+        worker = Worker(server.server_address, self.shuffler, self.checker,
+                        image_dir=self.tmp_dir)
+        worker.run()
+        thread.join()
+
+        self.assertEqual(sorted((i.window_number, i.rank) for i in results),
+                         self.expected())
+        self.assertEqual(coordinator.progress()['requeued'], 1)
@@ -24,7 +24,11 @@ try:
 except ImportError:
         import unittest
 
-from fsresck.write import Write, overlapping
+import os
+import tempfile
+
+from fsresck.write import Write, LazyWrite, overlapping
+from fsresck.errors import TruncatedFileError
 
 class TestWrite(unittest.TestCase):
     def test___init__(self):
@@ -98,6 +102,74 @@ class TestWrite(unittest.TestCase):
         self.assertEqual(write.start_time, 12)
         self.assertEqual(write.end_time, 14)
 
+    def test_length(self):
+        write = Write(offset=0, data=bytearray(100))
+
+        self.assertEqual(write.length, 100)
+
+    def test_slice(self):
+        data = bytearray(range(10))
+        write = Write(offset=512, data=data, disk_id=2)
+
+        part = write.slice(2, 5)
+
+        self.assertEqual(part, Write(514, bytearray([2, 3, 4]), 2))
+        self.assertIsInstance(part.data, memoryview)
+
+class TestLazyWrite(unittest.TestCase):
+    def setUp(self):
+        handle, self.file_name = tempfile.mkstemp()
+        os.write(handle, b'\x00' * 4 + b'\x01' * 8)
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def test_data(self):
+        write = LazyWrite(512, self.file_name, 4, 8)
+
+        self.assertEqual(write.data, b'\x01' * 8)
+        self.assertEqual(write.length, 8)
+        self.assertNotIn('data', write.__dict__)
+
+    def test_data_with_truncated_file(self):
+        write = LazyWrite(512, self.file_name, 4, 9)
+
+        self.assertEqual(write.length, 9)
+        with self.assertRaises(TruncatedFileError):
+            write.data
+
+    def test___eq__(self):
+        write1 = LazyWrite(512, self.file_name, 4, 8)
+        write2 = LazyWrite(512, self.file_name, 4, 8)
+        write3 = LazyWrite(512, self.file_name, 0, 8)
+
+        self.assertEqual(write1, write2)
+        self.assertEqual(hash(write1), hash(write2))
+        self.assertNotEqual(write1, write3)
+
+    def test___repr__(self):
+        write = LazyWrite(512, self.file_name, 4, 8)
+
+        self.assertEqual("<Write offset=512, len(data)=8>", repr(write))
+
+    def test_slice(self):
+        write = LazyWrite(512, self.file_name, 4, 8, disk_id=1)
+
+        part = write.slice(6, 10)
+
+        self.assertIsInstance(part, LazyWrite)
+        self.assertEqual(part.offset, 518)
+        self.assertEqual(part.length, 2)
+        self.assertEqual(part.disk_id, 1)
+        self.assertEqual(part.data, b'\x01' * 2)
+
+    def test_overlapping(self):
+        writes = [LazyWrite(0, self.file_name, 4, 8),
+                  Write(offset=7, data=bytearray(2))]
+
+        self.assertTrue(overlapping(writes))
+
 class TestOverlapping(unittest.TestCase):
     def test_non_overlapping(self):
         writes = [Write(offset=0, data=bytearray(512)),
@@ -130,6 +202,18 @@ class TestOverlapping(unittest.TestCase):
 
         self.assertTrue(overlapping(writes))
 
+    def test_overlapping_first_contains_second(self):
+        writes = [Write(offset=0, data=bytearray(1024)),
+                  Write(offset=512, data=bytearray(10))]
+
+        self.assertTrue(overlapping(writes))
+
+    def test_overlapping_second_contains_first(self):
+        writes = [Write(offset=512, data=bytearray(10)),
+                  Write(offset=0, data=bytearray(1024))]
+
+        self.assertTrue(overlapping(writes))
+
     def test_overlapping_different_disks(self):
         writes = [Write(0, bytearray(512), disk_id=1),
                   Write(0, bytearray(512), disk_id=2)]
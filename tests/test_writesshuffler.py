@@ -36,9 +36,16 @@ except ImportError:
     import unittest.mock as mock
 
 import os
+import random
 from itertools import chain
 
-from fsresck.writesshuffler import WritesShuffler
+from fsresck.writesshuffler import WritesShuffler, tear_patterns, \
+        draw_groups, bounded_groups, reorder_distance
+from fsresck.fragmenter import Fragmenter
+from fsresck.sharding import Shard, CostModel
+from fsresck.sampling import SamplingReport
+from fsresck.signature import SignatureCache
+from fsresck.bloom import BloomFilter
 from fsresck.image import Image
 from fsresck.write import Write
 
@@ -356,6 +363,263 @@ class TestWritesShuffler(unittest.TestCase):
         self.assertEqual(test_image.writes, writes)
         self.assertEqual(test_writes, tuple())
 
+    def test_ranked_generator(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        ws = WritesShuffler(image, writes)
+
+        expected = set((tuple(i.writes), j) for i, j in ws.generator(4))
+        ranked = list(ws.ranked_generator(4))
+
+        self.assertEqual(len(ranked), len(expected))
+        self.assertEqual(set((tuple(i[2].writes), i[3]) for i in ranked),
+                         expected)
+        self.assertEqual(ranked[0][:2], (0, 0))
+        self.assertEqual(ranked[-1][:2], (6, 0))
+
+    def test_ranked_generator_with_shards(self):
+        image = Image("/dev/null", [])
+        image.create_image = mock.MagicMock(return_value="/tmp/some-name")
+        writes = [Write(i*256, bytearray(512)) for i in range(8)]
+
+        ws = WritesShuffler(image, iter(writes))
+        expected = [i[:2] for i in ws.ranked_generator(4)]
+
+        states = []
+        counts = []
+        for index in range(3):
+            ws = WritesShuffler(image, iter(writes))
+            shard_states = [i[:2] for i in ws.ranked_generator(
+                4, Shard(index, 3), CostModel(image_cost=10))]
+            # cost of the shard: states and base images of windows
+            counts.append(len(shard_states) +
+                          10 * len(set(i[0] for i in shard_states)))
+            states.extend(shard_states)
+
+        self.assertEqual(states, expected)
+        self.assertTrue(max(counts) - min(counts) <= 15)
+
+    def test_ranked_generator_with_shard_without_states(self):
+        image = Image("/dev/null", [])
+        image.create_image = mock.MagicMock(return_value="/tmp/some-name")
+
+        ws = WritesShuffler(image, [Write(0, bytearray(512))])
+
+        self.assertEqual(list(ws.ranked_generator(shard=Shard(2, 4))), [])
+        self.assertEqual(image.create_image.call_count, 0)
+
+    def test_ranked_generator_after(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        ws = WritesShuffler(image, writes)
+        states = [i[:2] for i in ws.ranked_generator()]
+
+        resumed = [i[:2] for i in ws.ranked_generator(after=states[20])]
+
+        self.assertEqual(resumed, states[21:])
+
+    def test_sample(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        ws = WritesShuffler(image, writes, rng=random.Random(42))
+        expected = set(i[:2] for i in ws.ranked_generator())
+        report = SamplingReport()
+
+        sampled = [i[:2] for i in ws.sample(report=report)]
+
+        self.assertEqual(len(sampled), len(expected))
+        self.assertEqual(set(sampled), expected)
+        self.assertEqual(report.coverage, 1.0)
+
+    def test_sample_states(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray([i]) * 512) for i in range(6)]
+
+        ws = WritesShuffler(image, writes, rng=random.Random(42))
+        expected = dict(((i[0], i[1]), (list(i[2].writes), i[3]))
+                        for i in ws.ranked_generator())
+
+        for window, rank, state_image, group in ws.sample():
+            self.assertEqual((list(state_image.writes), group),
+                             expected[(window, rank)])
+
+    def test_sample_with_budget(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        ws = WritesShuffler(image, writes, rng=random.Random(42))
+        report = SamplingReport()
+
+        sampled = list(ws.sample(max_states=10, report=report))
+
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual(report.sampled, 10)
+        self.assertEqual(report.total, 45)
+        for window, rank, test_image, test_writes in sampled:
+            self.assertEqual(ws.state(window, rank)[1], test_writes)
+
+    def test_sample_with_stopped_consumer(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+        ws = WritesShuffler(image, writes, rng=random.Random(42))
+        report = SamplingReport()
+
+        sample = ws.sample(report=report)
+        next(sample)
+        sample.close()
+
+        self.assertEqual(report.sampled, 1)
+        self.assertIsNotNone(report.end_time)
+
+    def test_sample_is_reproducible(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        first = [i[:2] for i in WritesShuffler(
+            image, writes, random.Random(3)).sample(max_states=5)]
+        second = [i[:2] for i in WritesShuffler(
+            image, writes, random.Random(3)).sample(max_states=5)]
+
+        self.assertEqual(first, second)
+
+    def test_state(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(6)]
+
+        ws = WritesShuffler(image, writes)
+
+        for window, rank, test_image, test_writes in ws.ranked_generator():
+            state_image, state_writes = ws.state(window, rank)
+            self.assertEqual(state_image.image_name, "/tmp/some-name")
+            self.assertEqual(state_image.writes, test_image.writes)
+            self.assertEqual(state_writes, test_writes)
+
+    def test_state_with_invalid_window(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+
+        ws = WritesShuffler(image, [Write(0, bytearray(512))])
+
+        with self.assertRaises(IndexError):
+            ws.state(2, 0)
+
+    def test_hierarchical_generator(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [
+            Write(offset=0, data=bytearray(1024)),
+            Write(offset=4096, data=bytearray(512))
+            ]
+        frag_0, frag_1 = Fragmenter().fragment_write(writes[0])
+
+        ws = WritesShuffler(image, writes)
+
+        tests = list(ws.hierarchical_generator(Fragmenter(), group_size=2))
+
+        self.assertEqual([i[1] for i in tests],
+                         [tuple(),
+                          (frag_0, ),
+                          (frag_1, ),
+                          (frag_0, writes[1]),
+                          (frag_1, writes[1]),
+                          (writes[1], ),
+                          tuple(),
+                          tuple()])
+        self.assertEqual(tests[6][0].writes, [writes[0]])
+        self.assertEqual(tests[7][0].writes, writes)
+
+    def test_hierarchical_generator_unique_states(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(256*i, bytearray([i])*1024) for i in range(6)]
+
+        ws = WritesShuffler(image, writes)
+
+        all_combinations = set()
+        for test_image, test_writes in ws.hierarchical_generator(
+                Fragmenter(), group_size=3, max_torn=2):
+            comb = tuple((i.offset, bytes(i.data))
+                         for i in chain(test_image.writes, test_writes))
+            self.assertNotIn(comb, all_combinations)
+            all_combinations.add(comb)
+
+    def test_hierarchical_generator_with_invalid_data(self):
+        ws = WritesShuffler(None, [])
+
+        with self.assertRaises(TypeError):
+            next(ws.hierarchical_generator(Fragmenter()))
+
+    def test_generator_with_bloom_filter(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(10)]
+
+        ws = WritesShuffler(image, writes)
+        expected = [(list(i.writes), j) for i, j in ws.generator(4)]
+
+        states = [(list(i.writes), j) for i, j in
+                  ws.generator(4, bloom_filter=BloomFilter(1000, 1e-6))]
+
+        self.assertEqual(states, expected)
+
+    @staticmethod
+    def materialize(test_image, test_writes):
+        disk = bytearray(4096)
+        for write in chain(test_image.writes, test_writes):
+            disk[write.offset:write.offset + len(write.data)] = write.data
+        return bytes(disk)
+
+    def test_generator_with_signatures(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(512*(i % 2), bytearray([i+1])*512) for i in range(8)]
+
+        ws = WritesShuffler(image, writes)
+        expected = set(self.materialize(i, j) for i, j in ws.generator())
+        cache = SignatureCache()
+
+        states = [self.materialize(i, j) for i, j in ws.generator(
+            signatures=cache)]
+
+        self.assertEqual(set(states), expected)
+        self.assertEqual(len(states), len(expected))
+        self.assertTrue(cache.hits > 0)
+
+    def test_distance_generator(self):
+        image = Image("/dev/null", [])
+        image.create_image = lambda x: "/tmp/some-name"
+        writes = [Write(i*256, bytearray(512)) for i in range(12)]
+
+        ws = WritesShuffler(image, writes)
+
+        all_combinations = set()
+        for test_image, test_writes in ws.distance_generator(8, 1):
+            indexes = [writes.index(i) for i in test_writes]
+            if indexes:
+                self.assertEqual(reorder_distance(
+                    [i - len(test_image.writes) for i in indexes]), 1)
+            comb = tuple(chain(test_image.writes, test_writes))
+            self.assertNotIn(comb, all_combinations)
+            all_combinations.add(comb)
+        self.assertIn(tuple(writes), all_combinations)
+
+    def test_distance_generator_with_invalid_data(self):
+        ws = WritesShuffler(None, [])
+
+        with self.assertRaises(TypeError):
+            next(ws.distance_generator())
+
     def test_cleanup(self):
         patcher = mock.patch.object(os,
                                     'unlink',
@@ -440,3 +704,78 @@ class TestWritesShuffler(unittest.TestCase):
         for i in range(10):
             test_image, test_writes = next(ws.shuffle())
             self.assertNotEqual(test_writes[0], writes[0])
+
+
+class TestTearPatterns(unittest.TestCase):
+    def test_with_single_fragment(self):
+        self.assertEqual(list(tear_patterns([1])), [])
+
+    def test_with_few_fragments(self):
+        self.assertEqual(list(tear_patterns([1, 2, 3])),
+                         [(1, ), (2, ), (3, ), (1, 2), (1, 3), (2, 3)])
+
+    def test_with_many_fragments(self):
+        self.assertEqual(list(tear_patterns([1, 2, 3],
+                                            max_subset_fragments=2)),
+                         [(1, ), (1, 2), (2, 3), (3, )])
+
+
+class TestReorderDistance(unittest.TestCase):
+    def test_in_order(self):
+        self.assertEqual(reorder_distance([0, 1, 2]), 0)
+
+    def test_empty(self):
+        self.assertEqual(reorder_distance([]), 0)
+
+    def test_dropped(self):
+        self.assertEqual(reorder_distance([0, 2]), 1)
+        self.assertEqual(reorder_distance([3]), 3)
+
+    def test_displaced(self):
+        self.assertEqual(reorder_distance([1, 0, 2]), 1)
+        self.assertEqual(reorder_distance([2, 0, 1]), 1)
+        self.assertEqual(reorder_distance([2, 1, 0]), 2)
+
+
+class TestBoundedGroups(unittest.TestCase):
+    def test_with_large_distance(self):
+        window = (Write(0, bytearray(512)),
+                  Write(1024, bytearray(512)),
+                  Write(256, bytearray(512)),
+                  Write(4096, bytearray(512)))
+
+        groups = list(bounded_groups(window, 4))
+
+        self.assertEqual(len(groups), len(set(groups)))
+        self.assertEqual(set(groups), set(draw_groups(window, 4)))
+
+    def test_with_distance_of_one(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(4))
+
+        groups = list(bounded_groups(window, 1))
+
+        expected = set(i for i in draw_groups(window, 4)
+                       if reorder_distance([window.index(j)
+                                            for j in i]) <= 1)
+        self.assertEqual(len(groups), len(expected))
+        self.assertEqual(set(groups), expected)
+        for group in groups:
+            self.assertEqual(reorder_distance(
+                [window.index(i) for i in group]), 1)
+
+    def test_growth_is_polynomial(self):
+        window = tuple(Write(i, bytearray(512)) for i in range(30))
+
+        groups = list(bounded_groups(window, 1))
+
+        # every write can be dropped or moved to other position
+        self.assertTrue(len(groups) < 30 * 30 * 30)
+
+    def test_with_non_overlapping_writes(self):
+        window = tuple(Write(512*i, bytearray(512)) for i in range(4))
+
+        groups = list(bounded_groups(window, 1))
+
+        self.assertEqual(groups, [(window[1], ),
+                                  (window[1], window[2]),
+                                  (window[1], window[2], window[3])])